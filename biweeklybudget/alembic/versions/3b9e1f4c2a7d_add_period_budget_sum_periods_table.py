@@ -0,0 +1,36 @@
+"""Add period_budget_sum_periods table
+
+Revision ID: 3b9e1f4c2a7d
+Revises: 6c132f37b3ed
+Create Date: 2026-10-18 10:41:07.215530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9e1f4c2a7d'
+down_revision = '6c132f37b3ed'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'period_budget_sum_periods',
+        sa.Column('period_start', sa.Date(), nullable=False),
+        sa.PrimaryKeyConstraint(
+            'period_start', name=op.f('pk_period_budget_sum_periods')
+        ),
+        mysql_engine='InnoDB'
+    )
+    # mark the periods that already have stored sums
+    op.execute(
+        'INSERT INTO period_budget_sum_periods (period_start) '
+        'SELECT DISTINCT period_start FROM period_budget_sums'
+    )
+
+
+def downgrade():
+    op.drop_table('period_budget_sum_periods')
@@ -0,0 +1,42 @@
+"""Add accounts.latest_statement_id
+
+Revision ID: 3f92d41ec8bb
+Revises: fd804d7ed746
+Create Date: 2026-10-16 23:58:41.730215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f92d41ec8bb'
+down_revision = 'fd804d7ed746'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'accounts',
+        sa.Column('latest_statement_id', sa.Integer(), nullable=True)
+    )
+    op.create_foreign_key(
+        op.f('fk_accounts_latest_statement_id_ofx_statements'),
+        'accounts', 'ofx_statements', ['latest_statement_id'], ['id']
+    )
+    # latest statement by as_of; ties go to the highest id
+    op.execute(
+        'UPDATE accounts SET latest_statement_id=('
+        'SELECT s.id FROM ofx_statements s '
+        'WHERE s.account_id=accounts.id AND s.as_of IS NOT NULL '
+        'ORDER BY s.as_of DESC, s.id DESC LIMIT 1)'
+    )
+
+
+def downgrade():
+    op.drop_constraint(
+        op.f('fk_accounts_latest_statement_id_ofx_statements'),
+        'accounts', type_='foreignkey'
+    )
+    op.drop_column('accounts', 'latest_statement_id')
@@ -0,0 +1,26 @@
+"""Add ofx_trans (account_id, date_posted) index
+
+Revision ID: 6600ab15372c
+Revises: 3f92d41ec8bb
+Create Date: 2026-10-17 00:21:37.448810
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '6600ab15372c'
+down_revision = '3f92d41ec8bb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_ofx_trans_account_id_date_posted', 'ofx_trans',
+        ['account_id', 'date_posted'], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_ofx_trans_account_id_date_posted', table_name='ofx_trans')
@@ -0,0 +1,43 @@
+"""Add prime_rates table
+
+Revision ID: 6c132f37b3ed
+Revises: 6600ab15372c
+Create Date: 2026-10-17 00:25:38.505570
+
+"""
+import json
+from alembic import op
+import sqlalchemy as sa
+from biweeklybudget.utils import decode_json_datetime
+
+
+# revision identifiers, used by Alembic.
+revision = '6c132f37b3ed'
+down_revision = '6600ab15372c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    prime_rates = op.create_table(
+        'prime_rates',
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('rate', sa.Numeric(precision=5, scale=4), nullable=False),
+        sa.PrimaryKeyConstraint('date', name=op.f('pk_prime_rates')),
+        mysql_engine='InnoDB'
+    )
+    # seed the history with the currently-stored rate, if there is one
+    row = op.get_bind().execute(
+        sa.text("SELECT value FROM settings WHERE name='prime_rate'")
+    ).fetchone()
+    if row is None or row[0] is None:
+        return
+    j = json.loads(row[0])
+    op.bulk_insert(prime_rates, [{
+        'date': decode_json_datetime(j['date']).date(),
+        'rate': j['value']
+    }])
+
+
+def downgrade():
+    op.drop_table('prime_rates')
@@ -0,0 +1,45 @@
+"""Add period_budget_sums table
+
+Revision ID: 7bff029387e8
+Revises: 073142f641b3
+Create Date: 2026-10-16 09:12:44.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7bff029387e8'
+down_revision = '073142f641b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'period_budget_sums',
+        sa.Column('period_start', sa.Date(), nullable=False),
+        sa.Column(
+            'budget_id', sa.Integer(), autoincrement=False, nullable=False
+        ),
+        sa.Column(
+            'allocated', sa.Numeric(precision=10, scale=4), nullable=False
+        ),
+        sa.Column('spent', sa.Numeric(precision=10, scale=4), nullable=False),
+        sa.Column(
+            'trans_total', sa.Numeric(precision=10, scale=4), nullable=False
+        ),
+        sa.ForeignKeyConstraint(
+            ['budget_id'], ['budgets.id'],
+            name=op.f('fk_period_budget_sums_budget_id_budgets')
+        ),
+        sa.PrimaryKeyConstraint(
+            'period_start', 'budget_id', name=op.f('pk_period_budget_sums')
+        ),
+        mysql_engine='InnoDB'
+    )
+
+
+def downgrade():
+    op.drop_table('period_budget_sums')
@@ -0,0 +1,39 @@
+"""Add accounts.latest_balance_id
+
+Revision ID: fd804d7ed746
+Revises: 7bff029387e8
+Create Date: 2026-10-16 23:32:05.114602
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'fd804d7ed746'
+down_revision = '7bff029387e8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'accounts', sa.Column('latest_balance_id', sa.Integer(), nullable=True)
+    )
+    op.create_foreign_key(
+        op.f('fk_accounts_latest_balance_id_account_balances'),
+        'accounts', 'account_balances', ['latest_balance_id'], ['id']
+    )
+    op.execute(
+        'UPDATE accounts SET latest_balance_id=('
+        'SELECT MAX(account_balances.id) FROM account_balances '
+        'WHERE account_balances.account_id=accounts.id)'
+    )
+
+
+def downgrade():
+    op.drop_constraint(
+        op.f('fk_accounts_latest_balance_id_account_balances'),
+        'accounts', type_='foreignkey'
+    )
+    op.drop_column('accounts', 'latest_balance_id')
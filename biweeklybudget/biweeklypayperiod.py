@@ -37,15 +37,119 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 
 from datetime import timedelta, datetime, date
 from functools import total_ordering
-from sqlalchemy import or_, asc
+from sqlalchemy import or_, asc, and_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload
 from dateutil import relativedelta
 from collections import defaultdict
+from collections.abc import Mapping
 from decimal import Decimal
+import logging
 
 from biweeklybudget import settings
-from biweeklybudget.models import Transaction, ScheduledTransaction, Budget
+from biweeklybudget.models import (
+    Transaction, ScheduledTransaction, Budget, PeriodBudgetSum,
+    PeriodBudgetSumPeriod, DBSetting
+)
 from biweeklybudget.utils import dtnow
 
+logger = logging.getLogger(__name__)
+
+#: Number of days from the start of one pay period to the start of the next.
+PERIOD_INTERVAL_DAYS = 14
+
+#: Name of the :py:class:`~.DBSetting` counter that is incremented, in the
+#: same transaction, whenever all stored :py:class:`~.PeriodBudgetSum` rows are
+#: removed. :py:meth:`~.PayPeriodRange.stored_budget_sums` does not store sums
+#: calculated before the counter last changed.
+PERIOD_SUMS_GENERATION_SETTING = 'period-budget-sums-generation'
+
+#: Key in the session ``info`` dict that is set by
+#: :py:func:`~biweeklybudget.db_event_handlers.mark_data_changed` when the
+#: current transaction has flushed data changes.
+DATA_CHANGED_INFO_KEY = 'biweeklybudget_data_changed'
+
+#: Loader options for :py:class:`~.Transaction` queries, eagerly loading every
+#: relationship used by :py:meth:`~.BiweeklyPayPeriod._dict_for_trans` so that
+#: building the transaction list does not issue a query per Transaction.
+TRANSACTION_LOAD_OPTIONS = [
+    joinedload('account'),
+    joinedload('planned_budget'),
+    joinedload('reconcile'),
+    selectinload('budget_transactions').joinedload('budget')
+]
+
+#: Loader options for :py:class:`~.ScheduledTransaction` queries, eagerly
+#: loading every relationship used by
+#: :py:meth:`~.BiweeklyPayPeriod._dict_for_sched_trans`.
+SCHED_TRANS_LOAD_OPTIONS = [
+    joinedload('account'),
+    joinedload('budget')
+]
+
+
+class PeriodTxn(Mapping):
+    """
+    Compact, read-only record describing one :py:class:`~.Transaction` or
+    :py:class:`~.ScheduledTransaction` in
+    :py:attr:`~.BiweeklyPayPeriod.transactions_list`; see
+    :py:meth:`~.BiweeklyPayPeriod._trans_dict` for the fields.
+
+    Values are stored in ``__slots__`` rather than a per-instance dict, but the
+    record implements the read-only :py:class:`~collections.abc.Mapping`
+    interface, so templates and other callers can keep using ``t['date']``
+    or ``t.get('planned_budget_id')``, and a record compares equal to a dict
+    with the same items. Fields that were not given to the constructor are
+    absent from the mapping. For JSON, use :py:attr:`~.as_dict`.
+    """
+
+    __slots__ = (
+        'type', 'id', 'date', 'sched_type', 'sched_trans_id', 'description',
+        'amount', 'budgeted_amount', 'account_id', 'account_name',
+        'reconcile_id', 'planned_budget_id', 'planned_budget_name', 'budgets'
+    )
+
+    def __init__(self, **kwargs):
+        """
+        Create a new PeriodTxn.
+
+        :param kwargs: field values; keys must be names in ``__slots__``
+        :type kwargs: dict
+        """
+        for k, v in kwargs.items():
+            setattr(self, k, v)
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __iter__(self):
+        for k in self.__slots__:
+            if hasattr(self, k):
+                yield k
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+    def __repr__(self):
+        return '<PeriodTxn(%s)>' % ', '.join(
+            '%s=%r' % (k, self[k]) for k in self
+        )
+
+    @property
+    def as_dict(self):
+        """
+        Return a dict of this record's fields, for JSON encoding.
+
+        :return: dict of this record's fields
+        :rtype: dict
+        """
+        return dict(self.items())
+
 
 @total_ordering
 class BiweeklyPayPeriod(object):
@@ -74,6 +178,7 @@ class BiweeklyPayPeriod(object):
         self._end_date = start_date + self.period_length
         self._data_cache = {}
         self._income_budget_id_list = None
+        self._periodic_budget_list = None
 
     @property
     def period_interval(self):
@@ -83,7 +188,7 @@ class BiweeklyPayPeriod(object):
         :return: interval between BiweeklyPayPeriods
         :rtype: datetime.timedelta
         """
-        return timedelta(days=14)
+        return timedelta(days=PERIOD_INTERVAL_DAYS)
 
     @property
     def period_length(self):
@@ -131,7 +236,7 @@ class BiweeklyPayPeriod(object):
         :return: next BiweeklyPayPeriod after this one
         :rtype: BiweeklyPayPeriod
         """
-        return BiweeklyPayPeriod(
+        return BiweeklyPayPeriod.for_start_date(
             (self.start_date + self.period_interval),
             self._db
         )
@@ -144,7 +249,7 @@ class BiweeklyPayPeriod(object):
         :return: previous BiweeklyPayPeriod before this one
         :rtype: BiweeklyPayPeriod
         """
-        return BiweeklyPayPeriod(
+        return BiweeklyPayPeriod.for_start_date(
             (self.start_date - self.period_interval),
             self._db
         )
@@ -168,7 +273,12 @@ class BiweeklyPayPeriod(object):
         Given a datetime, return the BiweeklyPayPeriod instance describing the
         pay period containing this date.
 
-        .. todo:: This is a very naive, poorly-performing implementation.
+        The start date of the period is calculated directly, by floor-dividing
+        the number of days between
+        :py:attr:`~biweeklybudget.settings.PAY_PERIOD_START_DATE` and ``dt`` by
+        the period interval; this takes constant time regardless of how far
+        ``dt`` is from the configured start date. The result is memoized in
+        the session's :py:class:`~.PayPeriodRegistry`, if it has one.
 
         :param dt: datetime or date to find the pay period for
         :type dt: :py:class:`~datetime.datetime` or :py:class:`~datetime.date`
@@ -177,20 +287,74 @@ class BiweeklyPayPeriod(object):
         :return: BiweeklyPayPeriod containing the specified date
         :rtype: :py:class:`~.BiweeklyPayPeriod`
         """
-        p = BiweeklyPayPeriod(settings.PAY_PERIOD_START_DATE, db_session)
+        registry = PayPeriodRegistry.for_session(db_session)
+        if registry is not None:
+            return registry.period_for_date(dt)
+        return BiweeklyPayPeriod(
+            BiweeklyPayPeriod._start_date_for(dt), db_session
+        )
+
+    @staticmethod
+    def for_start_date(start_date, db_session):
+        """
+        Return the BiweeklyPayPeriod starting on ``start_date``. If
+        ``db_session`` has a :py:class:`~.PayPeriodRegistry`, the canonical
+        (shared) instance for that start date is returned, so that its cached
+        data is reused; otherwise a new instance is returned.
+
+        :param start_date: starting date of the pay period
+        :type start_date: datetime.date
+        :param db_session: active database session to use for queries
+        :type db_session: sqlalchemy.orm.session.Session
+        :return: BiweeklyPayPeriod starting on ``start_date``
+        :rtype: :py:class:`~.BiweeklyPayPeriod`
+        """
+        registry = PayPeriodRegistry.for_session(db_session)
+        if registry is not None:
+            return registry.get(start_date)
+        return BiweeklyPayPeriod(start_date, db_session)
+
+    @staticmethod
+    def periods_between(start, end, db_session):
+        """
+        Generator yielding, in order, every BiweeklyPayPeriod that contains
+        any date from ``start`` through ``end`` (inclusive). The first period
+        yielded is the one containing ``start`` and the last is the one
+        containing ``end``. Nothing is yielded if ``end`` is before ``start``.
+
+        :param start: first date of the range
+        :type start: :py:class:`~datetime.datetime` or
+          :py:class:`~datetime.date`
+        :param end: last date of the range
+        :type end: :py:class:`~datetime.datetime` or :py:class:`~datetime.date`
+        :param db_session: active database session to use for queries
+        :type db_session: sqlalchemy.orm.session.Session
+        :return: generator of BiweeklyPayPeriod instances
+        :rtype: ``generator``
+        """
+        d = BiweeklyPayPeriod._start_date_for(start)
+        last = BiweeklyPayPeriod._start_date_for(end)
+        while d <= last:
+            yield BiweeklyPayPeriod.for_start_date(d, db_session)
+            d += timedelta(days=PERIOD_INTERVAL_DAYS)
+
+    @staticmethod
+    def _start_date_for(dt):
+        """
+        Return the start date of the pay period containing ``dt``.
+
+        :param dt: datetime or date to find the pay period start date for
+        :type dt: :py:class:`~datetime.datetime` or :py:class:`~datetime.date`
+        :return: start date of the pay period containing ``dt``
+        :rtype: datetime.date
+        """
         if isinstance(dt, datetime):
             dt = dt.date()
-        if dt < p.start_date:
-            while True:
-                if p.end_date >= dt >= p.start_date:
-                    return p
-                p = p.previous
-        if dt > p.end_date:
-            while True:
-                if p.end_date >= dt >= p.start_date:
-                    return p
-                p = p.next
-        return p
+        first = settings.PAY_PERIOD_START_DATE
+        if isinstance(first, datetime):
+            first = first.date()
+        num_periods = (dt - first).days // PERIOD_INTERVAL_DAYS
+        return first + timedelta(days=(num_periods * PERIOD_INTERVAL_DAYS))
 
     def filter_query(self, query, date_prop):
         """
@@ -224,7 +388,7 @@ class BiweeklyPayPeriod(object):
         :rtype: sqlalchemy.orm.query.Query
         """
         return self.filter_query(
-            self._db.query(Transaction),
+            self._db.query(Transaction).options(*TRANSACTION_LOAD_OPTIONS),
             Transaction.date
         )
 
@@ -238,8 +402,9 @@ class BiweeklyPayPeriod(object):
         :rtype: sqlalchemy.orm.query.Query
         """
         return self.filter_query(
-            self._db.query(ScheduledTransaction).filter(
-                ScheduledTransaction.is_active.__eq__(True)),
+            self._db.query(ScheduledTransaction).options(
+                *SCHED_TRANS_LOAD_OPTIONS
+            ).filter(ScheduledTransaction.is_active.__eq__(True)),
             ScheduledTransaction.date
         )
 
@@ -252,7 +417,9 @@ class BiweeklyPayPeriod(object):
           per period, for this pay period.
         :rtype: sqlalchemy.orm.query.Query
         """
-        return self._db.query(ScheduledTransaction).filter(
+        return self._db.query(ScheduledTransaction).options(
+            *SCHED_TRANS_LOAD_OPTIONS
+        ).filter(
             ScheduledTransaction.schedule_type.__eq__('per period'),
             ScheduledTransaction.is_active.__eq__(True)
         ).order_by(
@@ -271,14 +438,18 @@ class BiweeklyPayPeriod(object):
         """
         if self.start_date.day < self.end_date.day:
             # start and end dates are contiguous, in the same month
-            return self._db.query(ScheduledTransaction).filter(
+            return self._db.query(ScheduledTransaction).options(
+                *SCHED_TRANS_LOAD_OPTIONS
+            ).filter(
                 ScheduledTransaction.schedule_type.__eq__('monthly'),
                 ScheduledTransaction.is_active.__eq__(True),
                 ScheduledTransaction.day_of_month <= self.end_date.day,
                 ScheduledTransaction.day_of_month >= self.start_date.day
             )
         # else we span two months
-        return self._db.query(ScheduledTransaction).filter(
+        return self._db.query(ScheduledTransaction).options(
+            *SCHED_TRANS_LOAD_OPTIONS
+        ).filter(
             ScheduledTransaction.schedule_type.__eq__('monthly'),
             ScheduledTransaction.is_active.__eq__(True),
             or_(
@@ -290,11 +461,11 @@ class BiweeklyPayPeriod(object):
     @property
     def transactions_list(self):
         """
-        Return an ordered list of dicts, each representing a transaction for
-        this pay period. Dicts have keys and values as described in
-        :py:meth:`~._trans_dict`.
+        Return an ordered list of :py:class:`~.PeriodTxn` records (read-only
+        mappings), each representing a transaction for this pay period.
+        Records have keys and values as described in :py:meth:`~._trans_dict`.
 
-        :return: ordered list of transaction dicts
+        :return: ordered list of transaction records
         :rtype: list
         """
         return self._data['all_trans_list']
@@ -314,6 +485,21 @@ class BiweeklyPayPeriod(object):
             ]
         return self._income_budget_id_list
 
+    @property
+    def _periodic_budgets(self):
+        """
+        Return a list of all active, periodic :py:class:`~.Budget` instances.
+
+        :return: list of active periodic Budgets
+        :rtype: list
+        """
+        if self._periodic_budget_list is None:
+            self._periodic_budget_list = self._db.query(Budget).filter(
+                Budget.is_active.__eq__(True),
+                Budget.is_periodic.__eq__(True)
+            ).all()
+        return self._periodic_budget_list
+
     @property
     def _data(self):
         """
@@ -325,16 +511,45 @@ class BiweeklyPayPeriod(object):
         """
         if len(self._data_cache) > 0:
             return self._data_cache
+        self._build_data_cache(
+            self._transactions().all(),
+            self._scheduled_transactions_date().all(),
+            self._scheduled_transactions_per_period().all(),
+            self._scheduled_transactions_monthly().all()
+        )
+        return self._data_cache
+
+    def _build_data_cache(self, transactions, st_date, st_per_period,
+                          st_monthly):
+        """
+        Populate the object-local data cache (``self._data_cache``) from the
+        given lists of model instances, and calculate the combined transaction
+        list and sums from them. This is called by :py:attr:`~._data` with the
+        results of this period's own queries, and by
+        :py:meth:`~.PayPeriodRange.load` with slices of data loaded for many
+        periods at once.
+
+        :param transactions: all :py:class:`~.Transaction` in this period
+        :type transactions: list
+        :param st_date: active date-based :py:class:`~.ScheduledTransaction`
+          in this period
+        :type st_date: list
+        :param st_per_period: active per-period
+          :py:class:`~.ScheduledTransaction`
+        :type st_per_period: list
+        :param st_monthly: active monthly :py:class:`~.ScheduledTransaction`
+          in this period
+        :type st_monthly: list
+        """
         self._data_cache = {
-            'transactions': self._transactions().all(),
-            'st_date': self._scheduled_transactions_date().all(),
-            'st_per_period': self._scheduled_transactions_per_period().all(),
-            'st_monthly': self._scheduled_transactions_monthly().all()
+            'transactions': transactions,
+            'st_date': st_date,
+            'st_per_period': st_per_period,
+            'st_monthly': st_monthly
         }
         self._data_cache['all_trans_list'] = self._make_combined_transactions()
         self._data_cache['budget_sums'] = self._make_budget_sums()
         self._data_cache['overall_sums'] = self._make_overall_sums()
-        return self._data_cache
 
     def clear_cache(self):
         """
@@ -342,35 +557,36 @@ class BiweeklyPayPeriod(object):
         `self._data_cache` and returned by :py:attr:`~._data`.
         """
         self._data_cache = {}
+        self._periodic_budget_list = None
 
     def _make_combined_transactions(self):
         """
         Combine all Transactions and ScheduledTransactions from
-        ``self._data_cache`` into one ordered list of similar dicts, adding
+        ``self._data_cache`` into one ordered list of :py:class:`~.PeriodTxn`
+        records (see :py:meth:`~._trans_dict`), adding
         dates to the monthly ScheduledTransactions as appropriate and excluding
         ScheduledTransactions that have been converted to real Transactions.
         Store the finished list back into ``self._data_cache``.
         """
-        unordered = []
+        per_period = []
+        others = []
         # ScheduledTransaction ID to count of real trans for each
         st_ids = defaultdict(int)
         for t in self._data_cache['transactions']:
-            unordered.append(self._trans_dict(t))
+            others.append(self._trans_dict(t))
             if t.scheduled_trans_id is not None:
                 st_ids[t.scheduled_trans_id] += 1
         for t in self._data_cache['st_date']:
             if t.id not in st_ids:
-                unordered.append(self._trans_dict(t))
+                others.append(self._trans_dict(t))
         for t in self._data_cache['st_monthly']:
             if t.id not in st_ids:
-                unordered.append(self._trans_dict(t))
-        ordered = []
+                others.append(self._trans_dict(t))
         for t in self._data_cache['st_per_period']:
-            d = self._trans_dict(t)
-            for _ in range(0, (t.num_per_period - st_ids[t.id])):
-                ordered.append(d)
-        for t in sorted(unordered, key=lambda k: k['date']):
-            ordered.append(t)
+            # the same record is referenced once per remaining occurrence
+            per_period.extend(
+                [self._trans_dict(t)] * (t.num_per_period - st_ids[t.id])
+            )
 
         def sortkey(k):
             d = k.get('date', None)
@@ -378,7 +594,11 @@ class BiweeklyPayPeriod(object):
                 d = date.min
             return d, k['amount']
 
-        return sorted(ordered, key=sortkey)
+        # a single stable sort; per-period records (no date) sort first, and
+        # ties keep the order above
+        per_period.extend(others)
+        per_period.sort(key=sortkey)
+        return per_period
 
     @property
     def budget_sums(self):
@@ -416,10 +636,7 @@ class BiweeklyPayPeriod(object):
         :rtype: dict
         """
         res = {}
-        for b in self._db.query(Budget).filter(
-            Budget.is_active.__eq__(True),
-            Budget.is_periodic.__eq__(True)
-        ).all():
+        for b in self._periodic_budgets:
             res[b.id] = {
                 'budget_amount': b.starting_balance,
                 'allocated': Decimal('0.0'),
@@ -558,10 +775,11 @@ class BiweeklyPayPeriod(object):
 
     def _trans_dict(self, t):
         """
-        Given a Transaction or ScheduledTransaction, return a dict of a
-        common format describing the object.
+        Given a Transaction or ScheduledTransaction, return a
+        :py:class:`~.PeriodTxn` record of a common format describing the
+        object.
 
-        The resulting dict will have the following layout:
+        The resulting record will have the following fields:
 
         * ``type`` (**str**) "Transaction" or "ScheduledTransaction"
         * ``id`` (**int**) the id of the object
@@ -590,8 +808,8 @@ class BiweeklyPayPeriod(object):
 
         :param t: the object to return a dict for
         :type t: :py:class:`~.Transaction` or :py:class:`~.ScheduledTransaction`
-        :return: dict describing ``t``
-        :rtype: dict
+        :return: record describing ``t``
+        :rtype: PeriodTxn
         """
         if isinstance(t, Transaction):
             return self._dict_for_trans(t)
@@ -599,10 +817,10 @@ class BiweeklyPayPeriod(object):
 
     def _dict_for_trans(self, t):
         """
-        Return a dict describing the Transaction t. Called from
-        :py:meth:`~._trans_dict`.
+        Return a :py:class:`~.PeriodTxn` describing the Transaction t. Called
+        from :py:meth:`~._trans_dict`.
 
-        The resulting dict will have the following layout:
+        The resulting record will have the following fields:
 
         * ``type`` (**str**) "Transaction" or "ScheduledTransaction"
         * ``id`` (**int**) the id of the object
@@ -631,46 +849,39 @@ class BiweeklyPayPeriod(object):
 
         :param t: transaction to describe
         :type t: Transaction
-        :return: common-format dict describing ``t``
-        :rtype: dict
+        :return: common-format record describing ``t``
+        :rtype: PeriodTxn
         """
-        res = {
-            'type': 'Transaction',
-            'id': t.id,
-            'date': t.date,
-            'sched_type': None,
-            'sched_trans_id': t.scheduled_trans_id,
-            'description': t.description,
-            'amount': t.actual_amount,
-            'account_id': t.account_id,
-            'account_name': t.account.name,
-            'planned_budget_id': t.planned_budget_id,
-            'planned_budget_name': None,
-            'budgets': {
+        return PeriodTxn(
+            type='Transaction',
+            id=t.id,
+            date=t.date,
+            sched_type=None,
+            sched_trans_id=t.scheduled_trans_id,
+            description=t.description,
+            amount=t.actual_amount,
+            budgeted_amount=t.budgeted_amount,
+            account_id=t.account_id,
+            account_name=t.account.name,
+            reconcile_id=(None if t.reconcile is None else t.reconcile.id),
+            planned_budget_id=t.planned_budget_id,
+            planned_budget_name=(
+                None if t.planned_budget is None else t.planned_budget.name
+            ),
+            budgets={
                 bt.budget_id: {
                     'amount': bt.amount,
                     'name': bt.budget.name
                 } for bt in t.budget_transactions
             }
-        }
-        if t.reconcile is None:
-            res['reconcile_id'] = None
-        else:
-            res['reconcile_id'] = t.reconcile.id
-        if t.budgeted_amount is None:
-            res['budgeted_amount'] = None
-        else:
-            res['budgeted_amount'] = t.budgeted_amount
-        if t.planned_budget is not None:
-            res['planned_budget_name'] = t.planned_budget.name
-        return res
+        )
 
     def _dict_for_sched_trans(self, t):
         """
-        Return a dict describing the ScheduledTransaction t. Called from
-        :py:meth:`~._trans_dict`.
+        Return a :py:class:`~.PeriodTxn` describing the ScheduledTransaction t.
+        Called from :py:meth:`~._trans_dict`.
 
-        The resulting dict will have the following layout:
+        The resulting record will have the following fields:
 
         * ``type`` (**str**) "Transaction" or "ScheduledTransaction"
         * ``id`` (**int**) the id of the object
@@ -693,57 +904,484 @@ class BiweeklyPayPeriod(object):
 
         :param t: ScheduledTransaction to describe
         :type t: ScheduledTransaction
-        :return: common-format dict describing ``t``
-        :rtype: dict
+        :return: common-format record describing ``t``
+        :rtype: PeriodTxn
         """
-        res = {
-            'type': 'ScheduledTransaction',
-            'id': t.id,
-            'sched_type': t.schedule_type,
-            'sched_trans_id': None,
-            'description': t.description,
-            'amount': t.amount,
-            'budgeted_amount': None,
-            'account_id': t.account_id,
-            'account_name': t.account.name,
-            'reconcile_id': None,
-            'budgets': {
-                t.budget_id: {
-                    'name': t.budget.name,
-                    'amount': t.amount
-                }
-            }
-        }
         if t.schedule_type == 'date':
-            res['date'] = t.date
-            return res
-        if t.schedule_type == 'per period':
-            res['date'] = None
-            return res
-        # else it's a monthly transaction, and we need to figure out the date
-        # for it that falls in this PayPeriod.
-        if self.start_date.day <= t.day_of_month <= self.end_date.day:
-            res['date'] = date(
+            d = t.date
+        elif t.schedule_type == 'per period':
+            d = None
+        elif self.start_date.day <= t.day_of_month <= self.end_date.day:
+            # monthly, and falls in this PayPeriod
+            d = date(
                 year=self.start_date.year,
                 month=self.start_date.month,
                 day=t.day_of_month
             )
-            return res
-        # If we got here, we're in a pay period that spans two months; i.e.
-        # start_date.day > end_date.day.
-        if t.day_of_month >= self.start_date.day:
-            # in the same month as start_date.day
-            res['date'] = date(
+        elif t.day_of_month >= self.start_date.day:
+            # we're in a pay period that spans two months; i.e.
+            # start_date.day > end_date.day, and in the same month as
+            # start_date.day
+            d = date(
                 year=self.start_date.year,
                 month=self.start_date.month,
                 day=t.day_of_month
             )
+        else:
+            # t.day_of_month < self.start_date.day, which means it's actually
+            # ``t.day_of_month`` in the next month...
+            d = date(
+                year=self.start_date.year,
+                month=self.start_date.month,
+                day=t.day_of_month
+            ) + relativedelta.relativedelta(months=1)
+        return PeriodTxn(
+            type='ScheduledTransaction',
+            id=t.id,
+            date=d,
+            sched_type=t.schedule_type,
+            sched_trans_id=None,
+            description=t.description,
+            amount=t.amount,
+            budgeted_amount=None,
+            account_id=t.account_id,
+            account_name=t.account.name,
+            reconcile_id=None,
+            budgets={
+                t.budget_id: {
+                    'name': t.budget.name,
+                    'amount': t.amount
+                }
+            }
+        )
+
+
+class PayPeriodRegistry(object):
+    """
+    Identity map of canonical :py:class:`~.BiweeklyPayPeriod` instances, keyed
+    by start date, stored in a database session's
+    :py:attr:`~sqlalchemy.orm.session.Session.info` dict. Because the Flask
+    app's session is removed at the end of every request, this makes the
+    registry request-scoped: every :py:attr:`~.BiweeklyPayPeriod.next`,
+    :py:attr:`~.BiweeklyPayPeriod.previous`,
+    :py:meth:`~.BiweeklyPayPeriod.period_for_date` and
+    :py:meth:`~.BiweeklyPayPeriod.periods_between` call for a given period
+    returns the same instance, along with its cached data.
+
+    The registry is cleared by
+    :py:func:`~biweeklybudget.db_event_handlers.handle_clear_period_registry`
+    whenever the session flushes, commits or rolls back, so that cached sums
+    never outlive the data they were calculated from.
+    """
+
+    #: Key in the session ``info`` dict that the registry is stored under.
+    INFO_KEY = 'biweeklypayperiod_registry'
+
+    def __init__(self, db_session):
+        """
+        Create a new, empty PayPeriodRegistry.
+
+        :param db_session: active database session to use for queries
+        :type db_session: sqlalchemy.orm.session.Session
+        """
+        self._db = db_session
+        self._periods = {}
+        self._dates = {}
+
+    def __len__(self):
+        return len(self._periods)
+
+    def get(self, start_date):
+        """
+        Return the canonical BiweeklyPayPeriod starting on ``start_date``,
+        creating it if it does not yet exist.
+
+        :param start_date: starting date of the pay period
+        :type start_date: datetime.date
+        :return: canonical BiweeklyPayPeriod starting on ``start_date``
+        :rtype: BiweeklyPayPeriod
+        """
+        if isinstance(start_date, datetime):
+            start_date = start_date.date()
+        if start_date not in self._periods:
+            self._periods[start_date] = BiweeklyPayPeriod(start_date, self._db)
+        return self._periods[start_date]
+
+    def period_for_date(self, dt):
+        """
+        Return the canonical BiweeklyPayPeriod containing ``dt``. The
+        date-to-period lookup is memoized.
+
+        :param dt: datetime or date to find the pay period for
+        :type dt: :py:class:`~datetime.datetime` or :py:class:`~datetime.date`
+        :return: canonical BiweeklyPayPeriod containing ``dt``
+        :rtype: BiweeklyPayPeriod
+        """
+        if isinstance(dt, datetime):
+            dt = dt.date()
+        if dt not in self._dates:
+            self._dates[dt] = BiweeklyPayPeriod._start_date_for(dt)
+        return self.get(self._dates[dt])
+
+    @staticmethod
+    def for_session(db_session):
+        """
+        Return the PayPeriodRegistry for ``db_session``, creating it if needed.
+        Returns None if the session has no ``info`` dict to store it in.
+
+        :param db_session: active database session
+        :type db_session: sqlalchemy.orm.session.Session
+        :return: registry for the session, or None
+        :rtype: PayPeriodRegistry
+        """
+        info = getattr(db_session, 'info', None)
+        if not isinstance(info, dict):
+            return None
+        if PayPeriodRegistry.INFO_KEY not in info:
+            info[PayPeriodRegistry.INFO_KEY] = PayPeriodRegistry(db_session)
+        return info[PayPeriodRegistry.INFO_KEY]
+
+    @staticmethod
+    def clear(db_session):
+        """
+        Remove the PayPeriodRegistry (if any) from ``db_session``, discarding
+        all canonical instances and their cached data.
+
+        :param db_session: active database session
+        :type db_session: sqlalchemy.orm.session.Session
+        """
+        info = getattr(db_session, 'info', None)
+        if isinstance(info, dict):
+            info.pop(PayPeriodRegistry.INFO_KEY, None)
+
+
+class PayPeriodRange(object):
+    """
+    A contiguous range of :py:class:`~.BiweeklyPayPeriod` instances whose data
+    is loaded together. Rather than each period issuing its own queries for
+    Transactions, ScheduledTransactions and Budgets, :py:meth:`~.load` loads
+    everything for the whole date span in a constant number of queries and
+    then slices it in memory per period. The number of queries is the same
+    whether the range contains three periods or twenty-six.
+    """
+
+    def __init__(self, first_period, num_periods):
+        """
+        Create a new PayPeriodRange.
+
+        :param first_period: the first pay period in the range
+        :type first_period: BiweeklyPayPeriod
+        :param num_periods: total number of consecutive pay periods in the
+          range, including ``first_period``
+        :type num_periods: int
+        """
+        if num_periods < 1:
+            raise ValueError('num_periods must be at least 1')
+        self._db = first_period._db
+        self._periods = [first_period]
+        while len(self._periods) < num_periods:
+            self._periods.append(self._periods[-1].next)
+
+    def __repr__(self):
+        return '<PayPeriodRange(%s, %d)>' % (
+            self.start_date.strftime('%Y-%m-%d'), len(self._periods)
+        )
+
+    def __iter__(self):
+        return iter(self._periods)
+
+    def __len__(self):
+        return len(self._periods)
+
+    def __getitem__(self, idx):
+        return self._periods[idx]
+
+    @property
+    def periods(self):
+        """
+        Return the list of pay periods in this range, in order.
+
+        :return: list of pay periods
+        :rtype: list
+        """
+        return self._periods
+
+    @property
+    def start_date(self):
+        """
+        Return the start date of the first pay period in the range.
+
+        :return: first date in the range
+        :rtype: datetime.date
+        """
+        return self._periods[0].start_date
+
+    @property
+    def end_date(self):
+        """
+        Return the end date of the last pay period in the range.
+
+        :return: last date in the range
+        :rtype: datetime.date
+        """
+        return self._periods[-1].end_date
+
+    def _index_for_date(self, d):
+        """
+        Return the index in :py:attr:`~.periods` of the pay period containing
+        date ``d``.
+
+        :param d: date within the range
+        :type d: datetime.date
+        :return: index of the period containing ``d``
+        :rtype: int
+        """
+        return (d - self.start_date).days // PERIOD_INTERVAL_DAYS
+
+    def load(self):
+        """
+        Load and calculate data for every pay period in the range that does not
+        already have cached data, using one query each for Transactions and
+        periodic Budgets, and a single
+        :py:meth:`~.ScheduledTransaction.expand` query for all active
+        ScheduledTransactions. Returns the range itself, for chaining.
+
+        :return: this PayPeriodRange
+        :rtype: PayPeriodRange
+        """
+        to_load = [p for p in self._periods if len(p._data_cache) == 0]
+        if len(to_load) == 0:
+            return self
+        logger.debug('Loading data for %d periods of %s', len(to_load), self)
+        trans = [[] for _ in self._periods]
+        for t in self._db.query(Transaction).options(
+            *TRANSACTION_LOAD_OPTIONS
+        ).filter(
+            Transaction.date >= self.start_date,
+            Transaction.date <= self.end_date
+        ).all():
+            trans[self._index_for_date(t.date)].append(t)
+        # Transactions converted from ScheduledTransactions are excluded later,
+        # by _make_combined_transactions(); here we just want the
+        # ScheduledTransactions that apply to each period.
+        st_date = [[] for _ in self._periods]
+        st_monthly = [[] for _ in self._periods]
+        st_per_period = []
+        seen = set()
+        for occ in ScheduledTransaction.expand(
+            self._db, [(p.start_date, p.end_date) for p in self._periods],
+            exclude_converted=False, options=SCHED_TRANS_LOAD_OPTIONS
+        ):
+            st = occ.scheduled_transaction
+            if (occ.period_index, st.id) in seen:
+                continue
+            seen.add((occ.period_index, st.id))
+            if st.date is not None:
+                st_date[occ.period_index].append(st)
+            elif st.day_of_month is not None:
+                st_monthly[occ.period_index].append(st)
+            elif occ.period_index == 0:
+                st_per_period.append(st)
+        budgets = self._periods[0]._periodic_budgets
+        for idx, p in enumerate(self._periods):
+            if len(p._data_cache) > 0:
+                continue
+            p._periodic_budget_list = budgets
+            p._build_data_cache(
+                trans[idx], st_date[idx], st_per_period, st_monthly[idx]
+            )
+        return self
+
+    def budget_sums_by_period(self):
+        """
+        Load the range (see :py:meth:`~.load`) and return the stored portion
+        of :py:attr:`~.BiweeklyPayPeriod.budget_sums` for every pay period in
+        it, in the format returned by :py:meth:`~.stored_budget_sums`.
+
+        :return: per-period, per-budget sums
+        :rtype: dict
+        """
+        self.load()
+        return {
+            p.start_date: {
+                budg_id: {
+                    'allocated': sums['allocated'],
+                    'spent': sums['spent'],
+                    'trans_total': sums['trans_total']
+                } for budg_id, sums in p.budget_sums.items()
+            } for p in self._periods
+        }
+
+    @staticmethod
+    def read_budget_sums(conn, start_date, end_date):
+        """
+        Read the stored :py:class:`~.PeriodBudgetSum` rows for every pay period
+        starting from ``start_date`` through ``end_date`` that has a
+        :py:class:`~.PeriodBudgetSumPeriod` marker, with a single query.
+
+        :param conn: database session or connection to query with
+        :type conn: sqlalchemy.orm.session.Session or
+          sqlalchemy.engine.Connection
+        :param start_date: start date of the first pay period to read
+        :type start_date: datetime.date
+        :param end_date: start date of the last pay period to read
+        :type end_date: datetime.date
+        :return: per-period, per-budget stored sums, in the format returned by
+          :py:meth:`~.stored_budget_sums`; only periods with a marker are
+          present
+        :rtype: dict
+        """
+        mtbl = PeriodBudgetSumPeriod.__table__
+        stbl = PeriodBudgetSum.__table__
+        res = {}
+        for row in conn.execute(select([
+            mtbl.c.period_start, stbl.c.budget_id, stbl.c.allocated,
+            stbl.c.spent, stbl.c.trans_total
+        ]).select_from(
+            mtbl.outerjoin(stbl, stbl.c.period_start == mtbl.c.period_start)
+        ).where(and_(
+            mtbl.c.period_start >= start_date,
+            mtbl.c.period_start <= end_date
+        ))):
+            sums = res.setdefault(row.period_start, {})
+            if row.budget_id is not None:
+                sums[row.budget_id] = {
+                    'allocated': row.allocated,
+                    'spent': row.spent,
+                    'trans_total': row.trans_total
+                }
+        return res
+
+    @staticmethod
+    def insert_budget_sums(conn, sums):
+        """
+        Insert a :py:class:`~.PeriodBudgetSumPeriod` marker and the
+        :py:class:`~.PeriodBudgetSum` rows for every pay period in ``sums``.
+
+        :param conn: database session or connection to insert with
+        :type conn: sqlalchemy.orm.session.Session or
+          sqlalchemy.engine.Connection
+        :param sums: per-period, per-budget sums, in the format returned by
+          :py:meth:`~.stored_budget_sums`
+        :type sums: dict
+        """
+        if len(sums) == 0:
+            return
+        conn.execute(
+            PeriodBudgetSumPeriod.__table__.insert(),
+            [{'period_start': d} for d in sorted(sums.keys())]
+        )
+        rows = [
+            dict(period_start=d, budget_id=budg_id, **vals)
+            for d in sorted(sums.keys())
+            for budg_id, vals in sorted(sums[d].items())
+        ]
+        if len(rows) > 0:
+            conn.execute(PeriodBudgetSum.__table__.insert(), rows)
+
+    def _can_store_sums(self):
+        """
+        Return whether sums calculated from this range's session may be stored;
+        i.e. whether the session has no pending changes and has not flushed
+        any uncommitted data changes.
+
+        :return: whether calculated sums may be stored
+        :rtype: bool
+        """
+        for coll in [self._db.new, self._db.dirty, self._db.deleted]:
+            if len(coll) > 0:
+                return False
+        return not self._db.info.get(DATA_CHANGED_INFO_KEY, False)
+
+    def _store_budget_sums(self, sums, generation):
+        """
+        Insert calculated ``sums`` (see :py:meth:`~.insert_budget_sums`) in
+        their own transaction on a separate connection, unless
+        :py:attr:`~.PERIOD_SUMS_GENERATION_SETTING` has changed since
+        ``generation`` was read. If another process stored any of the same
+        periods first, read the committed sums for them instead.
+
+        :param sums: per-period, per-budget calculated sums
+        :type sums: dict
+        :param generation: value of the generation setting in the snapshot
+          that ``sums`` were calculated from
+        :type generation: str
+        :return: committed sums for any periods that were stored by another
+          process; these replace the calculated ones
+        :rtype: dict
+        """
+        tbl = DBSetting.__table__
+        try:
+            with self._db.get_bind().connect() as conn:
+                with conn.begin():
+                    current = conn.execute(
+                        select([tbl.c.value]).where(
+                            tbl.c.name == PERIOD_SUMS_GENERATION_SETTING
+                        ).with_for_update()
+                    ).scalar()
+                    if current != generation:
+                        logger.debug(
+                            'Stored budget sums were removed; not storing '
+                            'sums for %s', self
+                        )
+                        return {}
+                    self.insert_budget_sums(conn, sums)
+        except IntegrityError:
+            logger.debug(
+                'Budget sums for %s already stored; re-reading them', self
+            )
+            with self._db.get_bind().connect() as conn:
+                return self.read_budget_sums(
+                    conn, min(sums.keys()), max(sums.keys())
+                )
+        return {}
+
+    def stored_budget_sums(self):
+        """
+        Return the materialized :py:class:`~.PeriodBudgetSum` data for every
+        pay period in the range. All stored rows for the range are read with a
+        single query. Stored sums are kept up to date by
+        :py:func:`~biweeklybudget.db_event_handlers.handle_period_budget_sums`
+        and :py:func:`~.handle_recalculate_period_budget_sums` in the same
+        transaction as the changes that affect them.
+
+        Any period that is not stored (has no
+        :py:class:`~.PeriodBudgetSumPeriod` marker) has its :py:attr:`~.BiweeklyPayPeriod.budget_sums` calculated
+        (periods are loaded together via :py:meth:`~.load`). If the session
+        has no pending or flushed-but-uncommitted changes, the calculated sums
+        are then stored in their own transaction on a separate connection, so
+        that reading the sums never commits the session's transaction.
+
+        The return value is a dict keyed by period start date, whose values
+        are dicts keyed by Budget ID; each of those is a dict with
+        ``allocated``, ``spent`` and ``trans_total`` keys, matching the same
+        keys in :py:attr:`~.BiweeklyPayPeriod.budget_sums`.
+
+        :return: per-period, per-budget stored sums
+        :rtype: dict
+        """
+        res = self.read_budget_sums(
+            self._db, self.start_date, self._periods[-1].start_date
+        )
+        missing = [
+            idx for idx, p in enumerate(self._periods)
+            if p.start_date not in res
+        ]
+        if len(missing) == 0:
             return res
-        # else t.day_of_month < self.start_date.day, which means it's actually
-        # ``t.day_of_month`` in the next month...
-        res['date'] = date(
-            year=self.start_date.year,
-            month=self.start_date.month,
-            day=t.day_of_month
-        ) + relativedelta.relativedelta(months=1)
+        logger.debug(
+            'Calculating budget sums for %d periods of %s', len(missing), self
+        )
+        generation = self._db.query(DBSetting.value).filter(
+            DBSetting.name.__eq__(PERIOD_SUMS_GENERATION_SETTING)
+        ).scalar()
+        calculated = PayPeriodRange(
+            self._periods[missing[0]], missing[-1] - missing[0] + 1
+        ).budget_sums_by_period()
+        calculated = {
+            d: v for d, v in calculated.items() if d not in res
+        }
+        res.update(calculated)
+        if self._can_store_sums():
+            res.update(self._store_budget_sums(calculated, generation))
         return res
@@ -41,15 +41,102 @@ import logging
 import time
 import os
 from sqlalchemy import event, inspect
-
-from biweeklybudget.models.account import Account
+from sqlalchemy.orm.util import identity_key
+
+from biweeklybudget import settings
+from biweeklybudget.biweeklypayperiod import (
+    BiweeklyPayPeriod, PayPeriodRange, PayPeriodRegistry,
+    DATA_CHANGED_INFO_KEY, PERIOD_INTERVAL_DAYS, PERIOD_SUMS_GENERATION_SETTING
+)
+from biweeklybudget.interest import PAYOFF_CACHE_SETTING
+from biweeklybudget.models.account import Account, AcctType
+from biweeklybudget.models.account_balance import AccountBalance
 from biweeklybudget.models.budget_model import Budget
 from biweeklybudget.models.budget_transaction import BudgetTransaction
+from biweeklybudget.models.dbsetting import DBSetting
+from biweeklybudget.models.ofx_statement import OFXStatement
 from biweeklybudget.models.ofx_transaction import OFXTransaction
+from biweeklybudget.models.period_budget_sum import PeriodBudgetSum
+from biweeklybudget.models.period_budget_sum_period import (
+    PeriodBudgetSumPeriod
+)
+from biweeklybudget.models.scheduled_transaction import ScheduledTransaction
+from biweeklybudget.models.transaction import Transaction
+from biweeklybudget.ofx_reclassify import (
+    OFXReclassifier, start_background_reclassify
+)
 from biweeklybudget.utils import fmt_currency
 
 logger = logging.getLogger(__name__)
 
+#: Name of the :py:class:`~.DBSetting` holding the data generation counter,
+#: which is incremented after every commit that changed data. Caches shared
+#: between processes (such as
+#: :py:meth:`~.NotificationsController.cached_notifications`) store the
+#: generation they were calculated at, and are invalid once it changes.
+DATA_GENERATION_SETTING = 'data-generation'
+
+#: Key in a session's ``info`` dict holding the set of start dates of pay
+#: periods whose stored budget sums were removed by
+#: :py:func:`~.handle_period_budget_sums`, to be recalculated by
+#: :py:func:`~.handle_recalculate_period_budget_sums`.
+PERIOD_SUMS_INFO_KEY = 'biweeklybudget_period_sums'
+
+#: Key in a session's ``info`` dict holding the set of Account IDs whose
+#: OFXTransactions should be reclassified in the background after commit; see
+#: :py:func:`~.handle_account_re_change`.
+RECLASSIFY_INFO_KEY = 'biweeklybudget_reclassify_accounts'
+
+
+def _related_instances(session, objs, rel_name, model, fk_attr):
+    """
+    Return the instances of ``model`` related to each of ``objs`` through
+    their ``rel_name`` relationship, without loading the relationship for
+    each object. Instances already loaded on the relationship or present in
+    the session's identity map are used directly; the rest are retrieved with
+    a single ``IN`` query on their ``fk_attr`` foreign key values.
+
+    :param session: current database session
+    :type session: sqlalchemy.orm.session.Session
+    :param objs: model instances to find related instances for
+    :type objs: list
+    :param rel_name: name of the many-to-one relationship attribute on
+      ``objs``
+    :type rel_name: str
+    :param model: class of the related instances
+    :type model: class
+    :param fk_attr: name of the foreign key attribute on ``objs``
+    :type fk_attr: str
+    :return: dict of ``id()`` of each object to its related instance (objects
+      with no related instance are omitted)
+    :rtype: dict
+    """
+    res = {}
+    for obj in objs:
+        if obj.__dict__.get(rel_name) is not None:
+            res[id(obj)] = obj.__dict__[rel_name]
+            continue
+        if getattr(obj, fk_attr) is None:
+            continue
+        inst = session.identity_map.get(
+            identity_key(model, getattr(obj, fk_attr))
+        )
+        if inst is not None:
+            res[id(obj)] = inst
+    missing = set(
+        getattr(obj, fk_attr) for obj in objs
+        if id(obj) not in res and getattr(obj, fk_attr) is not None
+    )
+    if len(missing) == 0:
+        return res
+    loaded = {
+        x.id: x for x in session.query(model).filter(model.id.in_(missing))
+    }
+    for obj in objs:
+        if id(obj) not in res and getattr(obj, fk_attr) in loaded:
+            res[id(obj)] = loaded[getattr(obj, fk_attr)]
+    return res
+
 
 def handle_budget_trans_amount_change(**kwargs):
     """
@@ -61,7 +148,8 @@ def handle_budget_trans_amount_change(**kwargs):
     If the BudgetTransaction's :py:attr:`~.BudgetTransaction.budget` uses a
     :py:class:`~.Budget` with :py:attr:`~.Budget.is_periodic` ``False`` (i.e. a
     standing budget), update the Budget's :py:attr:`~.Budget.current_balance`
-    for this transaction.
+    for this transaction immediately, so that it is correct before the next
+    flush.
 
     See: :py:meth:`sqlalchemy.orm.events.AttributeEvents.set`
 
@@ -88,7 +176,8 @@ def handle_budget_trans_amount_change(**kwargs):
         tgt.id, tgt.budget.id, oldvalue, value, old_budg_curr, new_budg
     )
     tgt.budget.current_balance = new_budg
-    session.add(tgt.budget)
+    if session is not None:
+        session.add(tgt.budget)
 
 
 def handle_new_or_deleted_budget_transaction(session):
@@ -99,71 +188,50 @@ def handle_new_or_deleted_budget_transaction(session):
     deletion of BudgetTransactions. For updates to existing BudgetTransactions,
     we rely on :py:func:`~.handle_budget_trans_amount_change`.
 
-    If the BudgetTransaction's :py:attr:`~.BudgetTransaction.budget` is a
+    For each of these whose :py:attr:`~.BudgetTransaction.budget` is a
     :py:class:`~.Budget` with :py:attr:`~.Budget.is_periodic` ``False`` (i.e. a
-    standing budget), update the Budget's :py:attr:`~.Budget.current_balance`
-    for this transaction.
+    standing budget), update the Budget's :py:attr:`~.Budget.current_balance`.
+    The Budgets are resolved together (see :py:func:`~._related_instances`)
+    and the changes are summed so that each Budget is updated once.
 
     :param session: current database session
     :type session: sqlalchemy.orm.session.Session
     """
-    # handle NEW
-    updated = 0
+    changes = []
     for obj in session.new:
-        if not isinstance(obj, BudgetTransaction):
-            continue
-        if obj.budget is not None:
-            budg = obj.budget
-        else:
-            budg = session.query(Budget).get(obj.budget_id)
-        if budg.is_periodic:
-            continue
-        logger.debug(
-            'Session has new BudgetTransaction referencing standing '
-            'budget id=%s', budg.id
-        )
-        old_amt = budg.current_balance
-        budg.current_balance = old_amt - obj.amount
-        logger.info(
-            'New BudgetTransaction (%s) for %s against standing budget id=%s; '
-            'update budget current_balance from %s to %s', obj,
-            fmt_currency(obj.amount), budg.id, fmt_currency(old_amt),
-            fmt_currency(budg.current_balance)
-        )
-        session.add(budg)
-        updated += 1
-    logger.debug(
-        'Done handling new BudgetTransactions; updated %d standing budgets',
-        updated
-    )
-    # handle DELETED
-    updated = 0
+        if isinstance(obj, BudgetTransaction):
+            changes.append((obj, -obj.amount))
     for obj in session.deleted:
-        if not isinstance(obj, BudgetTransaction):
+        if isinstance(obj, BudgetTransaction):
+            changes.append((obj, obj.amount))
+    if len(changes) == 0:
+        return
+    budgets = _related_instances(
+        session, [x[0] for x in changes], 'budget', Budget, 'budget_id'
+    )
+    deltas = {}
+    for obj, delta in changes:
+        budg = budgets.get(id(obj))
+        if budg is None or budg.is_periodic:
             continue
-        if obj.budget is not None:
-            budg = obj.budget
+        if id(budg) not in deltas:
+            deltas[id(budg)] = [budg, delta, 0]
         else:
-            budg = session.query(Budget).get(obj.budget_id)
-        if budg.is_periodic:
-            continue
-        logger.debug(
-            'Session has deleted BudgetTransaction referencing standing '
-            'budget id=%s', budg.id
-        )
+            deltas[id(budg)][1] += delta
+        deltas[id(budg)][2] += 1
+    for budg, delta, count in deltas.values():
         old_amt = budg.current_balance
-        budg.current_balance = old_amt + obj.amount
+        budg.current_balance = old_amt + delta
         logger.info(
-            'Deleted BudgetTransaction (%s) for %s against standing budget '
-            'id=%s; update budget current_balance from %s to %s',
-            obj, fmt_currency(obj.amount), budg.id,
-            fmt_currency(old_amt), fmt_currency(budg.current_balance)
+            '%d new or deleted BudgetTransaction(s) against standing '
+            'budget id=%s; update budget current_balance from %s to %s',
+            count, budg.id, fmt_currency(old_amt),
+            fmt_currency(budg.current_balance)
         )
         session.add(budg)
-        updated += 1
     logger.debug(
-        'Done handling deleted BudgetTransactions; '
-        'updated %d standing budgets', updated
+        'Done handling BudgetTransactions; updated %d standing budgets',
+        len(deltas)
     )
 
 
@@ -174,23 +242,33 @@ def handle_ofx_transaction_new_or_change(session):
     on the DB session, to handle setting the ``is_*`` fields on new or changed
     OFXTransaction instances according to its Account.
 
+    The compiled patterns for each Account (see
+    :py:meth:`~.OFXTransaction.account_is_patterns`) are looked up once per
+    flush, and the Accounts are resolved together (see
+    :py:func:`~._related_instances`).
+
     :param session: current database session
     :type session: sqlalchemy.orm.session.Session
     """
-    for obj in session.new:
-        if isinstance(obj, OFXTransaction):
-            try:
-                obj.update_is_fields()
-            except Exception:
-                logger.error('Error setting OFXTransaction is_ fields',
-                             exc_info=True)
-    for obj in session.dirty:
-        if isinstance(obj, OFXTransaction):
-            try:
-                obj.update_is_fields()
-            except Exception:
-                logger.error('Error setting OFXTransaction is_ fields',
-                             exc_info=True)
+    txns = [
+        obj for obj in list(session.new) + list(session.dirty)
+        if isinstance(obj, OFXTransaction)
+    ]
+    if len(txns) == 0:
+        return
+    accts = _related_instances(
+        session, txns, 'account', Account, 'account_id'
+    )
+    patterns = {}
+    for obj in txns:
+        try:
+            acct = accts[id(obj)]
+            if id(acct) not in patterns:
+                patterns[id(acct)] = OFXTransaction.account_is_patterns(acct)
+            obj.update_is_fields(patterns[id(acct)])
+        except Exception:
+            logger.error('Error setting OFXTransaction is_ fields',
+                         exc_info=True)
 
 
 def handle_account_re_change(session):
@@ -203,20 +281,20 @@ def handle_account_re_change(session):
     * :py:attr:`~.Account.re_other_fee`
     * :py:attr:`~.Account.re_payment`
 
-    When one of these regexes is changed on an Account, we trigger a re-run
-    of :py:meth:`~.OFXTransaction.update_is_fields` on all OFXTransactions for
-    the account.
+    When one of these regexes is changed on an Account, we re-classify the
+    ``is_*`` fields of all OFXTransactions for the account with
+    :py:class:`~.OFXReclassifier`, which uses bulk SQL instead of loading every
+    transaction. If the account has no more than
+    :py:attr:`~biweeklybudget.settings.OFX_RECLASSIFY_SYNC_LIMIT`
+    transactions, this is done in the current transaction; otherwise the
+    account is recorded in the session ``info`` dict and
+    :py:func:`~.handle_start_reclassify_jobs` reclassifies it in the
+    background once the regex change is committed.
 
     :param session: current database session
     :type session: sqlalchemy.orm.session.Session
     """
-    attrs = [
-        're_interest_paid',
-        're_interest_charge',
-        're_late_fee',
-        're_other_fee',
-        're_payment'
-    ]
+    attrs = sorted(OFXTransaction.IS_FIELDS.keys())
     for obj in session.dirty:
         if not isinstance(obj, Account):
             continue
@@ -234,14 +312,300 @@ def handle_account_re_change(session):
                 changed.append(attr)
         if len(changed) < 1:
             continue
+        OFXTransaction.invalidate_is_patterns(obj.id)
+        rc = OFXReclassifier(obj.id, {x: getattr(obj, x) for x in attrs})
+        count = rc.count(session)
+        if count > settings.OFX_RECLASSIFY_SYNC_LIMIT:
+            logger.info(
+                '%s has regex changes and %d OFXTransactions; will reclassify '
+                'them in the background after commit', obj, count
+            )
+            session.info.setdefault(RECLASSIFY_INFO_KEY, set()).add(obj.id)
+            continue
+        logger.debug(
+            '%s has regex changes; reclassifying its OFXTransactions', obj
+        )
+        rc.run(session)
+        # loaded instances now have stale is_* values
+        for inst in list(session.identity_map.values()):
+            if (
+                isinstance(inst, OFXTransaction) and
+                inst.account_id == obj.id and
+                inst not in session.dirty
+            ):
+                session.expire(inst, list(OFXTransaction.IS_FIELDS.values()))
+        logger.debug('Done reclassifying OFXTransactions for %s', obj)
+
+
+def _attr_values(obj, attr_name):
+    """
+    Return a list of all non-None current and previous (pre-flush) values of
+    attribute ``attr_name`` on ``obj``, loading the attribute if it is not
+    already loaded.
+
+    :param obj: the model instance
+    :param attr_name: name of the attribute
+    :type attr_name: str
+    :return: list of current and previous attribute values
+    :rtype: list
+    """
+    hx = getattr(inspect(obj).attrs, attr_name).load_history()
+    return [
+        x for x in (
+            list(hx.added or []) + list(hx.unchanged or []) +
+            list(hx.deleted or [])
+        ) if x is not None
+    ]
+
+
+def handle_period_budget_sums(session):
+    """
+    Handler to remove stale rows from the materialized
+    :py:class:`~.PeriodBudgetSum` table (and their
+    :py:class:`~.PeriodBudgetSumPeriod` markers) when the data they were
+    calculated from changes. The affected pay periods are recorded in the
+    session's ``info`` dict, and recalculated in the same transaction by
+    :py:func:`~.handle_recalculate_period_budget_sums` once the flush has
+    written the changes. When all rows are removed, they are recalculated on
+    demand by :py:meth:`~.PayPeriodRange.stored_budget_sums`, and the
+    :py:attr:`~biweeklybudget.biweeklypayperiod.PERIOD_SUMS_GENERATION_SETTING`
+    counter is incremented so that sums calculated from older data are not
+    stored.
+
+    * New, changed or deleted :py:class:`~.Transaction` - the pay period(s)
+      containing its current and previous date.
+    * New, changed or deleted :py:class:`~.BudgetTransaction` - the pay
+      period(s) containing the date of its current and previous Transaction.
+    * New, changed or deleted date-based :py:class:`~.ScheduledTransaction` -
+      the pay period(s) containing its current and previous date.
+    * Any monthly or per-period ScheduledTransaction change, new or deleted
+      periodic :py:class:`~.Budget`, or change to
+      :py:attr:`~.Budget.is_periodic` or :py:attr:`~.Budget.is_active` - all
+      rows.
+
+    :param session: current database session
+    :type session: sqlalchemy.orm.session.Session
+    """
+    dates = set()
+    invalidate_all = False
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Transaction):
+            obj_dates = _attr_values(obj, 'date')
+        elif isinstance(obj, BudgetTransaction):
+            obj_dates = []
+            for t in _attr_values(obj, 'transaction'):
+                obj_dates.extend(_attr_values(t, 'date'))
+        elif isinstance(obj, ScheduledTransaction):
+            if (
+                len(_attr_values(obj, 'day_of_month')) > 0 or
+                len(_attr_values(obj, 'num_per_period')) > 0
+            ):
+                # monthly or per-period; may affect every period
+                invalidate_all = True
+                break
+            obj_dates = _attr_values(obj, 'date')
+        elif isinstance(obj, Budget):
+            if obj in session.dirty:
+                if (
+                    len(_attr_values(obj, 'is_periodic')) > 1 or
+                    len(_attr_values(obj, 'is_active')) > 1
+                ):
+                    invalidate_all = True
+                    break
+            elif obj.is_periodic:
+                invalidate_all = True
+                break
+            continue
+        else:
+            continue
+        if len(obj_dates) == 0:
+            # can't tell which period(s) this affects
+            invalidate_all = True
+            break
+        dates.update(obj_dates)
+    tbl = PeriodBudgetSum.__table__
+    mtbl = PeriodBudgetSumPeriod.__table__
+    if invalidate_all:
+        logger.debug('Removing all PeriodBudgetSum rows')
+        session.execute(tbl.delete())
+        session.execute(mtbl.delete())
+        DBSetting.increment_counter(
+            session.connection(), PERIOD_SUMS_GENERATION_SETTING
+        )
+        session.info.pop(PERIOD_SUMS_INFO_KEY, None)
+        return
+    if len(dates) == 0:
+        return
+    starts = sorted(set(
+        BiweeklyPayPeriod.period_for_date(d, session).start_date
+        for d in dates
+    ))
+    logger.debug('Removing PeriodBudgetSum rows for periods: %s', starts)
+    session.execute(tbl.delete().where(tbl.c.period_start.in_(starts)))
+    session.execute(mtbl.delete().where(mtbl.c.period_start.in_(starts)))
+    session.info.setdefault(PERIOD_SUMS_INFO_KEY, set()).update(starts)
+
+
+def handle_recalculate_period_budget_sums(session, flush_context):
+    """
+    Hook into ``after_flush_postexec``
+    (:py:meth:`sqlalchemy.orm.events.SessionEvents.after_flush_postexec`) on
+    the DB session, to recalculate and store the budget sums of the pay
+    periods recorded by :py:func:`~.handle_period_budget_sums`, in the same
+    transaction as the changes that affected them. Each run of consecutive
+    periods is loaded together with :py:class:`~.PayPeriodRange`.
+
+    :param session: current database session
+    :type session: sqlalchemy.orm.session.Session
+    :param flush_context: internal SQLAlchemy object
+    :type flush_context: sqlalchemy.orm.session.UOWTransaction
+    """
+    starts = sorted(session.info.pop(PERIOD_SUMS_INFO_KEY, set()))
+    if len(starts) == 0:
+        return
+    runs = []
+    for start in starts:
+        if (
+            len(runs) > 0 and
+            (start - runs[-1][-1]).days == PERIOD_INTERVAL_DAYS
+        ):
+            runs[-1].append(start)
+        else:
+            runs.append([start])
+    sums = {}
+    for run in runs:
+        sums.update(PayPeriodRange(
+            BiweeklyPayPeriod.for_start_date(run[0], session), len(run)
+        ).budget_sums_by_period())
+    logger.debug('Storing recalculated budget sums for periods: %s', starts)
+    PayPeriodRange.insert_budget_sums(session, sums)
+
+
+def handle_payoff_cache_invalidation(session):
+    """
+    Handler to remove the cached credit card payoff results (the
+    :py:attr:`~biweeklybudget.interest.PAYOFF_CACHE_SETTING`
+    :py:class:`~.DBSetting`) when a new :py:class:`~.OFXStatement` or
+    :py:class:`~.AccountBalance` is added for an Account with
+    :py:attr:`~.Account.acct_type` of Credit. See
+    :py:meth:`~.InterestHelper.cached_payoffs`.
+
+    :param session: current database session
+    :type session: sqlalchemy.orm.session.Session
+    """
+    for obj in session.new:
+        if not isinstance(obj, (OFXStatement, AccountBalance)):
+            continue
+        acct = obj.account
+        if acct is None and obj.account_id is not None:
+            acct = session.query(Account).get(obj.account_id)
+        if acct is None or acct.acct_type != AcctType.Credit:
+            continue
         logger.debug(
-            '%s has regex changes; triggering update_is_fields() on all child '
-            'OFXTransactions.', obj
+            'New %s for credit account %s; removing cached payoffs', obj, acct
+        )
+        tbl = DBSetting.__table__
+        session.execute(
+            tbl.delete().where(tbl.c.name == PAYOFF_CACHE_SETTING)
         )
-        for stmt in obj.all_statements:
-            for txn in stmt.ofx_trans:
-                txn.update_is_fields()
-        logger.debug('Done with update_is_fields() for %s', obj)
+        setting = session.identity_map.get(
+            identity_key(DBSetting, PAYOFF_CACHE_SETTING)
+        )
+        if setting is not None:
+            session.expunge(setting)
+        return
+
+
+def handle_latest_balance(session):
+    """
+    Handler to keep :py:attr:`~.Account.latest_balance` pointing at the most
+    recent :py:class:`~.AccountBalance` of each Account. New AccountBalances
+    become the latest balance of their Account (in the order they were added
+    to the session); if the latest balance of an Account is deleted, the
+    pointer moves to the newest remaining AccountBalance, or None if there
+    are none.
+
+    :param session: current database session
+    :type session: sqlalchemy.orm.session.Session
+    """
+    deleted = [
+        obj for obj in session.deleted if isinstance(obj, AccountBalance)
+    ]
+    for obj in deleted:
+        acct = obj.account
+        if acct is None or acct.latest_balance is not obj:
+            continue
+        acct.latest_balance = session.query(AccountBalance).filter(
+            AccountBalance.account_id.__eq__(acct.id),
+            AccountBalance.id.notin_([x.id for x in deleted])
+        ).order_by(AccountBalance.id.desc()).first()
+        logger.debug(
+            'Latest AccountBalance of %s deleted; latest is now %s',
+            acct, acct.latest_balance
+        )
+    for obj in session.new:
+        if not isinstance(obj, AccountBalance):
+            continue
+        acct = obj.account
+        if acct is None and obj.account_id is not None:
+            acct = session.query(Account).get(obj.account_id)
+        if acct is None:
+            continue
+        acct.latest_balance = obj
+
+
+def handle_latest_statement(session):
+    """
+    Handler to keep :py:attr:`~.Account.latest_statement` pointing at the
+    latest (by :py:attr:`~.OFXStatement.as_of`) :py:class:`~.OFXStatement` of
+    each Account, when OFXStatements are added, deleted, or have their
+    ``as_of`` changed.
+
+    :param session: current database session
+    :type session: sqlalchemy.orm.session.Session
+    """
+    new = [x for x in session.new if isinstance(x, OFXStatement)]
+    deleted = [x for x in session.deleted if isinstance(x, OFXStatement)]
+    changed = [
+        x for x in session.dirty if isinstance(x, OFXStatement) and
+        session.is_modified(x) and
+        len(inspect(x).attrs.as_of.history.added) > 0
+    ]
+    if len(new) + len(deleted) + len(changed) == 0:
+        return
+    # statements whose persisted state is no longer current
+    stale_ids = [x.id for x in deleted + changed]
+    accts = []
+    for obj in new + deleted + changed:
+        acct = obj.account
+        if acct is None and obj.account_id is not None:
+            acct = session.query(Account).get(obj.account_id)
+        if acct is not None and acct not in accts:
+            accts.append(acct)
+    for acct in accts:
+        candidates = [
+            x for x in new + changed if x.account is acct or (
+                x.account is None and acct.id is not None and
+                x.account_id == acct.id
+            )
+        ]
+        if acct.id is not None:
+            q = session.query(OFXStatement).filter(
+                OFXStatement.account_id.__eq__(acct.id),
+                OFXStatement.as_of.isnot(None)
+            )
+            if len(stale_ids) > 0:
+                q = q.filter(OFXStatement.id.notin_(stale_ids))
+            candidates.append(q.order_by(OFXStatement.as_of.desc()).first())
+        candidates = [
+            x for x in candidates if x is not None and x.as_of is not None
+        ]
+        latest = None
+        if len(candidates) > 0:
+            latest = max(candidates, key=lambda x: x.as_of)
+        if acct.latest_statement is not latest:
+            logger.debug('Setting latest statement of %s to %s', acct, latest)
+            acct.latest_statement = latest
 
 
 def handle_before_flush(session, flush_context, instances):
@@ -253,6 +617,12 @@ def handle_before_flush(session, flush_context, instances):
     specific cases:
 
     * :py:func:`~.handle_new_or_deleted_budget_transaction`
+    * :py:func:`~.handle_ofx_transaction_new_or_change`
+    * :py:func:`~.handle_account_re_change`
+    * :py:func:`~.handle_period_budget_sums`
+    * :py:func:`~.handle_latest_balance`
+    * :py:func:`~.handle_latest_statement`
+    * :py:func:`~.handle_payoff_cache_invalidation`
 
     :param session: current database session
     :type session: sqlalchemy.orm.session.Session
@@ -264,9 +634,116 @@ def handle_before_flush(session, flush_context, instances):
     handle_new_or_deleted_budget_transaction(session)
     handle_ofx_transaction_new_or_change(session)
     handle_account_re_change(session)
+    handle_period_budget_sums(session)
+    handle_latest_balance(session)
+    handle_latest_statement(session)
+    handle_payoff_cache_invalidation(session)
     logger.debug('handle_before_flush done')
 
 
+def handle_clear_period_registry(session, *args):
+    """
+    Hook into ``after_flush``, ``after_commit`` and ``after_rollback``
+    (:py:class:`sqlalchemy.orm.events.SessionEvents`) on the DB session, to
+    discard the session's :py:class:`~.PayPeriodRegistry` (and with it, all
+    cached pay period data) whenever the underlying data may have changed.
+
+    :param session: current database session
+    :type session: sqlalchemy.orm.session.Session
+    :param args: other positional arguments passed by the event (ignored)
+    """
+    PayPeriodRegistry.clear(session)
+
+
+def mark_data_changed(session):
+    """
+    Mark the current transaction of ``session`` as having changed data, so
+    that :py:func:`~.handle_bump_data_generation` increments the data
+    generation when it commits. This is called for every flush that changes
+    model instances other than :py:class:`~.DBSetting`; code that changes data
+    with bulk SQL statements instead of the ORM should call it directly.
+
+    :param session: current database session
+    :type session: sqlalchemy.orm.session.Session
+    """
+    session.info[DATA_CHANGED_INFO_KEY] = True
+
+
+def handle_data_changed(session, flush_context):
+    """
+    Hook into ``after_flush``
+    (:py:meth:`sqlalchemy.orm.events.SessionEvents.after_flush`) on the DB
+    session, to call :py:func:`~.mark_data_changed` if the flush changed any
+    model instances other than :py:class:`~.DBSetting` (which holds caches and
+    other non-financial data).
+
+    :param session: current database session
+    :type session: sqlalchemy.orm.session.Session
+    :param flush_context: internal SQLAlchemy object
+    :type flush_context: sqlalchemy.orm.session.UOWTransaction
+    """
+    for coll in [session.new, session.dirty, session.deleted]:
+        for obj in coll:
+            if not isinstance(obj, DBSetting):
+                mark_data_changed(session)
+                return
+
+
+def handle_bump_data_generation(session):
+    """
+    Hook into ``after_commit``
+    (:py:meth:`sqlalchemy.orm.events.SessionEvents.after_commit`) on the DB
+    session. If the committed transaction changed data (see
+    :py:func:`~.mark_data_changed`), increment the
+    :py:attr:`~.DATA_GENERATION_SETTING` counter in its own transaction.
+    Because this happens after the commit, anything that read the previous
+    generation may have been calculated from the old data and is invalidated.
+
+    :param session: current database session
+    :type session: sqlalchemy.orm.session.Session
+    """
+    if not session.info.pop(DATA_CHANGED_INFO_KEY, False):
+        return
+    logger.debug('Data changed; incrementing data generation')
+    with session.get_bind().connect() as conn:
+        with conn.begin():
+            DBSetting.increment_counter(conn, DATA_GENERATION_SETTING)
+
+
+def handle_start_reclassify_jobs(session):
+    """
+    Hook into ``after_commit``
+    (:py:meth:`sqlalchemy.orm.events.SessionEvents.after_commit`) on the DB
+    session, to start background reclassification (see
+    :py:func:`~biweeklybudget.ofx_reclassify.start_background_reclassify`) of
+    the OFXTransactions of any Accounts that
+    :py:func:`~.handle_account_re_change` deferred.
+
+    :param session: current database session
+    :type session: sqlalchemy.orm.session.Session
+    """
+    for acct_id in sorted(session.info.pop(RECLASSIFY_INFO_KEY, set())):
+        start_background_reclassify(session.get_bind(), acct_id)
+
+
+def handle_discard_data_changed(session, *args):
+    """
+    Hook into ``after_rollback``
+    (:py:meth:`sqlalchemy.orm.events.SessionEvents.after_rollback`) on the DB
+    session, to discard the flag set by :py:func:`~.mark_data_changed`, any
+    reclassifications deferred by :py:func:`~.handle_account_re_change` and
+    any pay periods recorded by :py:func:`~.handle_period_budget_sums` for the
+    rolled-back transaction.
+
+    :param session: current database session
+    :type session: sqlalchemy.orm.session.Session
+    :param args: other positional arguments passed by the event (ignored)
+    """
+    session.info.pop(DATA_CHANGED_INFO_KEY, None)
+    session.info.pop(RECLASSIFY_INFO_KEY, None)
+    session.info.pop(PERIOD_SUMS_INFO_KEY, None)
+
+
 def query_profile_before(conn, cursor, statement, parameters, context, _):  # noqa
     """
     Query profiling database event listener, to be added as listener on the
@@ -325,3 +802,13 @@ def init_event_listeners(db_session, engine):
         'before_flush',
         handle_before_flush
     )
+    for evt_name in ['after_flush', 'after_commit', 'after_rollback']:
+        event.listen(db_session, evt_name, handle_clear_period_registry)
+    event.listen(db_session, 'after_flush', handle_data_changed)
+    event.listen(
+        db_session, 'after_flush_postexec',
+        handle_recalculate_period_budget_sums
+    )
+    event.listen(db_session, 'after_commit', handle_bump_data_generation)
+    event.listen(db_session, 'after_commit', handle_start_reclassify_jobs)
+    event.listen(db_session, 'after_rollback', handle_discard_data_changed)
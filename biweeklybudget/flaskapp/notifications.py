@@ -36,38 +36,45 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 """
 
 import logging
+import json
+import time
 from sqlalchemy import func
 from decimal import Decimal
 
+from biweeklybudget import settings
 from biweeklybudget.db import db_session
+from biweeklybudget.db_event_handlers import DATA_GENERATION_SETTING
 from biweeklybudget.utils import dtnow, fmt_currency
 from biweeklybudget.models.account import Account
+from biweeklybudget.models.dbsetting import DBSetting
 from biweeklybudget.models.budget_model import Budget
 from biweeklybudget.models.ofx_transaction import OFXTransaction
 from biweeklybudget.biweeklypayperiod import BiweeklyPayPeriod
 
 logger = logging.getLogger(__name__)
 
+#: Name of the :py:class:`~.DBSetting` that the result of
+#: :py:meth:`~.NotificationsController.get_notifications` is cached in.
+NOTIFICATIONS_CACHE_SETTING = 'notifications-cache'
+
 
 class NotificationsController(object):
 
     @staticmethod
     def num_stale_accounts(sess=None):
         """
-        Return the number of accounts with stale data.
-
-        @TODO This is a hack because I just cannot figure out how to do this
-        natively in SQLAlchemy.
+        Return the number of active accounts with stale data (see
+        :py:attr:`~.Account.is_stale`).
 
         :return: count of accounts with stale data
         :rtype: int
         """
         if sess is None:
             sess = db_session
-        return sum(
-            1 if a.is_stale else 0 for a in sess.query(
-                Account).filter(Account.is_active.__eq__(True)).all()
-        )
+        return sess.query(func.count(Account.id)).filter(
+            Account.is_active.__eq__(True),
+            Account.is_stale.__eq__(True)
+        ).scalar()
 
     @staticmethod
     def budget_account_sum(sess=None):
@@ -98,13 +105,16 @@ class NotificationsController(object):
         """
         if sess is None:
             sess = db_session
-        sum = Decimal('0.0')
-        for acct in sess.query(Account).filter(
+        ids = [
+            x[0] for x in sess.query(Account.id).filter(
                 Account.is_budget_source.__eq__(True),
                 Account.is_active.__eq__(True)
-        ):
-            sum += acct.unreconciled_sum
-        return sum
+            )
+        ]
+        return sum(
+            Account.unreconciled_sums(sess, account_ids=ids).values(),
+            Decimal('0.0')
+        )
 
     @staticmethod
     def standing_budgets_sum(sess=None):
@@ -156,7 +166,7 @@ class NotificationsController(object):
         return OFXTransaction.unreconciled(sess).count()
 
     @staticmethod
-    def get_notifications():
+    def get_notifications(sess=None):
         """
         Return all notifications that should be displayed at the top of pages,
         as a list in the order they should appear. Each list item is a dict
@@ -165,7 +175,7 @@ class NotificationsController(object):
         is the string content of the div.
         """
         res = []
-        num_stale = NotificationsController.num_stale_accounts()
+        num_stale = NotificationsController.num_stale_accounts(sess)
         if num_stale > 0:
             a = 'Accounts'
             if num_stale == 1:
@@ -176,10 +186,10 @@ class NotificationsController(object):
                            'class="alert-link">View Accounts</a>.' % (num_stale,
                                                                       a)
             })
-        accounts_bal = NotificationsController.budget_account_sum()
-        unrec_amt = NotificationsController.budget_account_unreconciled()
-        standing_bal = NotificationsController.standing_budgets_sum()
-        curr_pp = NotificationsController.pp_sum()
+        accounts_bal = NotificationsController.budget_account_sum(sess)
+        unrec_amt = NotificationsController.budget_account_unreconciled(sess)
+        standing_bal = NotificationsController.standing_budgets_sum(sess)
+        curr_pp = NotificationsController.pp_sum(sess)
         logger.info('accounts_bal=%s standing_bal=%s curr_pp=%s unrec=%s',
                     accounts_bal, standing_bal, curr_pp, unrec_amt)
         bal_sum = standing_bal + curr_pp + unrec_amt
@@ -219,7 +229,7 @@ class NotificationsController(object):
                                fmt_currency(unrec_amt)
                            )
             })
-        unreconciled_ofx = NotificationsController.num_unreconciled_ofx()
+        unreconciled_ofx = NotificationsController.num_unreconciled_ofx(sess)
         if unreconciled_ofx > 0:
             res.append({
                 'classes': 'alert alert-warning unreconciled-alert',
@@ -228,3 +238,56 @@ class NotificationsController(object):
                            '</a>.' % unreconciled_ofx
             })
         return res
+
+    @staticmethod
+    def cached_notifications(sess=None):
+        """
+        Return the result of :py:meth:`~.get_notifications`, using the copy
+        cached in the :py:attr:`~.NOTIFICATIONS_CACHE_SETTING`
+        :py:class:`~.DBSetting` if it was calculated at the current data
+        generation (see
+        :py:attr:`~biweeklybudget.db_event_handlers.DATA_GENERATION_SETTING`)
+        and less than
+        :py:attr:`~biweeklybudget.settings.NOTIFICATIONS_CACHE_SECONDS` ago.
+        The cache is in the database, so it is shared by all processes.
+
+        Otherwise, calculate the notifications and store them in the cache.
+        They are stored on a separate connection, so that the current session's
+        transaction is not committed.
+
+        :return: notifications, as returned by :py:meth:`~.get_notifications`
+        :rtype: list
+        """
+        if sess is None:
+            sess = db_session
+        if settings.NOTIFICATIONS_CACHE_SECONDS <= 0:
+            return NotificationsController.get_notifications(sess)
+        vals = dict(
+            sess.query(DBSetting.name, DBSetting.value).filter(
+                DBSetting.name.in_([
+                    DATA_GENERATION_SETTING, NOTIFICATIONS_CACHE_SETTING
+                ])
+            ).all()
+        )
+        generation = int(vals.get(DATA_GENERATION_SETTING) or 0)
+        if vals.get(NOTIFICATIONS_CACHE_SETTING) is not None:
+            j = json.loads(vals[NOTIFICATIONS_CACHE_SETTING])
+            if (
+                j['generation'] == generation and
+                time.time() - j['time'] < settings.NOTIFICATIONS_CACHE_SECONDS
+            ):
+                logger.debug(
+                    'Using cached notifications for generation %d', generation
+                )
+                return j['notifications']
+        res = NotificationsController.get_notifications(sess)
+        value = json.dumps({
+            'generation': generation,
+            'time': time.time(),
+            'notifications': res
+        })
+        with sess.get_bind().connect() as conn:
+            with conn.begin():
+                DBSetting.set_value(conn, NOTIFICATIONS_CACHE_SETTING, value)
+        logger.debug('Stored notifications for generation %d', generation)
+        return res
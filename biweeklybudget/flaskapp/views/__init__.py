@@ -47,4 +47,5 @@ from .transactions import *
 from .help import *
 from .fuel import *
 from .projects import *
+from .projection import *
 from .utils import *
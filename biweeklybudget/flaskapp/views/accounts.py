@@ -91,6 +91,7 @@ class AccountsView(MethodView):
             investment_accounts=db_session.query(Account).filter(
                 Account.acct_type == AcctType.Investment,
                 Account.is_active == True).all(),  # noqa
+            unreconciled_sums=Account.unreconciled_sums(db_session),
             interest_class_names=INTEREST_CALCULATION_NAMES.keys(),
             min_pay_class_names=MIN_PAYMENT_FORMULA_NAMES.keys(),
             accts=accts,
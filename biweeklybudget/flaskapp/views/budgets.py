@@ -48,7 +48,9 @@ from biweeklybudget.models.budget_transaction import BudgetTransaction
 from biweeklybudget.flaskapp.views.formhandlerview import FormHandlerView
 from biweeklybudget.models.account import Account
 from biweeklybudget.models.utils import do_budget_transfer
-from biweeklybudget.biweeklypayperiod import BiweeklyPayPeriod
+from biweeklybudget.biweeklypayperiod import (
+    BiweeklyPayPeriod, PayPeriodRange
+)
 from biweeklybudget.models.transaction import Transaction
 from biweeklybudget.utils import dtnow
 
@@ -319,10 +321,19 @@ class BudgetSpendingChartView(MethodView):
         logger.debug('budget_names=%s', budget_names)
         records = []
         budgets_present = set()
-        pp = BiweeklyPayPeriod.period_for_date(min_txn.date, db_session)
         dt_now = dtnow().date()
-        while pp.end_date <= dt_now:
-            sums = pp.budget_sums
+        periods = [
+            pp for pp in BiweeklyPayPeriod.periods_between(
+                min_txn.date, dt_now, db_session
+            ) if pp.end_date <= dt_now
+        ]
+        all_sums = {}
+        if len(periods) > 0:
+            all_sums = PayPeriodRange(
+                periods[0], len(periods)
+            ).stored_budget_sums()
+        for pp in periods:
+            sums = all_sums[pp.start_date]
             logger.debug('sums=%s', sums)
             records.append({
                 budget_names[y]: sums[y]['spent'] for y in sums.keys()
@@ -332,7 +343,6 @@ class BudgetSpendingChartView(MethodView):
             budgets_present.update(
                 [budget_names[y] for y in sums.keys() if y in budget_names]
             )
-            pp = pp.next
         res = {
             'data': records,
             'keys': sorted(list(budgets_present))
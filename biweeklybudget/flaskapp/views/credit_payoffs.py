@@ -38,7 +38,7 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 import logging
 import json
 from decimal import Decimal, ROUND_UP
-from datetime import datetime, timedelta
+from datetime import timedelta
 
 from flask.views import MethodView
 from flask import render_template, request, jsonify
@@ -46,7 +46,10 @@ from flask import render_template, request, jsonify
 from biweeklybudget.flaskapp.jsonencoder import MagicJSONEncoder
 from biweeklybudget.flaskapp.app import app
 from biweeklybudget.db import db_session
-from biweeklybudget.interest import InterestHelper
+from biweeklybudget.interest import (
+    InterestHelper, PAYMENT_SETTINGS_SETTING, payment_settings_json,
+    payment_settings_dict
+)
 from biweeklybudget.models.dbsetting import DBSetting
 from biweeklybudget.utils import fmt_currency, dtnow
 from biweeklybudget.models.account import NoInterestChargedError, Account
@@ -72,7 +75,7 @@ class CreditPayoffsView(MethodView):
         :return: list of payoffs suitable for rendering
         :rtype: list
         """
-        res = ih.calculate_payoffs()
+        res = ih.cached_payoffs()
         payoffs = []
         for methname in sorted(res.keys(), reverse=True):
             tmp = {
@@ -118,37 +121,9 @@ class CreditPayoffsView(MethodView):
             payoffs.append(tmp)
         return payoffs
 
-    def _payment_settings_dict(self, settings_json):
-        """
-        Given the JSON string payment settings, return a dict of payment
-        settings as expected by :py:class:`~.InterestHelper` kwargs.
-
-        :param settings_json: payment settings JSON
-        :type settings_json: str
-        :return: payment settings dict
-        :rtype: dict
-        """
-        res = {'increases': {}, 'onetimes': {}}
-        j = json.loads(settings_json)
-        for i in j['increases']:
-            if not i['enabled']:
-                continue
-            d = datetime.strptime(i['date'], '%Y-%m-%d').date()
-            res['increases'][d] = Decimal(i['amount'])
-        for i in j['onetimes']:
-            if not i['enabled']:
-                continue
-            d = datetime.strptime(i['date'], '%Y-%m-%d').date()
-            res['onetimes'][d] = Decimal(i['amount'])
-        return res
-
     def get(self):
-        setting = db_session.query(DBSetting).get('credit-payoff')
-        if setting is None:
-            pymt_settings_json = json.dumps({'increases': [], 'onetimes': []})
-        else:
-            pymt_settings_json = setting.value
-        pymt_settings_kwargs = self._payment_settings_dict(pymt_settings_json)
+        pymt_settings_json = payment_settings_json(db_session)
+        pymt_settings_kwargs = payment_settings_dict(pymt_settings_json)
         try:
             ih = InterestHelper(db_session, **pymt_settings_kwargs)
             mps = sum(ih.min_payments.values())
@@ -168,6 +143,61 @@ class CreditPayoffsView(MethodView):
         )
 
 
+class CreditPayoffSweepAjax(MethodView):
+    """
+    Handle GET /ajax/credit-payoff-sweep endpoint. Calculates payoffs with
+    each payoff method for a range of maximum total monthly payments, using
+    :py:meth:`~.InterestHelper.payoff_sweep` and the stored payment increases
+    and onetimes.
+
+    Optional query parameters are ``start`` (defaults to the sum of minimum
+    payments), ``stop`` (defaults to ``start`` plus 2000) and ``step``
+    (defaults to 50). At most :py:attr:`~.MAX_STEPS` steps may be requested.
+    """
+
+    #: Maximum number of payment amounts that may be requested at once.
+    MAX_STEPS = 200
+
+    def _decimal_arg(self, name, default):
+        val = request.args.get(name, None)
+        if val is None or val == '':
+            return default
+        d = Decimal(val)
+        if not d.is_finite():
+            raise ArithmeticError('%s must be finite' % name)
+        return d
+
+    def get(self):
+        pymt_settings_json = payment_settings_json(db_session)
+        pymt_settings_kwargs = payment_settings_dict(pymt_settings_json)
+        try:
+            ih = InterestHelper(db_session, **pymt_settings_kwargs)
+            mps = sum(ih.min_payments.values())
+        except NoInterestChargedError as ex:
+            return jsonify({
+                'error': 'Could not find last interest charge for account '
+                         '%s (%d)' % (ex.account.name, ex.account.id)
+            }), 500
+        try:
+            start = self._decimal_arg('start', mps)
+            stop = self._decimal_arg('stop', start + Decimal('2000'))
+            step = self._decimal_arg('step', Decimal('50'))
+        except ArithmeticError:
+            return jsonify({
+                'error': 'start, stop and step must be finite numbers'
+            }), 400
+        if step <= 0:
+            return jsonify({'error': 'step must be greater than zero'}), 400
+        if (stop - start) / step >= self.MAX_STEPS:
+            return jsonify({
+                'error': 'at most %d steps may be requested' % self.MAX_STEPS
+            }), 400
+        return jsonify({
+            'min_payment_total': mps,
+            'steps': ih.payoff_sweep(start, stop, step)
+        })
+
+
 class PayoffSettingsFormHandler(MethodView):
     """
     Handle POST /settings/credit-payoff
@@ -188,9 +218,9 @@ class PayoffSettingsFormHandler(MethodView):
                 'success': False,
                 'error_message': 'Error parsing JSON'
             })
-        setting = db_session.query(DBSetting).get('credit-payoff')
+        setting = db_session.query(DBSetting).get(PAYMENT_SETTINGS_SETTING)
         if setting is None:
-            setting = DBSetting(name='credit-payoff')
+            setting = DBSetting(name=PAYMENT_SETTINGS_SETTING)
             logger.info('new DBSetting name=credit-payoff')
         else:
             logger.info('Existing DBSetting name=credit-payoff value=%s',
@@ -300,6 +330,10 @@ app.add_url_rule(
     '/accounts/credit-payoff',
     view_func=CreditPayoffsView.as_view('credit_payoffs_view')
 )
+app.add_url_rule(
+    '/ajax/credit-payoff-sweep',
+    view_func=CreditPayoffSweepAjax.as_view('credit_payoff_sweep_ajax')
+)
 app.add_url_rule(
     '/settings/credit-payoff',
     view_func=PayoffSettingsFormHandler.as_view('payoff_settings_form')
@@ -41,7 +41,9 @@ from copy import copy
 from sqlalchemy import asc
 
 from biweeklybudget.flaskapp.app import app
-from biweeklybudget.biweeklypayperiod import BiweeklyPayPeriod
+from biweeklybudget.biweeklypayperiod import (
+    BiweeklyPayPeriod, PayPeriodRange
+)
 from biweeklybudget.models.account import Account, AcctType, AccountBalance
 from biweeklybudget.models.budget_model import Budget
 from biweeklybudget.db import db_session
@@ -61,15 +63,8 @@ class IndexView(MethodView):
         pp_curr_idx = 1
         pp_next_idx = 2
         pp_following_idx = 3
-        periods = [pp]
-        x = pp
-        # add another
-        for i in range(0, 8):
-            x = x.next
-            periods.append(x)
-        # trigger calculation/cache of data before passing on to jinja
-        for p in periods:
-            p.overall_sums
+        # load and cache data for all periods before passing on to jinja
+        periods = PayPeriodRange(pp, 9).load().periods
         accts = {a.name: a.id for a in db_session.query(Account).all()}
         budgets = {}
         active_budgets = {}
@@ -91,6 +86,7 @@ class IndexView(MethodView):
             investment_accounts=db_session.query(Account).filter(
                 Account.acct_type == AcctType.Investment,
                 Account.is_active == True).all(),  # noqa
+            unreconciled_sums=Account.unreconciled_sums(db_session),
             standing_budgets=standing,
             periods=periods,
             curr_pp=pp,
@@ -44,7 +44,9 @@ from flask import render_template, request, redirect
 
 from biweeklybudget.flaskapp.app import app
 from biweeklybudget.utils import dtnow
-from biweeklybudget.biweeklypayperiod import BiweeklyPayPeriod
+from biweeklybudget.biweeklypayperiod import (
+    BiweeklyPayPeriod, PayPeriodRange
+)
 from biweeklybudget.models.budget_model import Budget
 from biweeklybudget.models.account import Account
 from biweeklybudget.models.scheduled_transaction import ScheduledTransaction
@@ -66,18 +68,8 @@ class PayPeriodsView(MethodView):
         pp_curr_idx = 1
         pp_next_idx = 2
         pp_following_idx = 3
-        periods = [
-            pp.previous,
-            pp
-        ]
-        x = pp
-        # add another
-        for i in range(0, 8):
-            x = x.next
-            periods.append(x)
-        # trigger calculation/cache of data before passing on to jinja
-        for p in periods:
-            p.overall_sums
+        # load and cache data for all periods before passing on to jinja
+        periods = PayPeriodRange(pp.previous, 10).load().periods
         return render_template(
             'payperiods.html',
             periods=periods,
@@ -117,6 +109,9 @@ class PayPeriodView(MethodView):
         d = datetime.strptime(period_date, '%Y-%m-%d').date()
         pp = BiweeklyPayPeriod.period_for_date(d, db_session)
         curr_pp = BiweeklyPayPeriod.period_for_date(dtnow(), db_session)
+        # pp.previous through pp.next.next.next are canonical instances from
+        # the session's PayPeriodRegistry; load all of their data at once.
+        PayPeriodRange(pp.previous, 5).load()
         budgets = {}
         active_budgets = {}
         for b in db_session.query(Budget).all():
@@ -0,0 +1,76 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import logging
+from flask.views import MethodView
+from flask import request, jsonify
+
+from biweeklybudget.flaskapp.app import app
+from biweeklybudget.db import db_session
+from biweeklybudget.projection import CashFlowProjection
+
+logger = logging.getLogger(__name__)
+
+
+class CashFlowProjectionAjax(MethodView):
+    """
+    Handle GET /ajax/projection endpoint. Takes an optional ``periods`` query
+    parameter, the number of pay periods to project (default 52, maximum
+    :py:attr:`~.MAX_PERIODS`). Returns the JSON-serialized
+    :py:attr:`~.CashFlowProjection.result`.
+    """
+
+    #: Maximum number of pay periods that may be requested.
+    MAX_PERIODS = 520
+
+    def get(self):
+        try:
+            num_periods = int(request.args.get('periods', 52))
+        except ValueError:
+            return jsonify({'error': 'periods must be an integer'}), 400
+        if num_periods < 1 or num_periods > self.MAX_PERIODS:
+            return jsonify({
+                'error': 'periods must be between 1 and %d' % self.MAX_PERIODS
+            }), 400
+        res = CashFlowProjection(db_session, num_periods=num_periods).result
+        return jsonify(res)
+
+
+app.add_url_rule(
+    '/ajax/projection',
+    view_func=CashFlowProjectionAjax.as_view('cash_flow_projection_ajax')
+)
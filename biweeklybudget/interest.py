@@ -36,19 +36,78 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 """
 
 import logging
-from datetime import timedelta
-from decimal import Decimal
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from decimal import Decimal, localcontext
 from dateutil.relativedelta import relativedelta
 from calendar import monthrange
 
-from biweeklybudget.models.account import Account, AcctType
+from biweeklybudget import settings
+from biweeklybudget.models.account import (
+    Account, AcctType, NoInterestChargedError
+)
+from biweeklybudget.models.dbsetting import DBSetting
+from biweeklybudget.version import VERSION
 
 logger = logging.getLogger(__name__)
 
+#: Name of the :py:class:`~.DBSetting` that caches the most recent result of
+#: :py:meth:`~.InterestHelper.cached_payoffs`.
+PAYOFF_CACHE_SETTING = 'credit-payoff-results'
+
+#: Name of the :py:class:`~.DBSetting` that stores the JSON payment increases
+#: and onetime payments used when calculating credit payoffs.
+PAYMENT_SETTINGS_SETTING = 'credit-payoff'
+
+
+def payment_settings_json(sess):
+    """
+    Return the JSON payment settings stored in the
+    :py:attr:`~.PAYMENT_SETTINGS_SETTING` :py:class:`~.DBSetting`, or JSON for
+    empty settings if it does not exist.
+
+    :param sess: active database session to use for queries
+    :type sess: sqlalchemy.orm.session.Session
+    :return: payment settings JSON
+    :rtype: str
+    """
+    setting = sess.query(DBSetting).get(PAYMENT_SETTINGS_SETTING)
+    if setting is None:
+        return json.dumps({'increases': [], 'onetimes': []})
+    return setting.value
+
+
+def payment_settings_dict(settings_json):
+    """
+    Given the JSON string payment settings, return a dict of payment
+    settings as expected by :py:class:`~.InterestHelper` kwargs.
+
+    :param settings_json: payment settings JSON
+    :type settings_json: str
+    :return: payment settings dict
+    :rtype: dict
+    """
+    res = {'increases': {}, 'onetimes': {}}
+    j = json.loads(settings_json)
+    for i in j['increases']:
+        if not i['enabled']:
+            continue
+        d = datetime.strptime(i['date'], '%Y-%m-%d').date()
+        res['increases'][d] = Decimal(i['amount'])
+    for i in j['onetimes']:
+        if not i['enabled']:
+            continue
+        d = datetime.strptime(i['date'], '%Y-%m-%d').date()
+        res['onetimes'][d] = Decimal(i['amount'])
+    return res
+
 
 class InterestHelper(object):
 
-    def __init__(self, db_sess, increases={}, onetimes={}):
+    def __init__(self, db_sess, increases={}, onetimes={}, workers=None):
         """
         Initialize interest calculation helper.
 
@@ -62,12 +121,20 @@ class InterestHelper(object):
           :py:class:`decimal.Decimal` for additional amounts to add to the first
           maximum payment on or after the given date
         :type onetimes: dict
+        :param workers: number of worker processes to calculate payoff methods
+          in; if greater than 1, methods are calculated in parallel. Defaults
+          to :py:attr:`~biweeklybudget.settings.PAYOFF_WORKERS`.
+        :type workers: int
         """
         self._sess = db_sess
+        self._calendar = BillingPeriodCalendar()
         self._accounts = self._get_credit_accounts()
         self._statements = self._make_statements(self._accounts)
         self._increases = increases
         self._onetimes = onetimes
+        if workers is None:
+            workers = settings.PAYOFF_WORKERS
+        self._workers = workers
 
     @property
     def accounts(self):
@@ -80,6 +147,52 @@ class InterestHelper(object):
         """
         return self._accounts
 
+    @property
+    def statements(self):
+        """
+        Return a dict of `account_id` to :py:class:`~.CCStatement` for the
+        latest statement of each account in :py:attr:`~.accounts`.
+
+        :return: dict of account_id to CCStatement instance
+        :rtype: dict
+        """
+        return self._statements
+
+    @property
+    def calendar(self):
+        """
+        Return the :py:class:`~.BillingPeriodCalendar` used for the billing
+        periods of :py:attr:`~.statements`.
+
+        :return: billing period calendar
+        :rtype: BillingPeriodCalendar
+        """
+        return self._calendar
+
+    @property
+    def increases(self):
+        """
+        Return the dict of :py:class:`datetime.date` to
+        :py:class:`decimal.Decimal` new max payment amounts passed to the
+        constructor.
+
+        :return: dict of date to new max payment amount
+        :rtype: dict
+        """
+        return self._increases
+
+    @property
+    def onetimes(self):
+        """
+        Return the dict of :py:class:`datetime.date` to
+        :py:class:`decimal.Decimal` one-time additional payment amounts passed
+        to the constructor.
+
+        :return: dict of date to additional payment amount
+        :rtype: dict
+        """
+        return self._onetimes
+
     def _get_credit_accounts(self):
         """
         Return a dict of `account_id` to :py:class:`~.Account` for all Credit
@@ -106,7 +219,15 @@ class InterestHelper(object):
         :rtype: dict
         """
         res = {}
+        charges = Account.last_interest_charges(
+            self._sess, list(accounts.keys())
+        )
         for a_id, acct in accounts.items():
+            if a_id not in charges:
+                logger.warning(
+                    'Could not find last interest charge for: %s', acct
+                )
+                raise NoInterestChargedError(acct)
             icls = INTEREST_CALCULATION_NAMES[acct.interest_class_name]['cls'](
                 acct.effective_apr
             )
@@ -119,7 +240,7 @@ class InterestHelper(object):
                 min_pay_cls,
                 bill_period,
                 end_balance=abs(acct.balance.ledger),
-                interest_amt=acct.last_interest_charge
+                interest_amt=charges[a_id]
             )
         logger.debug('Statements: %s', res)
         return res
@@ -143,6 +264,11 @@ class InterestHelper(object):
         """
         Calculate payoffs for each account/statement.
 
+        If more than one worker process was requested (see the ``workers``
+        constructor argument), each payoff method is calculated in its own
+        process; otherwise they are calculated serially. The result is the
+        same either way.
+
         :return: dict of payoff information. Keys are payoff method names.
           Values are dicts, with keys "description" (str description of the
           payoff method), "doc" (the docstring of the class), and "results".
@@ -152,6 +278,7 @@ class InterestHelper(object):
         :rtype: dict
         """
         res = {}
+        methods = {}
         max_total = sum(list(self.min_payments.values()))
         for name in sorted(PAYOFF_METHOD_NAMES.keys()):
             cls = PAYOFF_METHOD_NAMES[name]['cls']
@@ -164,6 +291,12 @@ class InterestHelper(object):
                 'description': PAYOFF_METHOD_NAMES[name]['description'],
                 'doc': PAYOFF_METHOD_NAMES[name]['doc']
             }
+            methods[name] = klass
+        if self._workers > 1 and len(methods) > 1:
+            remaining = self._calc_payoffs_parallel(methods, res)
+        else:
+            remaining = methods
+        for name, klass in remaining.items():
             try:
                 res[name]['results'] = self._calc_payoff_method(klass)
             except Exception as ex:
@@ -172,6 +305,186 @@ class InterestHelper(object):
                              name, ex)
         return res
 
+    def payoff_sweep(self, start, stop, step):
+        """
+        Calculate payoffs with every payoff method shown in the UI, for each
+        maximum total monthly payment from ``start`` to ``stop`` (inclusive) in
+        increments of ``step``. The increases and onetimes passed to the
+        constructor apply at every step.
+
+        All steps share a single :py:class:`~.PayoffSimulation` of the current
+        statements.
+
+        :param start: first maximum total monthly payment
+        :type start: decimal.Decimal
+        :param stop: last maximum total monthly payment
+        :type stop: decimal.Decimal
+        :param step: increment between maximum total monthly payments
+        :type step: decimal.Decimal
+        :return: list of dicts, one per step, with keys ``max_total``
+          (Decimal) and ``methods``. ``methods`` maps each payoff method name
+          to a dict with keys ``payoff_months`` (int, for the card that takes
+          longest), ``total_payments`` (Decimal) and ``total_interest``
+          (Decimal), or a dict with an ``error`` key (str) if that method
+          failed at that step.
+        :rtype: list
+        """
+        if step <= 0:
+            raise ValueError('step must be greater than zero')
+        sim = PayoffSimulation(
+            list(self._statements.values()), calendar=self._calendar
+        )
+        total_principal = sum(
+            [s.principal for s in self._statements.values()], Decimal('0')
+        )
+        names = [
+            name for name in sorted(PAYOFF_METHOD_NAMES.keys())
+            if PAYOFF_METHOD_NAMES[name]['cls'].show_in_ui
+        ]
+        res = []
+        max_total = start
+        while max_total <= stop:
+            methods = {}
+            for name in names:
+                klass = PAYOFF_METHOD_NAMES[name]['cls'](
+                    max_total, increases=self._increases,
+                    onetimes=self._onetimes
+                )
+                try:
+                    calc = sim.run(klass)
+                except Exception as ex:
+                    methods[name] = {'error': str(ex)}
+                    logger.debug('Payoff method %s failed for %s: %s',
+                                 name, max_total, ex)
+                    continue
+                total_pymts = sum([x[1] for x in calc], Decimal('0'))
+                methods[name] = {
+                    'payoff_months': max([x[0] for x in calc] + [0]),
+                    'total_payments': total_pymts,
+                    'total_interest': total_pymts - total_principal
+                }
+            res.append({'max_total': max_total, 'methods': methods})
+            max_total += step
+        return res
+
+    @property
+    def cache_key(self):
+        """
+        Return a stable hex digest of every input to
+        :py:meth:`~.calculate_payoffs`. These are the principal, last interest
+        charge, APR, billing period and interest and minimum payment classes
+        of each statement, the payment increases and onetimes, and the
+        package version.
+
+        :return: SHA256 hex digest of the payoff inputs
+        :rtype: str
+        """
+        stmts = []
+        for a_id in sorted(self._statements.keys()):
+            s = self._statements[a_id]
+            stmts.append([
+                a_id, str(s.principal), str(s.interest), str(s.apr),
+                s._interest_cls.__class__.__name__,
+                s._min_pay_cls.__class__.__name__,
+                s.start_date.strftime('%Y-%m-%d'),
+                s.end_date.strftime('%Y-%m-%d')
+            ])
+        data = {
+            'version': VERSION,
+            'statements': stmts,
+            'increases': sorted(
+                [d.strftime('%Y-%m-%d'), str(amt)]
+                for d, amt in self._increases.items()
+            ),
+            'onetimes': sorted(
+                [d.strftime('%Y-%m-%d'), str(amt)]
+                for d, amt in self._onetimes.items()
+            )
+        }
+        return hashlib.sha256(
+            json.dumps(data, sort_keys=True).encode('utf-8')
+        ).hexdigest()
+
+    def cached_payoffs(self):
+        """
+        Return the result of :py:meth:`~.calculate_payoffs`, using the copy
+        stored in the :py:attr:`~.PAYOFF_CACHE_SETTING` :py:class:`~.DBSetting`
+        if its :py:attr:`~.cache_key` matches the current inputs. Otherwise,
+        calculate payoffs and store the result. It is stored on a separate
+        connection, so that the session's transaction is not committed.
+
+        The stored result is also removed whenever a new
+        :py:class:`~.OFXStatement` or :py:class:`~.AccountBalance` is added
+        for a credit account; see
+        :py:func:`~biweeklybudget.db_event_handlers.handle_payoff_cache_invalidation`.
+
+        :return: payoff information, as returned by
+          :py:meth:`~.calculate_payoffs`
+        :rtype: dict
+        """
+        key = self.cache_key
+        setting = self._sess.query(DBSetting).get(PAYOFF_CACHE_SETTING)
+        if setting is not None and setting.value is not None:
+            j = json.loads(setting.value)
+            if j.get('key') == key:
+                logger.debug('Using cached payoffs for key %s', key)
+                return _decode_payoffs(j['payoffs'])
+        res = self.calculate_payoffs()
+        value = json.dumps(
+            {'key': key, 'payoffs': _encode_payoffs(res)}, sort_keys=True
+        )
+        with self._sess.get_bind().connect() as conn:
+            with conn.begin():
+                DBSetting.set_value(conn, PAYOFF_CACHE_SETTING, value)
+        logger.debug('Stored payoffs for key %s', key)
+        return res
+
+    def _calc_payoffs_parallel(self, methods, res):
+        """
+        Calculate each of the payoff methods in ``methods`` in a separate
+        worker process, and store the results (or error) in ``res``, like
+        :py:meth:`~.calculate_payoffs`. If the process pool cannot be started
+        or breaks, log a warning and return a dict of the methods that still
+        need to be calculated serially.
+
+        :param methods: dict of payoff method name to payoff method instance
+        :type methods: dict
+        :param res: result dict to update, keyed by payoff method name
+        :type res: dict
+        :return: dict of payoff method name to payoff method instance, for the
+          methods that were not calculated
+        :rtype: dict
+        """
+        remaining = dict(methods)
+        statements = list(self._statements.values())
+        try:
+            with ProcessPoolExecutor(
+                max_workers=min(self._workers, len(methods))
+            ) as executor:
+                futures = {
+                    name: executor.submit(
+                        calculate_payoffs, klass, statements, self._calendar
+                    ) for name, klass in methods.items()
+                }
+                for name, future in futures.items():
+                    try:
+                        res[name]['results'] = self._payoff_results(
+                            future.result()
+                        )
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as ex:
+                        res[name]['error'] = str(ex)
+                        logger.error('Minimum payment method %s failed: %s',
+                                     name, ex)
+                    del remaining[name]
+        except (BrokenProcessPool, NotImplementedError, OSError) as ex:
+            logger.warning(
+                'Unable to calculate payoffs in a process pool (%s); '
+                'calculating %d methods serially', ex, len(remaining)
+            )
+        return remaining
+
     def _calc_payoff_method(self, cls):
         """
         Calculate payoffs using one method.
@@ -183,11 +496,29 @@ class InterestHelper(object):
           "total_interest" (Decimal), "next_payment" (Decimal).
         :rtype: dict
         """
+        return self._payoff_results(
+            calculate_payoffs(
+                cls, list(self._statements.values()), calendar=self._calendar
+            )
+        )
+
+    def _payoff_results(self, calc):
+        """
+        Convert the return value of :py:func:`~.calculate_payoffs` for
+        ``self._statements`` into the per-account result dict returned by
+        :py:meth:`~._calc_payoff_method`.
+
+        :param calc: return value of :py:func:`~.calculate_payoffs`
+        :type calc: list
+        :return: Dict with integer `account_id` as the key, and values are
+          dicts with keys "payoff_months" (int), "total_payments" (Decimal),
+          "total_interest" (Decimal), "next_payment" (Decimal).
+        :rtype: dict
+        """
         balances = {
             x: self._statements[x].principal for x in self._statements.keys()
         }
         res = {}
-        calc = calculate_payoffs(cls, list(self._statements.values()))
         for idx, result in enumerate(calc):
             a_id = list(self._statements.keys())[idx]
             res[a_id] = {
@@ -199,6 +530,105 @@ class InterestHelper(object):
         return res
 
 
+#: Keys of the per-account payoff results that are Decimal values.
+_PAYOFF_DECIMAL_KEYS = ['total_payments', 'total_interest', 'next_payment']
+
+
+def _encode_payoffs(payoffs):
+    """
+    Convert the return value of :py:meth:`~.InterestHelper.calculate_payoffs`
+    to a JSON-serializable dict, with Decimal values as strings. The inverse
+    of :py:func:`~._decode_payoffs`.
+
+    :param payoffs: payoff information
+    :type payoffs: dict
+    :return: JSON-serializable payoff information
+    :rtype: dict
+    """
+    res = {}
+    for name, meth in payoffs.items():
+        res[name] = {k: v for k, v in meth.items() if k != 'results'}
+        if 'results' not in meth:
+            continue
+        res[name]['results'] = {}
+        for a_id, r in meth['results'].items():
+            tmp = dict(r)
+            for k in _PAYOFF_DECIMAL_KEYS:
+                tmp[k] = str(tmp[k])
+            res[name]['results'][str(a_id)] = tmp
+    return res
+
+
+def _decode_payoffs(data):
+    """
+    Convert the output of :py:func:`~._encode_payoffs` (after a JSON round
+    trip) back to the format returned by
+    :py:meth:`~.InterestHelper.calculate_payoffs`.
+
+    :param data: decoded JSON payoff information
+    :type data: dict
+    :return: payoff information
+    :rtype: dict
+    """
+    res = {}
+    for name, meth in data.items():
+        res[name] = {k: v for k, v in meth.items() if k != 'results'}
+        if 'results' not in meth:
+            continue
+        res[name]['results'] = {}
+        for a_id, r in meth['results'].items():
+            tmp = dict(r)
+            for k in _PAYOFF_DECIMAL_KEYS:
+                tmp[k] = Decimal(tmp[k])
+            res[name]['results'][int(a_id)] = tmp
+    return res
+
+
+def _segment_transactions(first_d, last_d, transactions):
+    """
+    Return a date-sorted list of ``(date, amount)`` tuples for the items in
+    ``transactions`` that fall between ``first_d`` and ``last_d``, inclusive.
+
+    :param first_d: first date of the period
+    :type first_d: datetime.date
+    :param last_d: last date of the period
+    :type last_d: datetime.date
+    :param transactions: dict of datetime.date to amount
+    :type transactions: dict
+    :return: sorted list of (date, amount) tuples
+    :rtype: list
+    """
+    return sorted(
+        (d, amt) for d, amt in transactions.items() if first_d <= d <= last_d
+    )
+
+
+def _compound_run(bal, r, dpr, n):
+    """
+    Compound ``bal`` daily by ``r`` (``1 + dpr``) for ``n`` days, and return a
+    2-tuple of the final balance and the sum of the end-of-day balances over
+    those days. This is the closed form of the geometric series
+    ``bal * r + bal * r ** 2 + ... + bal * r ** n``.
+
+    :param bal: balance at the start of the first day
+    :type bal: decimal.Decimal
+    :param r: daily growth factor, ``1 + dpr``
+    :type r: decimal.Decimal
+    :param dpr: daily periodic rate
+    :type dpr: decimal.Decimal
+    :param n: number of days
+    :type n: int
+    :return: (final balance, sum of daily balances)
+    :rtype: tuple
+    """
+    if n <= 0:
+        return bal, Decimal(0.0)
+    if dpr == 0:
+        return bal, bal * n
+    rn = r ** n
+    return bal * rn, bal * r * (rn - 1) / dpr
+
+
 class _InterestCalculation(object):
 
     #: Human-readable string name of the interest calculation type.
@@ -265,23 +695,30 @@ class AdbCompoundedDaily(_InterestCalculation):
           interest_paid (float)
         :rtype: dict
         """
+        num_days = (last_d - first_d).days + 1
         dpr = self._apr / Decimal(365.0)
-        interest = Decimal(0.0)
-        num_days = 0
-        bal_total = Decimal(0.0)
         bal = principal
-
-        d = first_d
-        while d <= last_d:
-            num_days += 1
-            if d in transactions:
-                bal += transactions[d]
-            int_amt = bal * dpr
-            interest += int_amt
-            bal += int_amt
-            bal_total += bal
-            d += timedelta(days=1)
-        adb = bal_total / Decimal(num_days)
+        bal_total = Decimal(0.0)
+        # The daily balance only changes by a constant factor between
+        # transaction dates, so each run of days is a geometric series that
+        # can be summed directly instead of stepping through each day.
+        with localcontext() as ctx:
+            ctx.prec += 10
+            r = 1 + dpr
+            day = 0
+            for d, amt in _segment_transactions(
+                first_d, last_d, transactions
+            ):
+                n = (d - first_d).days - day
+                if n > 0:
+                    bal, seg_total = _compound_run(bal, r, dpr, n)
+                    bal_total += seg_total
+                    day += n
+                bal += amt
+            bal, seg_total = _compound_run(bal, r, dpr, num_days - day)
+            bal_total += seg_total
+        bal = +bal
+        adb = +bal_total / Decimal(num_days)
         final = adb * self._apr * num_days / Decimal(365.0)
         bal += final * dpr
         return {
@@ -315,15 +752,10 @@ class SimpleInterest(_InterestCalculation):
           interest_paid (float)
         :rtype: dict
         """
-        num_days = 0
+        num_days = (last_d - first_d).days + 1
         bal = principal
-
-        d = first_d
-        while d <= last_d:
-            num_days += 1
-            if d in transactions:
-                bal += transactions[d]
-            d += timedelta(days=1)
+        for _, amt in _segment_transactions(first_d, last_d, transactions):
+            bal += amt
         final = bal * self._apr * num_days / Decimal(365.0)
         return {
             'interest_paid': final,
@@ -411,6 +843,76 @@ class _BillingPeriod(object):
         return _BillingPeriod(e, start_date=e.replace(day=1))
 
 
+class BillingPeriodCalendar(object):
+    """
+    Cache of consecutive :py:class:`~._BillingPeriod` chains.
+
+    Each chain starts at a billing period and holds that period followed by
+    its successive :py:attr:`~._BillingPeriod.next_period` periods, with
+    their start, end and payment dates in parallel lists. Chains are keyed by
+    the start and end dates of their first period, and are only extended as
+    far as needed. Cards that share a billing cycle, and every simulation that
+    uses the same calendar, share the same chain. Each period is only
+    calculated once.
+    """
+
+    def __init__(self):
+        self._chains = {}
+
+    def chain_for(self, period):
+        """
+        Return the :py:class:`~._BillingPeriodChain` starting at ``period``.
+
+        :param period: first billing period of the chain
+        :type period: _BillingPeriod
+        :return: billing period chain
+        :rtype: _BillingPeriodChain
+        """
+        key = (period.start_date, period.end_date)
+        if key not in self._chains:
+            self._chains[key] = _BillingPeriodChain(period)
+        return self._chains[key]
+
+
+class _BillingPeriodChain(object):
+    """
+    A list of consecutive billing periods, starting with a given one, along
+    with their start, end and payment dates. See
+    :py:class:`~.BillingPeriodCalendar`.
+    """
+
+    def __init__(self, first):
+        """
+        :param first: first billing period of the chain
+        :type first: _BillingPeriod
+        """
+        #: list of :py:class:`~._BillingPeriod`, in order
+        self.periods = [first]
+        #: start date of each period in :py:attr:`~.periods`
+        self.start_dates = [first.start_date]
+        #: end date of each period in :py:attr:`~.periods`
+        self.end_dates = [first.end_date]
+        #: payment date of each period in :py:attr:`~.periods`
+        self.payment_dates = [first.payment_date]
+
+    def __len__(self):
+        return len(self.periods)
+
+    def extend_to(self, idx):
+        """
+        Ensure that the chain includes the period at index ``idx``.
+
+        :param idx: index of the period that must be present
+        :type idx: int
+        """
+        while len(self.periods) <= idx:
+            bp = self.periods[-1].next_period
+            self.periods.append(bp)
+            self.start_dates.append(bp.start_date)
+            self.end_dates.append(bp.end_date)
+            self.payment_dates.append(bp.payment_date)
+
+
 class _MinPaymentFormula(object):
 
     #: human-readable string description of the formula
@@ -834,7 +1336,7 @@ class LowestInterestRateFirstMethod(_PayoffMethod):
         return res
 
 
-def calculate_payoffs(payment_method, statements):
+def calculate_payoffs(payment_method, statements, calendar=None):
     """
     Calculate the amount of time (in years) and total amount of money required
     to pay off the cards associated with the given list of statements. Return a
@@ -847,57 +1349,201 @@ def calculate_payoffs(payment_method, statements):
     :type payment_method: _PayoffMethod
     :param statements: list of :py:class:`~.CCStatement` objects to pay off.
     :type statements: list
+    :param calendar: billing period calendar to use; if not specified, a new
+      one is used for this calculation only
+    :type calendar: BillingPeriodCalendar
     :return: list of (`float` number of billing periods, `decimal.Decimal`
       amount paid, `decimal.Decimal` first payment amount) tuples for each item
       in `statements`
     :rtype: list
     """
-    def unpaid(s): return [x for x in s.keys() if s[x]['done'] is False]
-    payoffs = {}
     logger.debug(
         'calculating payoff via %s for: %s', payment_method, statements
     )
-    for idx, stmt in enumerate(statements):
-        payoffs[stmt] = {
-            'months': 0, 'amt': Decimal('0.0'), 'idx': idx, 'done': False,
-            'next_pymt_amt': None
-        }
-    while len(unpaid(payoffs)) > 0:
-        u = unpaid(payoffs)
-        to_pay = payment_method.find_payments(u)
-        for stmt, p_amt in dict(zip(u, to_pay)).items():
-            if stmt.principal <= Decimal('0'):
-                payoffs[stmt]['done'] = True
-                continue
-            if stmt.principal <= p_amt:
-                payoffs[stmt]['done'] = True
-                payoffs[stmt]['months'] += 1  # increment months
-                payoffs[stmt]['amt'] += stmt.principal
-                if payoffs[stmt]['next_pymt_amt'] is None:
-                    payoffs[stmt]['next_pymt_amt'] = stmt.principal
-                continue
-            payoffs[stmt]['months'] += 1  # increment months
-            payoffs[stmt]['amt'] += p_amt
-            if payoffs[stmt]['next_pymt_amt'] is None:
-                payoffs[stmt]['next_pymt_amt'] = p_amt
-            new_s = stmt.pay(Decimal('-1') * p_amt)
-            payoffs[new_s] = payoffs[stmt]
-            del payoffs[stmt]
-    res = []
-    for s in sorted(payoffs, key=lambda x: payoffs[x]['idx']):
-        tmp = (
-            payoffs[s]['months'],
-            payoffs[s]['amt'],
-            payoffs[s]['next_pymt_amt']
+    return PayoffSimulation(statements, calendar=calendar).run(payment_method)
+
+
+class PayoffSimulation(object):
+    """
+    Simulate paying off a group of credit cards, one billing period per step.
+
+    The principal, interest, billing period and calculation classes of each
+    card are kept in parallel lists indexed by card, and each step advances
+    every unpaid card by one billing period in place. Billing periods come
+    from a :py:class:`~.BillingPeriodCalendar`, so each card only tracks its
+    position in a shared chain of periods. The
+    :py:class:`~._PayoffMethod` classes are passed one
+    :py:class:`~._SimulatedStatement` per unpaid card. These expose the same
+    read-only interface as :py:class:`~.CCStatement` and read the current
+    state from the simulation.
+
+    A simulation can be :py:meth:`~.run` any number of times, with different
+    payoff methods; every run starts from the initial statements.
+    """
+
+    def __init__(self, statements, calendar=None):
+        """
+        Initialize the simulation.
+
+        :param statements: list of :py:class:`~.CCStatement` objects to pay
+          off, one per card
+        :type statements: list
+        :param calendar: billing period calendar to use; if not specified, a
+          new one is used for this simulation only
+        :type calendar: BillingPeriodCalendar
+        """
+        if calendar is None:
+            calendar = BillingPeriodCalendar()
+        self._interest_cls = [s._interest_cls for s in statements]
+        self._min_pay_cls = [s._min_pay_cls for s in statements]
+        self._initial_principal = [s.principal for s in statements]
+        self._initial_interest = [s.interest for s in statements]
+        self._chains = [
+            calendar.chain_for(s.billing_period) for s in statements
+        ]
+        self._principal = list(self._initial_principal)
+        self._interest_amt = list(self._initial_interest)
+        self._period_idx = [0] * len(statements)
+        self._views = [
+            _SimulatedStatement(self, idx) for idx in range(len(statements))
+        ]
+
+    def _reset(self):
+        """
+        Reset the simulation state to the initial statements.
+        """
+        self._principal = list(self._initial_principal)
+        self._interest_amt = list(self._initial_interest)
+        self._period_idx = [0] * len(self._period_idx)
+
+    def _advance(self, idx, amount):
+        """
+        Advance card ``idx`` to its next billing period, with a transaction
+        of ``amount`` applied at the payment date of that period.
+
+        :param idx: index of the card to advance
+        :type idx: int
+        :param amount: transaction amount; payments are negative
+        :type amount: decimal.Decimal
+        """
+        chain = self._chains[idx]
+        i = self._period_idx[idx] + 1
+        chain.extend_to(i)
+        res = self._interest_cls[idx].calculate(
+            self._principal[idx], chain.start_dates[i], chain.end_dates[i],
+            {chain.payment_dates[i]: amount}
         )
-        if payoffs[s]['next_pymt_amt'] is None:
-            tmp = (
-                payoffs[s]['months'],
-                payoffs[s]['amt'],
-                Decimal('0.0')
+        self._period_idx[idx] = i
+        self._principal[idx] = res['end_balance']
+        self._interest_amt[idx] = res['interest_paid']
+
+    def run(self, payment_method):
+        """
+        Simulate paying off all cards using ``payment_method``. Return a list
+        of (`int` number of billing periods, `decimal.Decimal` amount paid,
+        `decimal.Decimal` first payment amount) tuples, one for each card in
+        the order of the statements passed to the constructor.
+
+        :param payment_method: method used for calculating payment amount to
+          make on each statement; subclass of _PayoffMethod
+        :type payment_method: _PayoffMethod
+        :return: list of (number of billing periods, amount paid, first
+          payment amount) tuples for each card
+        :rtype: list
+        """
+        self._reset()
+        num = len(self._views)
+        months = [0] * num
+        paid = [Decimal('0.0')] * num
+        first_pymt = [None] * num
+        unpaid = list(range(num))
+        while len(unpaid) > 0:
+            to_pay = payment_method.find_payments(
+                [self._views[idx] for idx in unpaid]
             )
-        res.append(tmp)
-    return res
+            still_unpaid = []
+            for idx, p_amt in zip(unpaid, to_pay):
+                principal = self._principal[idx]
+                if principal <= Decimal('0'):
+                    continue
+                months[idx] += 1
+                if principal <= p_amt:
+                    paid[idx] += principal
+                    if first_pymt[idx] is None:
+                        first_pymt[idx] = principal
+                    continue
+                paid[idx] += p_amt
+                if first_pymt[idx] is None:
+                    first_pymt[idx] = p_amt
+                self._advance(idx, Decimal('-1') * p_amt)
+                still_unpaid.append(idx)
+            unpaid = still_unpaid
+        return [
+            (
+                months[idx], paid[idx],
+                Decimal('0.0') if first_pymt[idx] is None else first_pymt[idx]
+            ) for idx in range(num)
+        ]
+
+
+class _SimulatedStatement(object):
+    """
+    Adapter exposing the current state of one card in a
+    :py:class:`~.PayoffSimulation` with the read-only interface of a
+    :py:class:`~.CCStatement`, for use by :py:class:`~._PayoffMethod`
+    classes.
+    """
+
+    __slots__ = ['_sim', '_idx']
+
+    def __init__(self, sim, idx):
+        """
+        :param sim: the simulation this card belongs to
+        :type sim: PayoffSimulation
+        :param idx: index of the card in the simulation
+        :type idx: int
+        """
+        self._sim = sim
+        self._idx = idx
+
+    def __repr__(self):
+        return '<_SimulatedStatement(idx=%d principal=%s interest_amt=%s ' \
+               'start_date=%s end_date=%s)>' % (
+                   self._idx, self.principal, self.interest,
+                   self.start_date, self.end_date
+               )
+
+    @property
+    def principal(self):
+        return self._sim._principal[self._idx]
+
+    @property
+    def billing_period(self):
+        return self._sim._chains[self._idx].periods[
+            self._sim._period_idx[self._idx]
+        ]
+
+    @property
+    def interest(self):
+        return self._sim._interest_amt[self._idx]
+
+    @property
+    def start_date(self):
+        return self.billing_period.start_date
+
+    @property
+    def end_date(self):
+        return self.billing_period.end_date
+
+    @property
+    def apr(self):
+        return self._sim._interest_cls[self._idx].apr
+
+    @property
+    def minimum_payment(self):
+        return self._sim._min_pay_cls[self._idx].calculate(
+            self.principal, self.interest
+        )
 
 
 class CCStatement(object):
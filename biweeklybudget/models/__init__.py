@@ -43,6 +43,11 @@ from biweeklybudget.models.dbsetting import DBSetting
 from biweeklybudget.models.fuel import FuelFill, Vehicle
 from biweeklybudget.models.ofx_statement import OFXStatement
 from biweeklybudget.models.ofx_transaction import OFXTransaction
+from biweeklybudget.models.period_budget_sum import PeriodBudgetSum
+from biweeklybudget.models.period_budget_sum_period import (
+    PeriodBudgetSumPeriod
+)
+from biweeklybudget.models.prime_rate import PrimeRate
 from biweeklybudget.models.projects import Project, BoMItem
 from biweeklybudget.models.reconcile_rule import ReconcileRule
 from biweeklybudget.models.scheduled_transaction import ScheduledTransaction
@@ -37,18 +37,21 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 
 import logging
 from sqlalchemy import (
-    Column, Integer, String, Boolean, Text, Enum, Numeric, inspect, or_
+    Column, Integer, String, Boolean, Text, Enum, Numeric, ForeignKey,
+    inspect, or_, and_, func
 )
 from datetime import timedelta
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql.expression import null
+from sqlalchemy.sql.expression import null, select
 from decimal import Decimal
 
 from biweeklybudget.models.base import Base, ModelAsDict
 from biweeklybudget.models.account_balance import AccountBalance
 from biweeklybudget.models.transaction import Transaction
+from biweeklybudget.models.budget_transaction import BudgetTransaction
 from biweeklybudget.models.ofx_transaction import OFXTransaction
+from biweeklybudget.models.ofx_statement import OFXStatement
 from biweeklybudget.utils import dtnow
 from biweeklybudget.prime_rate import PrimeRateCalculator
 import json
@@ -154,7 +157,37 @@ class Account(Base, ModelAsDict):
 
     #: Relationship to all :py:class:`~.OFXStatement` for this Account
     all_statements = relationship(
-        'OFXStatement', order_by='OFXStatement.as_of'
+        'OFXStatement', order_by='OFXStatement.as_of',
+        foreign_keys='OFXStatement.account_id'
+    )
+
+    #: ID of the latest (by :py:attr:`~.OFXStatement.as_of`)
+    #: :py:class:`~.OFXStatement` for this Account. Kept up to date by
+    #: :py:func:`~biweeklybudget.db_event_handlers.handle_latest_statement`.
+    latest_statement_id = Column(
+        Integer, ForeignKey('ofx_statements.id', use_alter=True)
+    )
+
+    #: Relationship to the latest :py:class:`~.OFXStatement` for this Account,
+    #: loaded along with the Account (in the same query).
+    latest_statement = relationship(
+        'OFXStatement', foreign_keys=[latest_statement_id], post_update=True,
+        uselist=False, lazy='joined'
+    )
+
+    #: ID of the most recent :py:class:`~.AccountBalance` for this Account.
+    #: Kept up to date by :py:meth:`~.set_balance` and
+    #: :py:func:`~biweeklybudget.db_event_handlers.handle_latest_balance`.
+    latest_balance_id = Column(
+        Integer, ForeignKey('account_balances.id', use_alter=True)
+    )
+
+    #: Relationship to the most recent :py:class:`~.AccountBalance` for this
+    #: Account. This is loaded along with the Account (in the same query), so
+    #: listing accounts with their balances does not need a query per account.
+    latest_balance = relationship(
+        'AccountBalance', foreign_keys=[latest_balance_id], post_update=True,
+        uselist=False, lazy='joined'
     )
 
     #: regex for matching transactions as interest charges
@@ -220,6 +253,14 @@ class Account(Base, ModelAsDict):
             return False
         return (dtnow() - self.ofx_statement.as_of) > STALE_DATA_TIMEDELTA
 
+    @is_stale.expression
+    def is_stale(cls):
+        # NULL (never seen OFX data) when there is no latest statement, which
+        # is false in a WHERE clause
+        return select([OFXStatement.as_of]).where(
+            OFXStatement.id.__eq__(cls.latest_statement_id)
+        ).as_scalar().__lt__(dtnow() - STALE_DATA_TIMEDELTA)
+
     @property
     def ofxgetter_config(self):
         """
@@ -245,35 +286,35 @@ class Account(Base, ModelAsDict):
     def set_balance(self, **kwargs):
         """
         Create an AccountBalance object for this account and associate it with
-        the account. Add it to the current session.
+        the account. Add it to the current session, and set it as this
+        account's :py:attr:`~.latest_balance`.
         """
         kwargs['account'] = self
-        inspect(self).session.add(AccountBalance(**kwargs))
+        bal = AccountBalance(**kwargs)
+        inspect(self).session.add(bal)
+        self.latest_balance = bal
 
     @property
     def ofx_statement(self):
         """
-        Return the latest OFXStatement for this Account.
+        Return the latest OFXStatement for this Account; this is
+        :py:attr:`~.latest_statement`.
 
         :return: latest OFXStatement for this Account
         :rtype: biweeklybudget.models.ofx_statement.OFXStatement
         """
-        if len(self.all_statements) < 1:
-            return None
-        return self.all_statements[-1]
+        return self.latest_statement
 
     @property
     def balance(self):
         """
-        Return the latest AccountBalance object for this Account.
+        Return the latest AccountBalance object for this Account; this is
+        :py:attr:`~.latest_balance`.
 
         :return: latest AccountBalance for this Account
         :rtype: biweeklybudget.models.account_balance.AccountBalance
         """
-        sess = inspect(self).session
-        res = sess.query(AccountBalance).with_parent(self).order_by(
-            AccountBalance.id.desc()).limit(1).first()
-        return res
+        return self.latest_balance
 
     @property
     def unreconciled(self):
@@ -297,14 +338,49 @@ class Account(Base, ModelAsDict):
     def unreconciled_sum(self):
         """
         Return the sum of all unreconciled transaction amounts for this account.
+        To get the sums for many accounts, use :py:meth:`~.unreconciled_sums`.
 
         :return: sum of amounts of all unreconciled transactions
         :rtype: float
         """
-        total = Decimal('0.0')
-        for t in self.unreconciled:
-            total += t.actual_amount
-        return total
+        return Account.unreconciled_sums(
+            inspect(self).session, account_ids=[self.id]
+        )[self.id]
+
+    @staticmethod
+    def unreconciled_sums(sess, account_ids=None):
+        """
+        Return the sum of all unreconciled transaction amounts (the same
+        Transactions as :py:attr:`~.unreconciled`) for each of many accounts,
+        calculated with a single aggregate query.
+
+        :param sess: active database session to use for queries
+        :type sess: sqlalchemy.orm.session.Session
+        :param account_ids: IDs of the accounts to return sums for; if None,
+          return sums for all accounts
+        :type account_ids: list
+        :return: dict of Account ID to the sum of the amounts of its
+          unreconciled transactions (zero if there are none)
+        :rtype: dict
+        """
+        if account_ids is None:
+            account_ids = [x[0] for x in sess.query(Account.id).all()]
+        res = {a_id: Decimal('0.0') for a_id in account_ids}
+        if len(res) == 0:
+            return res
+        for a_id, total in sess.query(
+            Transaction.account_id, func.sum(BudgetTransaction.amount)
+        ).join(
+            BudgetTransaction,
+            BudgetTransaction.trans_id.__eq__(Transaction.id)
+        ).filter(
+            Transaction.reconcile.__eq__(null()),
+            Transaction.date.__ge__(RECONCILE_BEGIN_DATE),
+            Transaction.account_id.in_(account_ids),
+            Transaction.date.__le__(dtnow())
+        ).group_by(Transaction.account_id):
+            res[a_id] = total
+        return res
 
     @property
     def effective_apr(self):
@@ -327,27 +403,62 @@ class Account(Base, ModelAsDict):
     def last_interest_charge(self):
         """
         Return the amount of the last interest charge for this account. Raise an
-        exception if one could not be identified.
+        exception if one could not be identified. To get the last interest
+        charges of many accounts, use :py:meth:`~.last_interest_charges`.
 
         :return: amount of last interest charge for this account
         :rtype: decimal.Decimal
         """
-        sess = inspect(self).session
-        for t in sess.query(OFXTransaction).filter(
-            OFXTransaction.account_id.__eq__(self.id)
+        res = Account.last_interest_charges(
+            inspect(self).session, [self.id]
+        )
+        if self.id not in res:
+            logger.warning('Could not find last interest charge for: %s', self)
+            raise NoInterestChargedError(self)
+        logger.debug(
+            'Account %s found last interest charge as %s', self, res[self.id]
+        )
+        return res[self.id]
+
+    @staticmethod
+    def last_interest_charges(sess, account_ids):
+        """
+        Return the amount of the last interest charge (the most recent debit
+        :py:class:`~.OFXTransaction` posted in the last 32 days that has
+        :py:attr:`~.OFXTransaction.is_interest_charge` set or, for accounts
+        with no :py:attr:`~.re_interest_charge`, whose name contains
+        "interest charge", case-insensitive) for each of many accounts, with a
+        single query.
+
+        :param sess: active database session to use for queries
+        :type sess: sqlalchemy.orm.session.Session
+        :param account_ids: IDs of the accounts to find interest charges for
+        :type account_ids: list
+        :return: dict of Account ID to the amount of its last interest charge;
+          accounts where one could not be identified are not included
+        :rtype: dict
+        """
+        res = {}
+        if len(account_ids) == 0:
+            return res
+        for a_id, amt in sess.query(
+            OFXTransaction.account_id, OFXTransaction.amount
+        ).join(
+            Account, OFXTransaction.account_id.__eq__(Account.id)
+        ).filter(
+            OFXTransaction.account_id.in_(account_ids),
+            or_(
+                OFXTransaction.is_interest_charge.__eq__(True),
+                and_(
+                    Account.re_interest_charge.is_(None),
+                    func.lower(OFXTransaction.name).like('%interest charge%')
+                )
+            ),
+            OFXTransaction.trans_type.__eq__('debit'),
+            OFXTransaction.date_posted.__ge__(dtnow() - timedelta(days=32))
         ).order_by(
-            OFXTransaction.date_posted.desc()
-        ):
-            if t.trans_type != 'debit':
-                continue
-            if 'interest charge' not in t.name.lower():
-                continue
-            if t.date_posted < (dtnow() - timedelta(days=32)):
-                continue
-            logger.debug(
-                'Account %s found last interest charge as %s (%s)',
-                self, (t.amount * -1), t
-            )
-            return t.amount * -1
-        logger.warning('Could not find last interest charge for: %s', self)
-        raise NoInterestChargedError(self)
+            OFXTransaction.account_id, OFXTransaction.date_posted.desc()
+        ).all():
+            if a_id not in res:
+                res[a_id] = amt * -1
+        return res
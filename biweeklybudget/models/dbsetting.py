@@ -37,8 +37,9 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 
 import logging
 from sqlalchemy import (
-    Column, String, Text, Boolean
+    Column, String, Text, Boolean, Integer, cast
 )
+from sqlalchemy.exc import IntegrityError
 from biweeklybudget.models.base import Base, ModelAsDict
 
 logger = logging.getLogger(__name__)
@@ -67,3 +68,53 @@ class DBSetting(Base, ModelAsDict):
         return "<DBSetting(name=%s)>" % (
             self.name
         )
+
+    @staticmethod
+    def set_value(conn, name, value):
+        """
+        Set the value of a setting, creating it if it does not exist, directly
+        on a database connection (i.e. outside of any ORM session).
+
+        :param conn: database connection
+        :type conn: sqlalchemy.engine.Connection
+        :param name: name of the setting
+        :type name: str
+        :param value: value to set
+        :type value: str
+        """
+        tbl = DBSetting.__table__
+        res = conn.execute(
+            tbl.update().where(tbl.c.name == name).values(value=value)
+        )
+        if res.rowcount > 0:
+            return
+        try:
+            conn.execute(tbl.insert().values(name=name, value=value))
+        except IntegrityError:
+            # inserted concurrently; ours is the newer value
+            conn.execute(
+                tbl.update().where(tbl.c.name == name).values(value=value)
+            )
+
+    @staticmethod
+    def increment_counter(conn, name):
+        """
+        Atomically increment the integer value of a setting, creating it with
+        a value of 1 if it does not exist, directly on a database connection
+        (i.e. outside of any ORM session).
+
+        :param conn: database connection
+        :type conn: sqlalchemy.engine.Connection
+        :param name: name of the setting
+        :type name: str
+        """
+        tbl = DBSetting.__table__
+        stmt = tbl.update().where(tbl.c.name == name).values(
+            value=cast(tbl.c.value, Integer) + 1
+        )
+        if conn.execute(stmt).rowcount > 0:
+            return
+        try:
+            conn.execute(tbl.insert().values(name=name, value='1'))
+        except IntegrityError:
+            conn.execute(stmt)
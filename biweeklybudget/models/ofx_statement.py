@@ -59,7 +59,7 @@ class OFXStatement(Base, ModelAsDict):
 
     #: Relationship to the :py:class:`~.Account` this statement is for
     account = relationship(
-        "Account", uselist=False
+        "Account", uselist=False, foreign_keys=[account_id]
     )
 
     #: Filename parsed from
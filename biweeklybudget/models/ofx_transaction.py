@@ -37,7 +37,7 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 
 from sqlalchemy import (
     Column, String, PrimaryKeyConstraint, Text, Numeric, Boolean, ForeignKey,
-    Integer, inspect
+    Integer, Index, inspect
 )
 from sqlalchemy.sql.expression import null
 from sqlalchemy_utc import UtcDateTime
@@ -46,6 +46,7 @@ from pytz import UTC
 from datetime import datetime
 import logging
 import re
+import threading
 from decimal import Decimal
 
 from biweeklybudget.models.base import Base, ModelAsDict
@@ -54,12 +55,23 @@ from biweeklybudget.settings import RECONCILE_BEGIN_DATE
 
 logger = logging.getLogger(__name__)
 
+#: Process-wide cache of compiled ``is_*`` patterns by Account ID; see
+#: :py:meth:`~.OFXTransaction.is_patterns`. Values are 2-tuples of the tuple
+#: of regex strings the patterns were compiled from, and the patterns.
+_is_patterns_cache = {}
+
+#: Lock protecting ``_is_patterns_cache``
+_is_patterns_lock = threading.Lock()
+
 
 class OFXTransaction(Base, ModelAsDict):
 
     __tablename__ = 'ofx_trans'
     __table_args__ = (
         PrimaryKeyConstraint('account_id', 'fitid'),
+        Index(
+            'ix_ofx_trans_account_id_date_posted', 'account_id', 'date_posted'
+        ),
         {'mysql_engine': 'InnoDB'}
     )
 
@@ -134,6 +146,20 @@ class OFXTransaction(Base, ModelAsDict):
     #: The reconcile_id for the OFX Transaction
     reconcile_id = Column(Integer, ForeignKey('txn_reconciles.id'))
 
+    #: Mapping of :py:class:`~.Account` regex attributes to the ``is_*``
+    #: fields that they set; see :py:meth:`~.update_is_fields`.
+    IS_FIELDS = {
+        're_interest_charge': 'is_interest_charge',
+        're_interest_paid': 'is_interest_payment',
+        're_payment': 'is_payment',
+        're_late_fee': 'is_late_fee',
+        're_other_fee': 'is_other_fee'
+    }
+
+    #: Name of manually-entered interest charge transactions, whose
+    #: ``is_interest_charge`` field is never changed by the Account regexes.
+    MANUAL_INTEREST_NAME = 'Interest Charged - MANUALLY ENTERED'
+
     def __repr__(self):
         return "<OFXTransaction(account_id='%s', fitid='%s')>" % (
             self.account_id, self.fitid
@@ -238,43 +264,144 @@ class OFXTransaction(Base, ModelAsDict):
                      self, res)
         return res
 
-    def update_is_fields(self):
+    @staticmethod
+    def compile_is_patterns(regexes):
         """
-        Method to update all ``is_*`` fields on this instance, given the
-        ``re_*`` properties of :py:attr:`~.account`.
+        Compile the :py:class:`~.Account` ``re_*`` regex strings that set the
+        ``is_*`` fields (the keys of :py:attr:`~.IS_FIELDS`). Strings that fail
+        to compile are logged and treated as matching nothing.
+
+        :param regexes: dict of Account ``re_*`` attribute name to regex
+          string (or None)
+        :type regexes: dict
+        :return: dict of Account ``re_*`` attribute name to compiled,
+          case-insensitive pattern, or None
+        :rtype: dict
         """
-        fields = {
-            're_interest_charge': 'is_interest_charge',
-            're_interest_paid': 'is_interest_payment',
-            're_payment': 'is_payment',
-            're_late_fee': 'is_late_fee',
-            're_other_fee': 'is_other_fee'
-        }
-        acct = self.account
-        if acct is None:
-            from biweeklybudget.models.account import Account
-            sess = inspect(self).session
-            acct = sess.query(Account).get(self.account_id)
-        for fname in fields.values():
-            if (
-                fname == 'is_interest_charge' and
-                self.name == 'Interest Charged - MANUALLY ENTERED'
-            ):
-                continue
-            setattr(self, fname, False)
-        for acct_attr, self_attr in fields.items():
-            if (
-                self_attr == 'is_interest_charge' and
-                self.name == 'Interest Charged - MANUALLY ENTERED'
-            ):
-                continue
-            r_str = getattr(acct, acct_attr)
+        res = {}
+        for acct_attr in OFXTransaction.IS_FIELDS:
+            r_str = regexes.get(acct_attr)
+            res[acct_attr] = None
             if r_str is None:
                 continue
             try:
-                if re.match(r_str, self.name, re.I):
-                    setattr(self, self_attr, True)
+                res[acct_attr] = re.compile(r_str, re.I)
             except Exception:
-                logger.error('Error performing regex comparison on %s using '
-                             'Account %s field %s (%s)', self, acct,
+                logger.error('Error compiling Account field %s regex (%s)',
                              acct_attr, r_str, exc_info=True)
+        return res
+
+    @staticmethod
+    def is_patterns(account_id, regexes):
+        """
+        Return the compiled ``is_*`` patterns for an Account, as returned by
+        :py:meth:`~.compile_is_patterns`, from a process-wide cache by Account
+        ID. An Account's entry is replaced whenever its regex strings differ
+        from the ones the cached patterns were compiled from, and is removed by
+        :py:meth:`~.invalidate_is_patterns` when its ``re_*`` columns change.
+        Patterns for unsaved Accounts (``account_id`` of None) are not cached.
+
+        :param account_id: ID of the Account
+        :type account_id: int
+        :param regexes: dict of the Account's ``re_*`` attribute names to
+          regex strings (or None)
+        :type regexes: dict
+        :return: dict of Account ``re_*`` attribute name to compiled pattern,
+          or None
+        :rtype: dict
+        """
+        key = tuple(regexes.get(x) for x in sorted(OFXTransaction.IS_FIELDS))
+        if account_id is None:
+            return OFXTransaction.compile_is_patterns(regexes)
+        with _is_patterns_lock:
+            cached = _is_patterns_cache.get(account_id)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        patterns = OFXTransaction.compile_is_patterns(regexes)
+        with _is_patterns_lock:
+            _is_patterns_cache[account_id] = (key, patterns)
+        return patterns
+
+    @staticmethod
+    def invalidate_is_patterns(account_id=None):
+        """
+        Remove an Account's compiled patterns from the
+        :py:meth:`~.is_patterns` cache, or clear the whole cache if
+        ``account_id`` is None.
+
+        :param account_id: ID of the Account, or None for all Accounts
+        :type account_id: int
+        """
+        with _is_patterns_lock:
+            if account_id is None:
+                _is_patterns_cache.clear()
+            else:
+                _is_patterns_cache.pop(account_id, None)
+
+    @staticmethod
+    def account_is_patterns(acct):
+        """
+        Return the compiled ``is_*`` patterns (see :py:meth:`~.is_patterns`)
+        for the current ``re_*`` values of an Account instance.
+
+        :param acct: the Account
+        :type acct: biweeklybudget.models.account.Account
+        :return: dict of Account ``re_*`` attribute name to compiled pattern,
+          or None
+        :rtype: dict
+        """
+        return OFXTransaction.is_patterns(
+            acct.id, {x: getattr(acct, x) for x in OFXTransaction.IS_FIELDS}
+        )
+
+    @staticmethod
+    def is_field_values(name, patterns):
+        """
+        Return the values of the ``is_*`` fields for a transaction with the
+        given name. ``is_interest_charge`` is omitted for manually-entered
+        interest charges (:py:attr:`~.MANUAL_INTEREST_NAME`), which keep
+        their existing value.
+
+        :param name: transaction name
+        :type name: str
+        :param patterns: compiled patterns, as returned by
+          :py:meth:`~.compile_is_patterns`
+        :type patterns: dict
+        :return: dict of ``is_*`` field name to boolean value
+        :rtype: dict
+        """
+        res = {}
+        for acct_attr, self_attr in OFXTransaction.IS_FIELDS.items():
+            if (
+                self_attr == 'is_interest_charge' and
+                name == OFXTransaction.MANUAL_INTEREST_NAME
+            ):
+                continue
+            pattern = patterns[acct_attr]
+            res[self_attr] = (
+                pattern is not None and name is not None and
+                pattern.match(name) is not None
+            )
+        return res
+
+    def update_is_fields(self, patterns=None):
+        """
+        Method to update all ``is_*`` fields on this instance, given the
+        ``re_*`` properties of :py:attr:`~.account`.
+
+        :param patterns: the compiled patterns for :py:attr:`~.account`, as
+          returned by :py:meth:`~.account_is_patterns`; if None, they will be
+          looked up
+        :type patterns: dict
+        """
+        if patterns is None:
+            acct = self.account
+            if acct is None:
+                from biweeklybudget.models.account import Account
+                sess = inspect(self).session
+                acct = sess.query(Account).get(self.account_id)
+            patterns = OFXTransaction.account_is_patterns(acct)
+        for fname, val in OFXTransaction.is_field_values(
+            self.name, patterns
+        ).items():
+            setattr(self, fname, val)
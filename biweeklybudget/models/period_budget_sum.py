@@ -0,0 +1,87 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2017 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+from sqlalchemy import Column, Integer, Numeric, Date, ForeignKey
+from sqlalchemy.orm import relationship
+from biweeklybudget.models.base import Base, ModelAsDict
+
+
+class PeriodBudgetSum(Base, ModelAsDict):
+    """
+    Materialized per-pay-period, per-:py:class:`~.Budget` sums; the stored
+    portion of :py:attr:`~.BiweeklyPayPeriod.budget_sums` for one periodic
+    Budget in one :py:class:`~.BiweeklyPayPeriod`. Rows are recalculated by
+    :py:func:`~biweeklybudget.db_event_handlers.handle_period_budget_sums`
+    and :py:func:`~.handle_recalculate_period_budget_sums` in the same
+    transaction as changes to the data they were calculated from,
+    and are calculated on demand by
+    :py:meth:`~.PayPeriodRange.stored_budget_sums` or in bulk by the
+    ``rebuildperiodsums`` console script. Stored periods are recorded by
+    :py:class:`~.PeriodBudgetSumPeriod` markers.
+    """
+
+    __tablename__ = 'period_budget_sums'
+    __table_args__ = (
+        {'mysql_engine': 'InnoDB'}
+    )
+
+    #: Start date of the :py:class:`~.BiweeklyPayPeriod`
+    period_start = Column(Date, primary_key=True)
+
+    #: ID of the periodic Budget these sums are for
+    budget_id = Column(
+        Integer, ForeignKey('budgets.id'), primary_key=True, autoincrement=False
+    )
+
+    #: Relationship - the :py:class:`~.Budget` these sums are for
+    budget = relationship("Budget", uselist=False)
+
+    #: Sum of all ScheduledTransaction and Transaction amounts (or budgeted
+    #: amounts, where present) allocated against the budget in the period
+    allocated = Column(Numeric(precision=10, scale=4), nullable=False)
+
+    #: Sum of all actual Transaction amounts against the budget in the period
+    spent = Column(Numeric(precision=10, scale=4), nullable=False)
+
+    #: Sum of spent amounts for Transactions plus allocated amounts for
+    #: ScheduledTransactions against the budget in the period
+    trans_total = Column(Numeric(precision=10, scale=4), nullable=False)
+
+    def __repr__(self):
+        return "<PeriodBudgetSum(period_start=%s, budget_id=%s)>" % (
+            self.period_start, self.budget_id
+        )
@@ -0,0 +1,60 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2017 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+from sqlalchemy import Column, Date
+from biweeklybudget.models.base import Base, ModelAsDict
+
+
+class PeriodBudgetSumPeriod(Base, ModelAsDict):
+    """
+    Marker that the :py:class:`~.PeriodBudgetSum` rows for one
+    :py:class:`~.BiweeklyPayPeriod` are stored. A period can have a marker and
+    no PeriodBudgetSum rows (i.e. if there were no periodic Budgets), so that
+    it isn't recalculated every time its sums are requested. Markers are
+    removed and added along with the period's PeriodBudgetSum rows.
+    """
+
+    __tablename__ = 'period_budget_sum_periods'
+    __table_args__ = (
+        {'mysql_engine': 'InnoDB'}
+    )
+
+    #: Start date of the :py:class:`~.BiweeklyPayPeriod`
+    period_start = Column(Date, primary_key=True)
+
+    def __repr__(self):
+        return "<PeriodBudgetSumPeriod(period_start=%s)>" % self.period_start
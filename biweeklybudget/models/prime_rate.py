@@ -0,0 +1,107 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+from bisect import bisect_right
+from sqlalchemy import Column, Numeric, Date
+from biweeklybudget.models.base import Base, ModelAsDict
+
+
+class PrimeRate(Base, ModelAsDict):
+    """
+    Dated history of the US Prime Rate. A row is recorded (or updated) by
+    :py:class:`~.PrimeRateCalculator` each day it retrieves the rate, and the
+    rate in effect on any date is that of the most recent row on or before
+    it. This lets historical and simulated calculations look up rates by date
+    without any network access.
+    """
+
+    __tablename__ = 'prime_rates'
+    __table_args__ = (
+        {'mysql_engine': 'InnoDB'}
+    )
+
+    #: Date the rate was retrieved
+    date = Column(Date, primary_key=True)
+
+    #: US Prime Rate on that date, as a decimal (i.e. 0.0325 for 3.25%)
+    rate = Column(Numeric(precision=5, scale=4), nullable=False)
+
+    def __repr__(self):
+        return "<PrimeRate(date=%s, rate=%s)>" % (
+            self.date, self.rate
+        )
+
+    @staticmethod
+    def rates_for_dates(sess, dates):
+        """
+        Return the US Prime Rate in effect on each of the specified dates,
+        using a single query. Dates before the earliest recorded rate map to
+        None.
+
+        :param sess: database session
+        :type sess: sqlalchemy.orm.session.Session
+        :param dates: dates to look up the rate for
+        :type dates: list
+        :return: dict of date to rate (or None)
+        :rtype: dict
+        """
+        if len(dates) == 0:
+            return {}
+        rows = sess.query(PrimeRate.date, PrimeRate.rate).filter(
+            PrimeRate.date.__le__(max(dates))
+        ).order_by(PrimeRate.date.asc()).all()
+        keys = [r[0] for r in rows]
+        res = {}
+        for d in dates:
+            idx = bisect_right(keys, d)
+            res[d] = rows[idx - 1][1] if idx > 0 else None
+        return res
+
+    @staticmethod
+    def rate_for_date(sess, d):
+        """
+        Return the US Prime Rate in effect on the specified date, or None if
+        there is no recorded rate on or before it.
+
+        :param sess: database session
+        :type sess: sqlalchemy.orm.session.Session
+        :param d: date to look up the rate for
+        :type d: datetime.date
+        :return: rate in effect on ``d``, or None
+        :rtype: decimal.Decimal
+        """
+        return PrimeRate.rates_for_dates(sess, [d])[d]
@@ -35,17 +35,30 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 ################################################################################
 """
 
+from bisect import bisect_right
+from collections import defaultdict, namedtuple
+from datetime import timedelta
 from sqlalchemy import (
     Column, Integer, String, Boolean, Date, SmallInteger, Numeric,
-    ForeignKey, func
+    ForeignKey, func, or_, and_
 )
 from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import case
 
 from biweeklybudget.models.base import Base, ModelAsDict
+from biweeklybudget.models.transaction import Transaction
 from biweeklybudget.utils import date_suffix
 from sqlalchemy.ext.hybrid import hybrid_property
 
+#: One occurrence of a :py:class:`~.ScheduledTransaction`, as returned by
+#: :py:meth:`~.ScheduledTransaction.expand`. ``date`` is the date of the
+#: occurrence, or None for "per period" ScheduledTransactions; ``period_index``
+#: is the index of the period (in the list passed to ``expand()``) that the
+#: occurrence falls in; ``scheduled_transaction`` is the ScheduledTransaction.
+ScheduledOccurrence = namedtuple(
+    'ScheduledOccurrence', ['date', 'period_index', 'scheduled_transaction']
+)
+
 
 class ScheduledTransaction(Base, ModelAsDict):
 
@@ -180,3 +193,113 @@ class ScheduledTransaction(Base, ModelAsDict):
             ],
             else_=''
         )
+
+    @staticmethod
+    def expand(db, periods, exclude_converted=True, options=None):
+        """
+        Expand every active ScheduledTransaction over a list of consecutive,
+        non-overlapping date ranges (usually pay periods), using one query for
+        the ScheduledTransactions and (if ``exclude_converted`` is True) one
+        query for Transactions created from them.
+
+        * "date" ScheduledTransactions occur once, on their date, if it falls in
+          one of the periods.
+        * "monthly" ScheduledTransactions occur on their day of month in every
+          month, for each such date that falls in one of the periods.
+        * "per period" ScheduledTransactions occur
+          :py:attr:`~.num_per_period` times in every period, with a ``date`` of
+          None.
+
+        If ``exclude_converted`` is True, occurrences that have already been
+        converted to a :py:class:`~.Transaction` (via
+        :py:attr:`~.Transaction.scheduled_trans_id`) are removed: a date or
+        monthly ScheduledTransaction does not occur in a period that contains a
+        Transaction created from it, and a per-period ScheduledTransaction
+        occurs once less per such Transaction in the period.
+
+        Occurrences are returned sorted by date, with per-period occurrences
+        sorted by the start of their period (ahead of dated occurrences on the
+        same day) and ordered by number per period and then amount.
+
+        :param db: active database session
+        :type db: sqlalchemy.orm.session.Session
+        :param periods: list of (start date, end date) tuples (both
+          inclusive), in order
+        :type periods: list
+        :param exclude_converted: whether to exclude occurrences that have
+          already been converted to Transactions
+        :type exclude_converted: bool
+        :param options: optional list of loader options to apply to the
+          ScheduledTransaction query
+        :type options: list
+        :return: list of occurrences, sorted by date
+        :rtype: list of :py:data:`~.ScheduledOccurrence`
+        """
+        periods = list(periods)
+        if len(periods) == 0:
+            return []
+        starts = [p[0] for p in periods]
+        first_date = periods[0][0]
+        last_date = periods[-1][1]
+
+        def period_index(d):
+            idx = bisect_right(starts, d) - 1
+            if idx < 0 or d > periods[idx][1]:
+                return None
+            return idx
+
+        # count of Transactions per (period index, ScheduledTransaction ID)
+        converted = defaultdict(int)
+        if exclude_converted:
+            for t_date, st_id in db.query(
+                Transaction.date, Transaction.scheduled_trans_id
+            ).filter(
+                Transaction.scheduled_trans_id.isnot(None),
+                Transaction.date >= first_date,
+                Transaction.date <= last_date
+            ).all():
+                idx = period_index(t_date)
+                if idx is not None:
+                    converted[(idx, st_id)] += 1
+        q = db.query(ScheduledTransaction)
+        if options is not None:
+            q = q.options(*options)
+        res = []
+        monthly = defaultdict(list)
+        per_period = []
+        for st in q.filter(
+            ScheduledTransaction.is_active.__eq__(True),
+            or_(
+                ScheduledTransaction.date.is_(None),
+                and_(
+                    ScheduledTransaction.date >= first_date,
+                    ScheduledTransaction.date <= last_date
+                )
+            )
+        ).all():
+            if st.date is not None:
+                idx = period_index(st.date)
+                if idx is not None and converted[(idx, st.id)] == 0:
+                    res.append(ScheduledOccurrence(st.date, idx, st))
+            elif st.day_of_month is not None:
+                monthly[st.day_of_month].append(st)
+            elif st.num_per_period is not None:
+                per_period.append(st)
+        per_period.sort(key=lambda x: (x.num_per_period, x.amount))
+        for idx, (start, end) in enumerate(periods):
+            for st in per_period:
+                for _ in range(st.num_per_period - converted[(idx, st.id)]):
+                    res.append(ScheduledOccurrence(None, idx, st))
+            if len(monthly) == 0:
+                continue
+            d = start
+            while d <= end:
+                for st in monthly.get(d.day, []):
+                    if converted[(idx, st.id)] == 0:
+                        res.append(ScheduledOccurrence(d, idx, st))
+                d += timedelta(days=1)
+        res.sort(key=lambda o: (
+            periods[o.period_index][0] if o.date is None else o.date,
+            o.date is not None
+        ))
+        return res
@@ -0,0 +1,389 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import argparse
+import json
+import logging
+import threading
+from sqlalchemy import and_, select, func
+
+from biweeklybudget.cliutils import set_log_debug, set_log_info
+from biweeklybudget.models.account import Account
+from biweeklybudget.models.dbsetting import DBSetting
+from biweeklybudget.models.ofx_transaction import OFXTransaction
+
+logger = logging.getLogger(__name__)
+
+#: Default number of OFXTransactions to read and update at a time
+DEFAULT_CHUNK_SIZE = 1000
+
+#: Format of the names of the :py:class:`~.DBSetting` that background
+#: reclassification progress is stored in, by Account ID.
+PROGRESS_SETTING = 'ofx-reclassify-%s'
+
+
+class OFXReclassifier(object):
+    """
+    Bulk re-classification of the ``is_*`` fields of all of an Account's
+    :py:class:`~.OFXTransaction` rows, for use when the Account's ``re_*``
+    regexes change. This is equivalent to calling
+    :py:meth:`~.OFXTransaction.update_is_fields` on every transaction, but
+    works in chunks of ``(fitid, name)`` rows, ordered by primary key, without
+    loading any ORM instances. Rows whose fields change are updated with one
+    ``UPDATE ... WHERE fitid IN (...)`` statement per distinct set of new
+    values in each chunk.
+    """
+
+    def __init__(self, account_id, regexes, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        :param account_id: ID of the Account to reclassify transactions for
+        :type account_id: int
+        :param regexes: dict of Account ``re_*`` attribute name to regex string
+          (or None); see :py:attr:`~.OFXTransaction.IS_FIELDS`
+        :type regexes: dict
+        :param chunk_size: number of transactions to read and update at a time
+        :type chunk_size: int
+        """
+        self.account_id = account_id
+        self._patterns = OFXTransaction.is_patterns(account_id, regexes)
+        self._chunk_size = chunk_size
+        self._tbl = OFXTransaction.__table__
+
+    @staticmethod
+    def regexes_for_account(conn, account_id):
+        """
+        Return the current ``re_*`` regex strings of an Account, from the
+        database.
+
+        :param conn: database connection or session
+        :type conn: sqlalchemy.engine.Connection
+        :param account_id: Account ID
+        :type account_id: int
+        :return: dict of Account ``re_*`` attribute name to regex string
+        :rtype: dict
+        """
+        tbl = Account.__table__
+        attrs = sorted(OFXTransaction.IS_FIELDS.keys())
+        row = conn.execute(
+            select([tbl.c[x] for x in attrs]).where(tbl.c.id == account_id)
+        ).fetchone()
+        if row is None:
+            raise RuntimeError('No Account with ID %s' % account_id)
+        return dict(zip(attrs, row))
+
+    def count(self, conn):
+        """
+        Return the number of OFXTransactions for the Account.
+
+        :param conn: database connection or session
+        :type conn: sqlalchemy.engine.Connection
+        :return: number of OFXTransactions
+        :rtype: int
+        """
+        return conn.execute(
+            select([func.count()]).select_from(self._tbl).where(
+                self._tbl.c.account_id == self.account_id
+            )
+        ).scalar()
+
+    def _process_chunk(self, conn, after_fitid):
+        """
+        Reclassify the next chunk of transactions.
+
+        :param conn: database connection or session
+        :type conn: sqlalchemy.engine.Connection
+        :param after_fitid: FITID to start after, or None for the first chunk
+        :type after_fitid: str
+        :return: 3-tuple of last FITID in the chunk (None if there were no
+          rows), number of rows read and number of rows changed
+        :rtype: tuple
+        """
+        tbl = self._tbl
+        fields = sorted(OFXTransaction.IS_FIELDS.values())
+        cond = tbl.c.account_id == self.account_id
+        if after_fitid is not None:
+            cond = and_(cond, tbl.c.fitid > after_fitid)
+        rows = conn.execute(
+            select(
+                [tbl.c.fitid, tbl.c.name] + [tbl.c[x] for x in fields]
+            ).where(cond).order_by(tbl.c.fitid.asc()).limit(self._chunk_size)
+        ).fetchall()
+        if len(rows) == 0:
+            return None, 0, 0
+        updates = {}
+        for row in rows:
+            vals = OFXTransaction.is_field_values(row['name'], self._patterns)
+            if all(
+                row[k] is not None and bool(row[k]) == v
+                for k, v in vals.items()
+            ):
+                continue
+            updates.setdefault(
+                tuple(sorted(vals.items())), []
+            ).append(row['fitid'])
+        for vals, fitids in updates.items():
+            conn.execute(
+                tbl.update().where(
+                    and_(
+                        tbl.c.account_id == self.account_id,
+                        tbl.c.fitid.in_(fitids)
+                    )
+                ).values(**dict(vals))
+            )
+        return (
+            rows[-1]['fitid'], len(rows),
+            sum(len(x) for x in updates.values())
+        )
+
+    def run(self, conn, progress_callback=None, transaction_per_chunk=False):
+        """
+        Reclassify all of the Account's OFXTransactions.
+
+        :param conn: database connection or session. If
+          ``transaction_per_chunk`` is False, all updates are made in its
+          current transaction.
+        :type conn: sqlalchemy.engine.Connection
+        :param progress_callback: optional callable, called after each chunk
+          with the number of transactions processed so far, the total number of
+          transactions, and the number changed so far.
+        :type progress_callback: callable
+        :param transaction_per_chunk: if True, ``conn`` must be a Connection;
+          each chunk is processed in (and committed as) its own transaction.
+        :type transaction_per_chunk: bool
+        :return: 2-tuple of number of transactions processed and number changed
+        :rtype: tuple
+        """
+        total = self.count(conn)
+        logger.info(
+            'Reclassifying %d OFXTransactions for Account %s',
+            total, self.account_id
+        )
+        processed = 0
+        changed = 0
+        last = None
+        while True:
+            if transaction_per_chunk:
+                with conn.begin():
+                    last, num, num_changed = self._process_chunk(conn, last)
+            else:
+                last, num, num_changed = self._process_chunk(conn, last)
+            if num == 0:
+                break
+            processed += num
+            changed += num_changed
+            if progress_callback is not None:
+                progress_callback(processed, total, changed)
+        logger.info(
+            'Reclassified %d OFXTransactions for Account %s; %d changed',
+            processed, self.account_id, changed
+        )
+        return processed, changed
+
+
+def reclassify_progress(sess, account_id):
+    """
+    Return the progress of the most recent background reclassification of an
+    Account's OFXTransactions (see :py:func:`~.start_background_reclassify`).
+
+    :param sess: database session
+    :type sess: sqlalchemy.orm.session.Session
+    :param account_id: Account ID
+    :type account_id: int
+    :return: dict with keys ``total``, ``processed``, ``changed``, ``done``
+      (bool) and ``error`` (str or None), or None if no reclassification
+      has been run in the background for the Account
+    :rtype: dict
+    """
+    s = sess.query(DBSetting).get(PROGRESS_SETTING % account_id)
+    if s is None:
+        return None
+    return json.loads(s.value)
+
+
+def _run_background_reclassify(bind, account_id, chunk_size):
+    """
+    Target of the background reclassification thread started by
+    :py:func:`~.start_background_reclassify`.
+
+    :param bind: engine or connection to use
+    :type bind: sqlalchemy.engine.Engine
+    :param account_id: Account ID
+    :type account_id: int
+    :param chunk_size: number of transactions to read and update at a time
+    :type chunk_size: int
+    """
+    from biweeklybudget.db_event_handlers import DATA_GENERATION_SETTING
+    name = PROGRESS_SETTING % account_id
+    progress = {
+        'total': None, 'processed': 0, 'changed': 0, 'done': False,
+        'error': None
+    }
+
+    def record(processed=None, total=None, changed=None):
+        if processed is not None:
+            progress.update(
+                processed=processed, total=total, changed=changed
+            )
+        with conn.begin():
+            DBSetting.set_value(conn, name, json.dumps(progress))
+
+    with bind.connect() as conn:
+        try:
+            record()
+            rc = OFXReclassifier(
+                account_id,
+                OFXReclassifier.regexes_for_account(conn, account_id),
+                chunk_size=chunk_size
+            )
+            rc.run(
+                conn, progress_callback=record, transaction_per_chunk=True
+            )
+        except Exception as ex:
+            logger.error(
+                'Error reclassifying OFXTransactions for Account %s',
+                account_id, exc_info=True
+            )
+            progress['error'] = str(ex)
+        progress['done'] = True
+        record()
+        with conn.begin():
+            DBSetting.increment_counter(conn, DATA_GENERATION_SETTING)
+
+
+def start_background_reclassify(bind, account_id,
+                                chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Reclassify all of an Account's OFXTransactions with
+    :py:class:`~.OFXReclassifier` in a daemon thread, committing each chunk
+    and recording progress in the :py:attr:`~.PROGRESS_SETTING`
+    :py:class:`~.DBSetting` for the account (see
+    :py:func:`~.reclassify_progress`). The Account's regexes are read from
+    the database, so any changes to them must already be committed.
+
+    :param bind: engine or connection to use
+    :type bind: sqlalchemy.engine.Engine
+    :param account_id: Account ID
+    :type account_id: int
+    :param chunk_size: number of transactions to read and update at a time
+    :type chunk_size: int
+    :return: the started thread
+    :rtype: threading.Thread
+    """
+    logger.info(
+        'Starting background reclassification of OFXTransactions for '
+        'Account %s', account_id
+    )
+    t = threading.Thread(
+        target=_run_background_reclassify, args=(bind, account_id, chunk_size),
+        name='ofx-reclassify-%s' % account_id
+    )
+    t.daemon = True
+    t.start()
+    return t
+
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description='Re-apply the Account regexes to set the is_* fields of '
+                    'all OFXTransactions'
+    )
+    p.add_argument('-v', '--verbose', dest='verbose', action='count', default=0,
+                   help='verbose output. specify twice for debug-level output.')
+    p.add_argument('-a', '--account-id', dest='account_ids', action='append',
+                   type=int, default=[],
+                   help='Account ID to reclassify; may be specified multiple '
+                        'times (default: all accounts)')
+    p.add_argument('-c', '--chunk-size', dest='chunk_size', action='store',
+                   type=int, default=DEFAULT_CHUNK_SIZE,
+                   help='number of transactions to read and update at a '
+                        'time (default: %d)' % DEFAULT_CHUNK_SIZE)
+    args = p.parse_args()
+    return args
+
+
+def main():
+    global logger
+    logging.basicConfig(
+        level=logging.WARNING,
+        format="[%(asctime)s %(levelname)s] %(message)s"
+    )
+    logger = logging.getLogger()
+
+    args = parse_args()
+
+    # set logging level
+    if args.verbose > 1:
+        set_log_debug(logger)
+    elif args.verbose == 1:
+        set_log_info(logger)
+
+    from biweeklybudget.db import init_db, engine, cleanup_db
+    from biweeklybudget.db_event_handlers import DATA_GENERATION_SETTING
+    init_db()
+    ids = args.account_ids
+    with engine.connect() as conn:
+        if len(ids) == 0:
+            ids = [
+                r[0] for r in conn.execute(
+                    select([Account.__table__.c.id]).order_by(
+                        Account.__table__.c.id
+                    )
+                )
+            ]
+        for acct_id in ids:
+            rc = OFXReclassifier(
+                acct_id, OFXReclassifier.regexes_for_account(conn, acct_id),
+                chunk_size=args.chunk_size
+            )
+            processed, changed = rc.run(
+                conn, transaction_per_chunk=True,
+                progress_callback=lambda p, t, c: print(
+                    'Account %s: %d of %d transactions (%d changed)' % (
+                        acct_id, p, t, c
+                    )
+                )
+            )
+            print('Account %s: reclassified %d transactions; %d changed' % (
+                acct_id, processed, changed
+            ))
+        with conn.begin():
+            DBSetting.increment_counter(conn, DATA_GENERATION_SETTING)
+    cleanup_db()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,598 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import argparse
+import sys
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from decimal import Decimal
+
+from biweeklybudget import settings
+from biweeklybudget.cliutils import set_log_debug, set_log_info
+from biweeklybudget.interest import (
+    AdbCompoundedDaily, SimpleInterest, MinPaymentAmEx, MinPaymentDiscover,
+    MinPaymentCiti, MinPaymentMethod, HighestBalanceFirstMethod,
+    HighestInterestRateFirstMethod, LowestBalanceFirstMethod,
+    LowestInterestRateFirstMethod, PAYOFF_METHOD_NAMES
+)
+from biweeklybudget.utils import fmt_currency
+
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:
+    HAVE_NUMPY = False
+
+logger = logging.getLogger(__name__)
+
+#: Interest calculation classes supported by the batch engine, mapped to the
+#: integer code used for them in the input arrays.
+INTEREST_KINDS = {AdbCompoundedDaily: 0, SimpleInterest: 1}
+
+#: Minimum payment formula classes supported by the batch engine, mapped to
+#: the integer code used for them in the input arrays.
+MIN_PAYMENT_KINDS = {
+    MinPaymentAmEx: 0, MinPaymentDiscover: 1, MinPaymentCiti: 2
+}
+
+#: Payoff method classes supported by the batch engine, mapped to a 2-tuple
+#: of the per-card value that selects the card receiving all payment above the
+#: minimums (``principal`` or ``apr``) and whether the highest (``max``) or
+#: lowest (``min``) value is selected. ``None`` means minimum payments only.
+PAYOFF_METHOD_KINDS = {
+    MinPaymentMethod: None,
+    HighestBalanceFirstMethod: ('principal', 'max'),
+    HighestInterestRateFirstMethod: ('apr', 'max'),
+    LowestBalanceFirstMethod: ('principal', 'min'),
+    LowestInterestRateFirstMethod: ('apr', 'min')
+}
+
+#: Percentiles reported by :py:meth:`~.PayoffRiskSimulation.run`.
+PERCENTILES = [5, 25, 50, 75, 95]
+
+
+class PayoffRiskSimulation(object):
+    """
+    Monte Carlo simulation of credit card payoffs, for the statements of an
+    :py:class:`~.InterestHelper`, over thousands of randomized scenarios.
+
+    Each scenario randomizes:
+
+    * New spending on each card, each month that the card is not yet paid off
+      (exponentially distributed with a mean of ``spending_mean``).
+    * The US Prime Rate, which moves up or down by ``prime_change_step`` with
+      probability ``prime_change_prob`` each month. Cards with a
+      :py:attr:`~.Account.prime_rate_margin` have their APR shifted by the
+      same amount (but not below zero); other cards keep a fixed APR.
+    * Payment increases, each of which is skipped with probability
+      ``skip_increase_prob``.
+
+    Scenarios are simulated in batches with NumPy, one array row per scenario
+    and one column per card, all advancing one billing period per step. The
+    batches are split across worker processes when more than one worker is
+    configured. Billing periods come from the helper's
+    :py:class:`~.BillingPeriodCalendar`. The batch engine re-implements the
+    supported interest, minimum payment and payoff method classes with float
+    arithmetic, so its results approximate those of
+    :py:class:`~.PayoffSimulation` (which remains exact). It is for
+    estimating risk, not for exact payoff figures.
+
+    Requires ``numpy``.
+    """
+
+    def __init__(self, interest_helper, spending_mean=Decimal('25.00'),
+                 prime_change_prob=Decimal('0.125'),
+                 prime_change_step=Decimal('0.0025'),
+                 skip_increase_prob=Decimal('0.1'), max_periods=600):
+        """
+        :param interest_helper: InterestHelper with the current statements,
+          payment increases and onetimes
+        :type interest_helper: biweeklybudget.interest.InterestHelper
+        :param spending_mean: mean of the new spending on each card per month
+        :type spending_mean: decimal.Decimal
+        :param prime_change_prob: probability of a Prime Rate change in any
+          month
+        :type prime_change_prob: decimal.Decimal
+        :param prime_change_step: size of each Prime Rate change, as a decimal
+        :type prime_change_step: decimal.Decimal
+        :param skip_increase_prob: probability that each payment increase is
+          skipped
+        :type skip_increase_prob: decimal.Decimal
+        :param max_periods: maximum number of billing periods to simulate;
+          scenarios not paid off by then count as failed
+        :type max_periods: int
+        """
+        if not HAVE_NUMPY:
+            raise RuntimeError(
+                'PayoffRiskSimulation requires numpy; please install '
+                'biweeklybudget[risk].'
+            )
+        self._ih = interest_helper
+        self._params = {
+            'spending_mean': float(spending_mean),
+            'prime_change_prob': float(prime_change_prob),
+            'prime_change_step': float(prime_change_step),
+            'skip_increase_prob': float(skip_increase_prob)
+        }
+        self._max_periods = max_periods
+        self._inputs = None
+
+    def _make_inputs(self):
+        """
+        Build the picklable dict of arrays describing the cards, billing
+        periods and payment amounts, shared by every batch.
+
+        :return: batch inputs
+        :rtype: dict
+        """
+        stmts = self._ih.statements
+        ids = list(stmts.keys())
+        num_periods = self._max_periods
+        chains = []
+        for a_id in ids:
+            chain = self._ih.calendar.chain_for(stmts[a_id].billing_period)
+            chain.extend_to(num_periods + 1)
+            chains.append(chain)
+        n_days = np.zeros((len(ids), num_periods), dtype=np.int64)
+        pay_day = np.zeros((len(ids), num_periods), dtype=np.int64)
+        for c, chain in enumerate(chains):
+            for t in range(num_periods):
+                start = chain.start_dates[t + 1]
+                n_days[c, t] = (chain.end_dates[t + 1] - start).days + 1
+                pay_day[c, t] = (chain.payment_dates[t + 1] - start).days
+        interest_kind = []
+        min_kind = []
+        for a_id in ids:
+            s = stmts[a_id]
+            for kinds, obj, lst in [
+                (INTEREST_KINDS, s._interest_cls, interest_kind),
+                (MIN_PAYMENT_KINDS, s._min_pay_cls, min_kind)
+            ]:
+                if type(obj) not in kinds:
+                    raise TypeError(
+                        '%s is not supported by PayoffRiskSimulation' %
+                        type(obj).__name__
+                    )
+                lst.append(kinds[type(obj)])
+        # payment increases and onetimes, per card and step; like
+        # _PayoffMethod.max_total_for_period(), which is called with the
+        # period of the first unpaid card
+        inc_dates = sorted(self._ih.increases.keys())
+        inc_eligible = np.zeros(
+            (len(ids), len(inc_dates), num_periods), dtype=bool
+        )
+        onetimes = np.zeros((len(ids), num_periods))
+        for c, chain in enumerate(chains):
+            for t in range(num_periods):
+                pay_d = chain.payment_dates[t]
+                for k, d in enumerate(inc_dates):
+                    inc_eligible[c, k, t] = d <= pay_d
+                prev_pd = chain.periods[t].prev_period.payment_date
+                for d, amt in self._ih.onetimes.items():
+                    if prev_pd < d <= pay_d:
+                        onetimes[c, t] += float(amt)
+        return {
+            'account_ids': ids,
+            'principal': np.array(
+                [float(stmts[x].principal) for x in ids]
+            ),
+            'interest': np.array([float(stmts[x].interest) for x in ids]),
+            'apr': np.array([float(stmts[x].apr) for x in ids]),
+            'variable_apr': np.array([
+                self._ih.accounts[x].prime_rate_margin is not None
+                for x in ids
+            ], dtype=bool),
+            'interest_kind': np.array(interest_kind, dtype=np.int64),
+            'min_kind': np.array(min_kind, dtype=np.int64),
+            'n_days': n_days,
+            'pay_day': pay_day,
+            'max_total': float(sum(self._ih.min_payments.values())),
+            'inc_eligible': inc_eligible,
+            'inc_amts': np.array(
+                [float(self._ih.increases[d]) for d in inc_dates]
+            ),
+            'onetimes': onetimes,
+            'payment_dates': [
+                chains[0].payment_dates[t] for t in range(num_periods + 1)
+            ] if len(chains) > 0 else []
+        }
+
+    @property
+    def inputs(self):
+        """
+        Return the batch inputs; see :py:meth:`~._make_inputs`.
+
+        :return: batch inputs
+        :rtype: dict
+        """
+        if self._inputs is None:
+            self._inputs = self._make_inputs()
+        return self._inputs
+
+    def run(self, method_names=None, num_scenarios=1000, batch_size=250,
+            seed=None, workers=None):
+        """
+        Run the simulation for each payoff method.
+
+        Every method is evaluated against the same random scenarios.
+
+        :param method_names: names of the payoff methods (keys of
+          :py:data:`~.PAYOFF_METHOD_NAMES`) to simulate; defaults to all that
+          are shown in the UI
+        :type method_names: list
+        :param num_scenarios: total number of scenarios
+        :type num_scenarios: int
+        :param batch_size: number of scenarios per batch
+        :type batch_size: int
+        :param seed: random seed, for reproducible results
+        :type seed: int
+        :param workers: number of worker processes; defaults to
+          :py:attr:`~biweeklybudget.settings.PAYOFF_WORKERS`
+        :type workers: int
+        :return: dict of payoff method name to result dict, with keys
+          ``num_scenarios`` (int), ``num_failed`` (int, scenarios where the
+          payment could not cover the minimums, or that were not paid off
+          within ``max_periods``) and ``percentiles``. ``percentiles`` maps
+          each of :py:data:`~.PERCENTILES` to a dict with keys
+          ``payoff_months`` (int), ``payoff_date`` (datetime.date) and
+          ``total_interest`` (Decimal), over the scenarios that did not fail.
+        :rtype: dict
+        """
+        if method_names is None:
+            method_names = [
+                n for n in sorted(PAYOFF_METHOD_NAMES.keys())
+                if PAYOFF_METHOD_NAMES[n]['cls'].show_in_ui
+            ]
+        if workers is None:
+            workers = settings.PAYOFF_WORKERS
+        sizes = [batch_size] * (num_scenarios // batch_size)
+        if num_scenarios % batch_size:
+            sizes.append(num_scenarios % batch_size)
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        jobs = []
+        for name in method_names:
+            kind = PAYOFF_METHOD_KINDS[PAYOFF_METHOD_NAMES[name]['cls']]
+            for size, ss in zip(sizes, seeds):
+                jobs.append((name, kind, size, ss))
+        results = self._run_jobs(jobs, workers)
+        res = {}
+        for name in method_names:
+            batches = [r for (n, _, _, _), r in zip(jobs, results) if n == name]
+            res[name] = self._summarize(batches)
+        return res
+
+    def _run_jobs(self, jobs, workers):
+        """
+        Run each batch in ``jobs`` with :py:func:`~._simulate_batch`, in a
+        process pool if ``workers`` is greater than 1 (falling back to serial
+        if the pool cannot be used). Return the results in the same order.
+
+        :param jobs: list of (method name, method kind, batch size, seed
+          sequence) tuples
+        :type jobs: list
+        :param workers: number of worker processes
+        :type workers: int
+        :return: list of :py:func:`~._simulate_batch` results
+        :rtype: list
+        """
+        args = [
+            (self.inputs, self._params, kind, size, ss)
+            for _, kind, size, ss in jobs
+        ]
+        if workers > 1 and len(jobs) > 1:
+            try:
+                with ProcessPoolExecutor(
+                    max_workers=min(workers, len(jobs))
+                ) as executor:
+                    futures = [executor.submit(_simulate_batch, *a)
+                               for a in args]
+                    return [f.result() for f in futures]
+            except (BrokenProcessPool, NotImplementedError, OSError) as ex:
+                logger.warning(
+                    'Unable to run payoff risk batches in a process pool '
+                    '(%s); running serially', ex
+                )
+        return [_simulate_batch(*a) for a in args]
+
+    def _summarize(self, batches):
+        """
+        Combine the results of all batches for one payoff method into the
+        result dict described in :py:meth:`~.run`.
+
+        :param batches: list of :py:func:`~._simulate_batch` results
+        :type batches: list
+        :return: result dict
+        :rtype: dict
+        """
+        months = np.concatenate([b['months'] for b in batches])
+        interest = np.concatenate([b['interest'] for b in batches])
+        failed = np.concatenate([b['failed'] for b in batches])
+        res = {
+            'num_scenarios': int(len(months)),
+            'num_failed': int(failed.sum()),
+            'percentiles': {}
+        }
+        if res['num_failed'] == res['num_scenarios']:
+            return res
+        months = months[~failed]
+        interest = interest[~failed]
+        for pct in PERCENTILES:
+            m = int(np.ceil(np.percentile(months, pct)))
+            res['percentiles'][pct] = {
+                'payoff_months': m,
+                'payoff_date': self.inputs['payment_dates'][m],
+                'total_interest': Decimal(
+                    '%.2f' % np.percentile(interest, pct)
+                )
+            }
+        return res
+
+
+def _min_payments(bal, interest, min_kind):
+    """
+    Vectorized :py:class:`~._MinPaymentFormula` calculations.
+
+    :param bal: balances, shape (scenarios, cards)
+    :type bal: numpy.ndarray
+    :param interest: last interest charges, shape (scenarios, cards)
+    :type interest: numpy.ndarray
+    :param min_kind: :py:data:`~.MIN_PAYMENT_KINDS` code of each card
+    :type min_kind: numpy.ndarray
+    :return: minimum payments, shape (scenarios, cards)
+    :rtype: numpy.ndarray
+    """
+    amex = np.maximum(interest + bal * 0.01, 35.0)
+    discover = np.maximum(np.maximum(bal * 0.02, interest + 20.0), 35.0)
+    citi = np.maximum(
+        np.maximum(bal * 0.01 + interest, np.round(bal * 0.015)), 25.0
+    )
+    citi = np.where(bal < 25.0, np.maximum(citi, bal), citi)
+    return np.where(
+        min_kind == 0, amex, np.where(min_kind == 1, discover, citi)
+    )
+
+
+def _compound(bal, r, dpr, days):
+    """
+    Vectorized version of :py:func:`biweeklybudget.interest._compound_run`.
+
+    :return: 2-tuple of final balances and sums of daily balances
+    :rtype: tuple
+    """
+    rn = r ** days
+    safe = np.where(dpr == 0, 1.0, dpr)
+    total = np.where(dpr == 0, bal * days, bal * r * (rn - 1) / safe)
+    return bal * rn, total
+
+
+def _next_period(bal, amount, apr, n_days, pay_day, interest_kind):
+    """
+    Vectorized :py:class:`~.AdbCompoundedDaily` and
+    :py:class:`~.SimpleInterest` calculation for one billing period, with
+    ``amount`` applied on day ``pay_day`` of the period.
+
+    :return: 2-tuple of end balances and interest charged
+    :rtype: tuple
+    """
+    dpr = apr / 365.0
+    r = 1 + dpr
+    b1, t1 = _compound(bal, r, dpr, pay_day)
+    b2, t2 = _compound(b1 + amount, r, dpr, n_days - pay_day)
+    adb_interest = (t1 + t2) / n_days * apr * n_days / 365.0
+    adb_bal = b2 + adb_interest * dpr
+    simple_bal = bal + amount
+    simple_interest = simple_bal * apr * n_days / 365.0
+    is_adb = interest_kind == 0
+    return (
+        np.where(is_adb, adb_bal, simple_bal + simple_interest),
+        np.where(is_adb, adb_interest, simple_interest)
+    )
+
+
+def _simulate_batch(inputs, params, method_kind, size, seed_seq):
+    """
+    Simulate one batch of ``size`` scenarios for one payoff method. This is a
+    module-level function so that it can run in a worker process.
+
+    :param inputs: :py:attr:`~.PayoffRiskSimulation.inputs`
+    :type inputs: dict
+    :param params: randomization parameters
+    :type params: dict
+    :param method_kind: value from :py:data:`~.PAYOFF_METHOD_KINDS`
+    :type method_kind: tuple
+    :param size: number of scenarios in the batch
+    :type size: int
+    :param seed_seq: seed for this batch's random number generator
+    :type seed_seq: numpy.random.SeedSequence
+    :return: dict with keys ``months`` (payoff months of the last card paid
+      off), ``interest`` (total interest) and ``failed`` (bool), each an
+      array with one element per scenario
+    :rtype: dict
+    """
+    rng = np.random.default_rng(seed_seq)
+    num_cards = len(inputs['principal'])
+    num_periods = inputs['n_days'].shape[1]
+    bal = np.tile(inputs['principal'], (size, 1))
+    intr = np.tile(inputs['interest'], (size, 1))
+    base_apr = inputs['apr']
+    variable = inputs['variable_apr']
+    min_kind = inputs['min_kind']
+    interest_kind = inputs['interest_kind']
+    prime_shift = np.zeros((size, 1))
+    skipped = rng.random((size, len(inputs['inc_amts']))) < \
+        params['skip_increase_prob']
+    active = np.ones((size, num_cards), dtype=bool)
+    months = np.zeros((size, num_cards), dtype=np.int64)
+    paid = np.zeros(size)
+    spent = np.zeros(size)
+    failed = np.zeros(size, dtype=bool)
+    rows = np.arange(size)
+    for t in range(num_periods):
+        if not active.any():
+            break
+        apr = np.where(
+            variable, np.maximum(base_apr + prime_shift, 0.0), base_apr
+        )
+        mins = np.where(active, _min_payments(bal, intr, min_kind), 0.0)
+        pay = mins
+        if method_kind is not None:
+            # index of the first unpaid card, whose period the increases
+            # and onetimes are applied by
+            ref = np.argmax(active, axis=1)
+            max_total = np.full(size, inputs['max_total'])
+            for k, amt in enumerate(inputs['inc_amts']):
+                max_total = np.where(
+                    inputs['inc_eligible'][ref, k, t] & ~skipped[:, k],
+                    amt, max_total
+                )
+            max_total = max_total + inputs['onetimes'][ref, t]
+            min_sum = mins.sum(axis=1)
+            infeasible = (min_sum > max_total) & active.any(axis=1)
+            failed |= infeasible
+            active[infeasible] = False
+            key = bal if method_kind[0] == 'principal' else \
+                np.broadcast_to(apr, bal.shape)
+            if method_kind[1] == 'max':
+                target = np.argmax(np.where(active, key, -np.inf), axis=1)
+            else:
+                target = np.argmin(np.where(active, key, np.inf), axis=1)
+            pay = mins.copy()
+            pay[rows, target] += np.where(
+                active.any(axis=1), max_total - min_sum, 0.0
+            )
+        active &= bal > 0
+        done = active & (bal <= pay)
+        paid += np.where(done, bal, np.where(active, pay, 0.0)).sum(axis=1)
+        months += active
+        active &= ~done
+        spend = np.zeros((size, num_cards))
+        if params['spending_mean'] > 0:
+            spend = np.where(
+                active,
+                rng.exponential(params['spending_mean'], (size, num_cards)),
+                0.0
+            )
+        spent += spend.sum(axis=1)
+        new_bal, new_intr = _next_period(
+            bal + spend, -pay, apr, inputs['n_days'][:, t],
+            inputs['pay_day'][:, t], interest_kind
+        )
+        bal = np.where(active, new_bal, bal)
+        intr = np.where(active, new_intr, intr)
+        change = rng.random((size, 1)) < params['prime_change_prob']
+        sign = np.where(rng.random((size, 1)) < 0.5, -1.0, 1.0)
+        prime_shift = prime_shift + change * sign * \
+            params['prime_change_step']
+    failed |= active.any(axis=1)
+    return {
+        'months': months.max(axis=1) if num_cards > 0 else
+        np.zeros(size, dtype=np.int64),
+        'interest': paid - inputs['principal'].sum() - spent,
+        'failed': failed
+    }
+
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description='Monte Carlo simulation of credit card payoff dates and '
+                    'total interest, with randomized spending, Prime Rate '
+                    'changes and skipped payment increases. Requires numpy '
+                    '(install biweeklybudget[risk]).'
+    )
+    p.add_argument('-v', '--verbose', dest='verbose', action='count', default=0,
+                   help='verbose output. specify twice for debug-level output.')
+    p.add_argument('-n', '--num-scenarios', dest='num_scenarios',
+                   action='store', type=int, default=1000,
+                   help='number of scenarios to simulate (default: 1000)')
+    p.add_argument('-s', '--seed', dest='seed', action='store', type=int,
+                   default=None, help='random seed')
+    p.add_argument('--spending', dest='spending_mean', action='store',
+                   type=str, default='25.00',
+                   help='mean new spending per card per month (default: 25)')
+    args = p.parse_args()
+    return args
+
+
+def main():
+    global logger
+    logging.basicConfig(
+        level=logging.WARNING,
+        format="[%(asctime)s %(levelname)s] %(message)s"
+    )
+    logger = logging.getLogger()
+
+    args = parse_args()
+
+    if not HAVE_NUMPY:
+        sys.stderr.write(
+            'ERROR: payoffrisk requires numpy; please install it with: '
+            'pip install biweeklybudget[risk]\n'
+        )
+        raise SystemExit(1)
+
+    # set logging level
+    if args.verbose > 1:
+        set_log_debug(logger)
+    elif args.verbose == 1:
+        set_log_info(logger)
+
+    from biweeklybudget.db import init_db, db_session, cleanup_db
+    from biweeklybudget.interest import InterestHelper
+    init_db()
+    sim = PayoffRiskSimulation(
+        InterestHelper(db_session),
+        spending_mean=Decimal(args.spending_mean)
+    )
+    res = sim.run(num_scenarios=args.num_scenarios, seed=args.seed)
+    cleanup_db()
+    for name in sorted(res.keys()):
+        r = res[name]
+        print('%s (%d scenarios, %d failed)' % (
+            PAYOFF_METHOD_NAMES[name]['description'], r['num_scenarios'],
+            r['num_failed']
+        ))
+        for pct in sorted(r['percentiles'].keys()):
+            p = r['percentiles'][pct]
+            print('\tp%d\t%d months\t%s\t%s interest' % (
+                pct, p['payoff_months'], p['payoff_date'].strftime('%Y-%m-%d'),
+                fmt_currency(p['total_interest'])
+            ))
+
+
+if __name__ == "__main__":
+    main()
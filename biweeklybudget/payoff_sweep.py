@@ -0,0 +1,126 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import argparse
+import logging
+from decimal import Decimal
+
+from biweeklybudget.cliutils import set_log_debug, set_log_info
+from biweeklybudget.interest import (
+    InterestHelper, PAYOFF_METHOD_NAMES, payment_settings_json,
+    payment_settings_dict
+)
+from biweeklybudget.utils import fmt_currency
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description='Calculate credit card payoff months and total interest '
+                    'for each payoff method over a range of total monthly '
+                    'payment amounts, using the payment increases and onetime '
+                    'payments stored on the Credit Card Payoffs page'
+    )
+    p.add_argument('-v', '--verbose', dest='verbose', action='count', default=0,
+                   help='verbose output. specify twice for debug-level output.')
+    p.add_argument('-s', '--start', dest='start', action='store', type=str,
+                   default=None,
+                   help='first total monthly payment amount (default: sum '
+                        'of minimum payments)')
+    p.add_argument('-e', '--stop', dest='stop', action='store', type=str,
+                   default=None,
+                   help='last total monthly payment amount (default: start '
+                        'plus 2000)')
+    p.add_argument('-i', '--step', dest='step', action='store', type=str,
+                   default='50',
+                   help='increment between payment amounts (default: 50)')
+    args = p.parse_args()
+    return args
+
+
+def main():
+    global logger
+    logging.basicConfig(
+        level=logging.WARNING,
+        format="[%(asctime)s %(levelname)s] %(message)s"
+    )
+    logger = logging.getLogger()
+
+    args = parse_args()
+
+    # set logging level
+    if args.verbose > 1:
+        set_log_debug(logger)
+    elif args.verbose == 1:
+        set_log_info(logger)
+
+    from biweeklybudget.db import init_db, db_session, cleanup_db
+    init_db()
+    ih = InterestHelper(
+        db_session, **payment_settings_dict(payment_settings_json(db_session))
+    )
+    start = sum(ih.min_payments.values())
+    if args.start is not None:
+        start = Decimal(args.start)
+    stop = start + Decimal('2000')
+    if args.stop is not None:
+        stop = Decimal(args.stop)
+    res = ih.payoff_sweep(start, stop, Decimal(args.step))
+    cleanup_db()
+    names = [
+        name for name in sorted(PAYOFF_METHOD_NAMES.keys())
+        if PAYOFF_METHOD_NAMES[name]['cls'].show_in_ui
+    ]
+    print('\t'.join(
+        ['Payment'] + ['%s Months\t%s Interest' % (n, n) for n in names]
+    ))
+    for r in res:
+        line = [fmt_currency(r['max_total'])]
+        for name in names:
+            m = r['methods'][name]
+            if 'error' in m:
+                line.extend(['error', 'error'])
+                continue
+            line.extend([
+                '%d' % m['payoff_months'], fmt_currency(m['total_interest'])
+            ])
+        print('\t'.join(line))
+
+
+if __name__ == "__main__":
+    main()
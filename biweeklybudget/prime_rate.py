@@ -38,20 +38,57 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 from decimal import Decimal
 import json
 from datetime import timedelta
+import threading
+import time
 
 import lxml.html
 from lxml.etree import tostring
 import requests
 import logging
+from sqlalchemy.orm import Session
 
+from biweeklybudget import settings
 from biweeklybudget.models.dbsetting import DBSetting
+from biweeklybudget.models.prime_rate import PrimeRate
 from biweeklybudget.utils import dtnow, decode_json_datetime
 from biweeklybudget.flaskapp.jsonencoder import MagicJSONEncoder
 
 logger = logging.getLogger(__name__)
 
+#: Age beyond which the stored Prime Rate is refreshed from the web
+MAX_RATE_AGE = timedelta(hours=48)
+
+#: Process-wide cache of the stored Prime Rate, shared by all
+#: :py:class:`~.PrimeRateCalculator` instances. Keys are database URLs; values
+#: are dicts with keys ``rate`` (:py:class:`decimal.Decimal`), ``date`` (the
+#: datetime the rate was retrieved) and ``loaded`` (:py:func:`time.monotonic`
+#: value when it was read from the database).
+_cache = {}
+
+#: Database URLs with a background refresh currently running
+_refreshing = set()
+
+#: Database URL to :py:func:`time.monotonic` value of the last background
+#: refresh started for it
+_last_refresh = {}
+
+#: Lock protecting ``_cache``, ``_refreshing`` and ``_last_refresh``
+_lock = threading.Lock()
+
 
 class PrimeRateCalculator(object):
+    """
+    Calculate APRs based on the US Prime Rate.
+
+    The rate is stored in the ``prime_rate`` :py:class:`~.DBSetting`, and each
+    daily value is recorded in the :py:class:`~.PrimeRate` history table. The
+    stored rate is cached in-process for
+    :py:attr:`~biweeklybudget.settings.PRIME_RATE_CACHE_SECONDS` and shared by
+    all instances. Once it is older than :py:data:`~.MAX_RATE_AGE`, the stale
+    value continues to be returned while a background thread retrieves the
+    new rate; the rate is only retrieved in the calling thread when none has
+    ever been stored.
+    """
 
     def __init__(self, db_session):
         """
@@ -60,6 +97,25 @@ class PrimeRateCalculator(object):
         """
         self._db_sess = db_session
 
+    @staticmethod
+    def clear_cache():
+        """
+        Clear the process-wide cache of the stored Prime Rate.
+        """
+        with _lock:
+            _cache.clear()
+            _last_refresh.clear()
+
+    @property
+    def _cache_key(self):
+        """
+        Return the key for this instance's database in the process-wide cache.
+
+        :return: database URL
+        :rtype: str
+        """
+        return str(self._db_sess.get_bind().url)
+
     def _rate_from_marketwatch(self):
         url = 'https://www.wsj.com/market-data/bonds/moneyrates'
         logger.debug('Requesting %s for prime rate', url)
@@ -95,8 +151,9 @@ class PrimeRateCalculator(object):
 
     def _get_prime_rate(self):
         """
-        Get the US Prime Rate from MarketWatch; update the DB and return the
-        value.
+        Get the US Prime Rate from MarketWatch; update the DB (both the
+        ``prime_rate`` DBSetting and today's :py:class:`~.PrimeRate` history
+        row) and the process-wide cache, and return the value.
 
         :return: current US Prime Rate
         :rtype: decimal.Decimal
@@ -107,15 +164,102 @@ class PrimeRateCalculator(object):
         if s is None:
             s = DBSetting(name='prime_rate')
         logger.info('Got Prime Rate from MarketWatch: %s', rate)
+        now = dtnow()
         s.value = json.dumps({
             'value': '%s' % rate,
-            'date': dtnow()
+            'date': now
         }, cls=MagicJSONEncoder)
         self._db_sess.add(s)
+        self._db_sess.merge(PrimeRate(date=now.date(), rate=rate))
         self._db_sess.flush()
         self._db_sess.commit()
+        with _lock:
+            _cache[self._cache_key] = {
+                'rate': rate, 'date': now, 'loaded': time.monotonic()
+            }
         return rate
 
+    def _load_stored_rate(self):
+        """
+        Read the stored Prime Rate from the ``prime_rate`` DBSetting into the
+        process-wide cache, and return the cache entry.
+
+        :return: cache entry, or None if no rate is stored
+        :rtype: dict
+        """
+        pr = self._db_sess.query(DBSetting).get('prime_rate')
+        if pr is None:
+            return None
+        j = json.loads(pr.value)
+        c = {
+            'rate': Decimal(j['value']),
+            'date': decode_json_datetime(j['date']),
+            'loaded': time.monotonic()
+        }
+        with _lock:
+            _cache[self._cache_key] = c
+        return c
+
+    def _start_refresh(self):
+        """
+        Start a daemon thread to retrieve the current Prime Rate, unless one is
+        already running for this database or one was started within the last
+        :py:attr:`~biweeklybudget.settings.PRIME_RATE_CACHE_SECONDS`.
+        """
+        key = self._cache_key
+        now = time.monotonic()
+        with _lock:
+            if key in _refreshing:
+                return
+            last = _last_refresh.get(key)
+            if (
+                last is not None and
+                now - last < settings.PRIME_RATE_CACHE_SECONDS
+            ):
+                return
+            _refreshing.add(key)
+            _last_refresh[key] = now
+        logger.debug('Starting background Prime Rate refresh')
+        t = threading.Thread(
+            target=self._refresh, args=(self._db_sess.get_bind(), key),
+            name='prime-rate-refresh'
+        )
+        t.daemon = True
+        t.start()
+
+    @staticmethod
+    def _refresh(bind, key):
+        """
+        Target of the background refresh thread. Retrieve and store the current
+        Prime Rate using a new session on the same database. Errors are logged
+        and the stale rate remains in use.
+
+        The new session does not have the event listeners of
+        :py:data:`~biweeklybudget.db.db_session`, so after the new rate is
+        committed the
+        :py:attr:`~biweeklybudget.db_event_handlers.DATA_GENERATION_SETTING`
+        counter is incremented here, in its own transaction.
+
+        :param bind: engine or connection to create the session with
+        :type bind: sqlalchemy.engine.Engine
+        :param key: cache key for the database
+        :type key: str
+        """
+        from biweeklybudget.db_event_handlers import DATA_GENERATION_SETTING
+        sess = Session(bind=bind)
+        try:
+            PrimeRateCalculator(sess)._get_prime_rate()
+            with bind.connect() as conn:
+                with conn.begin():
+                    DBSetting.increment_counter(conn, DATA_GENERATION_SETTING)
+        except Exception:
+            logger.error('Error refreshing Prime Rate', exc_info=True)
+            sess.rollback()
+        finally:
+            sess.close()
+            with _lock:
+                _refreshing.discard(key)
+
     @property
     def prime_rate(self):
         """
@@ -124,14 +268,31 @@ class PrimeRateCalculator(object):
         :return: current US Prime Rate
         :rtype: decimal.Decimal
         """
-        pr = self._db_sess.query(DBSetting).get('prime_rate')
-        if pr is None:
+        with _lock:
+            c = _cache.get(self._cache_key)
+        if (
+            c is None or
+            time.monotonic() - c['loaded'] >= settings.PRIME_RATE_CACHE_SECONDS
+        ):
+            c = self._load_stored_rate()
+        if c is None:
             return self._get_prime_rate()
-        j = json.loads(pr.value)
-        d = decode_json_datetime(j['date'])
-        if d >= (dtnow() - timedelta(hours=48)):
-            return Decimal(j['value'])
-        return self._get_prime_rate()
+        if c['date'] < (dtnow() - MAX_RATE_AGE):
+            self._start_refresh()
+        return c['rate']
+
+    def rate_for_date(self, d):
+        """
+        Return the US Prime Rate in effect on the specified date, from the
+        :py:class:`~.PrimeRate` history. This never retrieves the rate from the
+        web.
+
+        :param d: date to look up the rate for
+        :type d: datetime.date
+        :return: rate in effect on ``d``, or None if none was recorded
+        :rtype: decimal.Decimal
+        """
+        return PrimeRate.rate_for_date(self._db_sess, d)
 
     def calculate_apr(self, margin):
         """
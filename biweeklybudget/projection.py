@@ -0,0 +1,320 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import argparse
+import logging
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import func
+
+from biweeklybudget.biweeklypayperiod import BiweeklyPayPeriod
+from biweeklybudget.cliutils import set_log_debug, set_log_info
+from biweeklybudget.models.account import Account
+from biweeklybudget.models.budget_model import Budget
+from biweeklybudget.models.budget_transaction import BudgetTransaction
+from biweeklybudget.models.scheduled_transaction import ScheduledTransaction
+from biweeklybudget.models.transaction import Transaction
+from biweeklybudget.utils import dtnow, fmt_currency
+
+logger = logging.getLogger(__name__)
+
+
+class CashFlowProjection(object):
+    """
+    Project the balance of every active budget-source :py:class:`~.Account`
+    and every active standing :py:class:`~.Budget` forward over a number of
+    pay periods, starting with the current one.
+
+    All inputs are loaded up front. These are the starting balances, future
+    Transactions (summed per account and date), and every
+    :py:class:`~.ScheduledTransaction` occurrence over the horizon from a
+    single :py:meth:`~.ScheduledTransaction.expand` call. The projection is
+    then one pass over the date-ordered occurrences, so its cost is linear in
+    the number of occurrences and not in the number of periods.
+
+    * Accounts start at the ledger balance of their latest
+      :py:class:`~.AccountBalance`, minus their
+      :py:attr:`~.Account.unreconciled_sum`. They are reduced by the amount of
+      every future Transaction and every ScheduledTransaction occurrence
+      against them (income has a negative amount, so it increases the
+      balance).
+    * Standing Budgets start at their :py:attr:`~.Budget.current_balance` and
+      are reduced by every ScheduledTransaction occurrence against them.
+      Future Transactions are already included in the current balance.
+
+    Scheduled occurrences that have already been converted to Transactions
+    are excluded. All unconverted occurrences in the current pay period
+    count, including dated ones before today.
+    """
+
+    def __init__(self, db_sess, num_periods=52, start_date=None):
+        """
+        Initialize the projection.
+
+        :param db_sess: Database Session
+        :type db_sess: sqlalchemy.orm.session.Session
+        :param num_periods: number of pay periods to project, including the
+          current one
+        :type num_periods: int
+        :param start_date: date to start the projection from; defaults to today
+        :type start_date: datetime.date
+        """
+        if num_periods < 1:
+            raise ValueError('num_periods must be at least 1')
+        self._sess = db_sess
+        self._num_periods = num_periods
+        if start_date is None:
+            start_date = dtnow().date()
+        self._start_date = start_date
+        self._result = None
+
+    @property
+    def result(self):
+        """
+        Return the projection result, calculating it if needed. This is a dict
+        with keys:
+
+        * ``accounts`` - dict of Account ID to name, for every projected
+          account.
+        * ``budgets`` - dict of Budget ID to name, for every projected standing
+          budget.
+        * ``starting_balances`` - dict with ``accounts`` and ``budgets`` keys,
+          each a dict of ID to starting balance (Decimal).
+        * ``periods`` - list of one dict per pay period, in order, with keys
+          ``start_date`` and ``end_date`` (dates); ``accounts`` and
+          ``budgets`` (dicts of ID to projected balance at the end of the
+          period); ``accounts_total`` (Decimal, sum of the account
+          balances); and ``budgets_total`` (Decimal, sum of the standing
+          budget balances).
+
+        :return: projection result
+        :rtype: dict
+        """
+        if self._result is None:
+            self._result = self._calculate()
+        return self._result
+
+    def _periods(self):
+        """
+        Return the list of ``(start_date, end_date)`` tuples for each pay
+        period in the projection.
+
+        :return: list of pay period start and end dates
+        :rtype: list
+        """
+        pp = BiweeklyPayPeriod.period_for_date(self._start_date, self._sess)
+        res = []
+        for _ in range(0, self._num_periods):
+            res.append((pp.start_date, pp.end_date))
+            pp = pp.next
+        return res
+
+    def _starting_balances(self):
+        """
+        Return a 4-tuple of: dict of Account ID to name, dict of Account ID to
+        starting balance, dict of standing Budget ID to name, and dict of
+        standing Budget ID to starting balance.
+
+        :return: account and budget names and starting balances
+        :rtype: tuple
+        """
+        acct_names = {}
+        acct_bals = {}
+        accts = self._sess.query(Account).filter(
+            Account.is_budget_source.__eq__(True),
+            Account.is_active.__eq__(True)
+        ).order_by(Account.id).all()
+        unrec = Account.unreconciled_sums(
+            self._sess, account_ids=[a.id for a in accts]
+        )
+        for acct in accts:
+            acct_names[acct.id] = acct.name
+            bal = Decimal('0.0')
+            if acct.balance is not None:
+                bal = acct.balance.ledger
+            acct_bals[acct.id] = bal - unrec[acct.id]
+        budg_names = {}
+        budg_bals = {}
+        for b in self._sess.query(Budget).filter(
+            Budget.is_periodic.__eq__(False),
+            Budget.is_active.__eq__(True)
+        ).order_by(Budget.id).all():
+            budg_names[b.id] = b.name
+            budg_bals[b.id] = b.current_balance
+            if budg_bals[b.id] is None:
+                budg_bals[b.id] = Decimal('0.0')
+        return acct_names, acct_bals, budg_names, budg_bals
+
+    def _future_transactions(self, first_date, last_date):
+        """
+        Return a list of ``(date, account_id, amount)`` tuples for all
+        Transactions after ``first_date`` and up to ``last_date``, with
+        amounts summed per account and date, sorted by date.
+
+        :param first_date: exclusive start date
+        :type first_date: datetime.date
+        :param last_date: inclusive end date
+        :type last_date: datetime.date
+        :return: list of (date, account_id, amount) tuples
+        :rtype: list
+        """
+        return self._sess.query(
+            Transaction.date, Transaction.account_id,
+            func.sum(BudgetTransaction.amount)
+        ).join(
+            BudgetTransaction, BudgetTransaction.trans_id == Transaction.id
+        ).filter(
+            Transaction.date > first_date,
+            Transaction.date <= last_date
+        ).group_by(
+            Transaction.date, Transaction.account_id
+        ).order_by(Transaction.date).all()
+
+    def _calculate(self):
+        """
+        Calculate and return the projection; see :py:attr:`~.result`.
+
+        :return: projection result
+        :rtype: dict
+        """
+        periods = self._periods()
+        acct_names, acct_bals, budg_names, budg_bals = \
+            self._starting_balances()
+        res = {
+            'accounts': acct_names,
+            'budgets': budg_names,
+            'starting_balances': {
+                'accounts': dict(acct_bals),
+                'budgets': dict(budg_bals)
+            },
+            'periods': []
+        }
+        # bucket future Transactions by period index; they're already sorted
+        trans = [[] for _ in periods]
+        idx = 0
+        for t_date, acct_id, amt in self._future_transactions(
+            self._start_date, periods[-1][1]
+        ):
+            while t_date > periods[idx][1]:
+                idx += 1
+            trans[idx].append((acct_id, amt))
+        occurrences = ScheduledTransaction.expand(self._sess, periods)
+        occ_idx = 0
+        for idx, (start, end) in enumerate(periods):
+            for acct_id, amt in trans[idx]:
+                if acct_id in acct_bals:
+                    acct_bals[acct_id] -= amt
+            while (
+                occ_idx < len(occurrences) and
+                occurrences[occ_idx].period_index == idx
+            ):
+                st = occurrences[occ_idx].scheduled_transaction
+                if st.account_id in acct_bals:
+                    acct_bals[st.account_id] -= st.amount
+                if st.budget_id in budg_bals:
+                    budg_bals[st.budget_id] -= st.amount
+                occ_idx += 1
+            res['periods'].append({
+                'start_date': start,
+                'end_date': end,
+                'accounts': dict(acct_bals),
+                'budgets': dict(budg_bals),
+                'accounts_total': sum(acct_bals.values(), Decimal('0.0')),
+                'budgets_total': sum(budg_bals.values(), Decimal('0.0'))
+            })
+        return res
+
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description='Project budget-source account and standing budget '
+                    'balances forward over future pay periods'
+    )
+    p.add_argument('-v', '--verbose', dest='verbose', action='count', default=0,
+                   help='verbose output. specify twice for debug-level output.')
+    p.add_argument('-n', '--num-periods', dest='num_periods', action='store',
+                   type=int, default=52,
+                   help='number of pay periods to project (default: 52)')
+    p.add_argument('-s', '--start-date', dest='start_date', action='store',
+                   type=str, default=None,
+                   help='YYYY-MM-DD date to start projection from (default: '
+                        'today)')
+    args = p.parse_args()
+    return args
+
+
+def main():
+    global logger
+    logging.basicConfig(
+        level=logging.WARNING,
+        format="[%(asctime)s %(levelname)s] %(message)s"
+    )
+    logger = logging.getLogger()
+
+    args = parse_args()
+
+    # set logging level
+    if args.verbose > 1:
+        set_log_debug(logger)
+    elif args.verbose == 1:
+        set_log_info(logger)
+
+    from biweeklybudget.db import init_db, db_session, cleanup_db
+    start_date = None
+    if args.start_date is not None:
+        start_date = datetime.strptime(args.start_date, '%Y-%m-%d').date()
+    init_db()
+    res = CashFlowProjection(
+        db_session, num_periods=args.num_periods, start_date=start_date
+    ).result
+    cleanup_db()
+    names = [res['accounts'][x] for x in sorted(res['accounts'].keys())]
+    names += [res['budgets'][x] for x in sorted(res['budgets'].keys())]
+    print('\t'.join(['Period'] + names + ['Accounts Total', 'Budgets Total']))
+    for p in res['periods']:
+        vals = [p['accounts'][x] for x in sorted(p['accounts'].keys())]
+        vals += [p['budgets'][x] for x in sorted(p['budgets'].keys())]
+        vals += [p['accounts_total'], p['budgets_total']]
+        print('\t'.join(
+            [p['start_date'].strftime('%Y-%m-%d')] +
+            [fmt_currency(x) for x in vals]
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import argparse
+import logging
+from datetime import datetime
+
+from biweeklybudget.db import init_db, db_session, cleanup_db
+from biweeklybudget.cliutils import set_log_debug, set_log_info
+from biweeklybudget.biweeklypayperiod import BiweeklyPayPeriod, PayPeriodRange
+from biweeklybudget.models.period_budget_sum import PeriodBudgetSum
+from biweeklybudget.models.period_budget_sum_period import (
+    PeriodBudgetSumPeriod
+)
+from biweeklybudget.models.transaction import Transaction
+from biweeklybudget.utils import dtnow
+
+logger = logging.getLogger(__name__)
+
+
+def rebuild_period_sums(sess, end_date=None):
+    """
+    Delete all rows from the :py:class:`~.PeriodBudgetSum` and
+    :py:class:`~.PeriodBudgetSumPeriod` tables and recalculate them for every
+    pay period from the one containing the earliest :py:class:`~.Transaction`
+    through the one containing ``end_date``, in the session's transaction.
+
+    :param sess: active database session
+    :type sess: sqlalchemy.orm.session.Session
+    :param end_date: date to rebuild sums through; defaults to today
+    :type end_date: datetime.date
+    :return: number of pay periods rebuilt
+    :rtype: int
+    """
+    if end_date is None:
+        end_date = dtnow().date()
+    sess.query(PeriodBudgetSum).delete(synchronize_session=False)
+    sess.query(PeriodBudgetSumPeriod).delete(synchronize_session=False)
+    min_txn = sess.query(Transaction).order_by(Transaction.date.asc()).first()
+    if min_txn is None or min_txn.date > end_date:
+        logger.info('No Transactions on or before %s', end_date)
+        sess.commit()
+        return 0
+    first = BiweeklyPayPeriod.period_for_date(min_txn.date, sess)
+    last = BiweeklyPayPeriod.period_for_date(end_date, sess)
+    num_periods = (
+        (last.start_date - first.start_date).days //
+        first.period_interval.days
+    ) + 1
+    logger.info(
+        'Rebuilding budget sums for %d pay periods from %s through %s',
+        num_periods, first.start_date, last.start_date
+    )
+    PayPeriodRange.insert_budget_sums(
+        sess, PayPeriodRange(first, num_periods).budget_sums_by_period()
+    )
+    sess.commit()
+    return num_periods
+
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description='Rebuild the materialized per-pay-period budget sums table'
+    )
+    p.add_argument('-v', '--verbose', dest='verbose', action='count', default=0,
+                   help='verbose output. specify twice for debug-level output.')
+    p.add_argument('-e', '--end-date', dest='end_date', action='store',
+                   type=str, default=None,
+                   help='YYYY-MM-DD date to rebuild sums through (default: '
+                        'today)')
+    args = p.parse_args()
+    return args
+
+
+def main():
+    global logger
+    logging.basicConfig(
+        level=logging.WARNING,
+        format="[%(asctime)s %(levelname)s] %(message)s"
+    )
+    logger = logging.getLogger()
+
+    args = parse_args()
+
+    # set logging level
+    if args.verbose > 1:
+        set_log_debug(logger)
+    elif args.verbose == 1:
+        set_log_info(logger)
+
+    end_date = None
+    if args.end_date is not None:
+        end_date = datetime.strptime(args.end_date, '%Y-%m-%d').date()
+    init_db()
+    count = rebuild_period_sums(db_session, end_date=end_date)
+    cleanup_db()
+    print('Rebuilt budget sums for %d pay periods.' % count)
+
+
+if __name__ == "__main__":
+    main()
@@ -63,6 +63,10 @@ _TIMEDELTA_VARS = [
 _INT_VARS = [
     'DEFAULT_ACCOUNT_ID',
     'FUEL_BUDGET_ID',
+    'PAYOFF_WORKERS',
+    'PRIME_RATE_CACHE_SECONDS',
+    'NOTIFICATIONS_CACHE_SECONDS',
+    'OFX_RECLASSIFY_SYNC_LIMIT',
     'BIWEEKLYBUDGET_TEST_TIMESTAMP'
 ]
 _STRING_VARS = [
@@ -147,6 +151,32 @@ RECONCILE_BEGIN_DATE = None
 #: (integer) that will be converted to a number of days.
 STALE_DATA_TIMEDELTA = timedelta(days=2)
 
+#: int - Number of worker processes to use for calculating the different
+#: credit card payoff methods on the Credit Card Payoffs view. If this is
+#: greater than 1, each payoff method is calculated in a separate process (up
+#: to this many at once). If it is 1 or less, or the process pool cannot be
+#: used, they are calculated one after another in the current process.
+PAYOFF_WORKERS = 1
+
+#: int - Number of seconds that the stored US Prime Rate is cached in each
+#: process before being read from the database again. When the stored rate is
+#: more than 48 hours old, it is refreshed from the web in a background thread
+#: (at most once per this many seconds) while the old value continues to be
+#: used.
+PRIME_RATE_CACHE_SECONDS = 300
+
+#: int - Maximum number of seconds that the notifications shown at the top of
+#: every page are cached for (in the database, shared by all processes). The
+#: cache is also invalidated whenever data is changed. Set to 0 to calculate
+#: them on every page load.
+NOTIFICATIONS_CACHE_SECONDS = 300
+
+#: int - When an Account's ``re_*`` regexes are changed, the ``is_*`` fields of
+#: its OFXTransactions are reclassified as part of the same database
+#: transaction if it has no more than this many OFXTransactions. Accounts with
+#: more are reclassified in a background thread after the change is committed.
+OFX_RECLASSIFY_SYNC_LIMIT = 5000
+
 #: string - *(optional)* Filesystem path to download OFX statements to, and for
 #: backfill_ofx to read them from.
 STATEMENTS_SAVE_PATH = None
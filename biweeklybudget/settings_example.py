@@ -81,3 +81,20 @@ DEFAULT_ACCOUNT_ID = 1
 #: int - Budget ID to select as default when inputting Fuel Log entries. This
 #: must be the database ID of a valid budget.
 FUEL_BUDGET_ID = 1
+
+#: int - Number of worker processes to use for calculating credit card payoff
+#: methods in parallel. 1 calculates them serially in the web process.
+PAYOFF_WORKERS = 1
+
+#: int - Number of seconds to cache the stored US Prime Rate in each process
+#: before reading it from the database again.
+PRIME_RATE_CACHE_SECONDS = 300
+
+#: int - Maximum number of seconds to cache the notifications shown at the top
+#: of every page for; they are also recalculated whenever data changes.
+NOTIFICATIONS_CACHE_SECONDS = 300
+
+#: int - Maximum number of OFXTransactions to reclassify immediately when an
+#: Account's regexes change; accounts with more are reclassified in the
+#: background.
+OFX_RECLASSIFY_SYNC_LIMIT = 5000
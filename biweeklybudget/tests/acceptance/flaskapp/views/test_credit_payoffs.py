@@ -38,6 +38,7 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 import pytest
 import re
 import json
+import requests
 from decimal import Decimal
 from biweeklybudget.tests.acceptance_helpers import AcceptanceHelper
 from biweeklybudget.models.dbsetting import DBSetting
@@ -596,3 +597,44 @@ class TestSettings(AcceptanceHelper):
                 }
             ]
         }, sort_keys=True)
+
+
+@pytest.mark.acceptance
+@pytest.mark.usefixtures('class_refresh_db', 'refreshdb')
+@pytest.mark.incremental
+class TestPayoffSweepAjax(AcceptanceHelper):
+
+    def test_0_add_interest_charge(self, testdb):
+        stmt = testdb.query(OFXStatement).filter(
+            OFXStatement.filename.__eq__('/stmt/CreditTwo/0')
+        ).one()
+        testdb.add(OFXTransaction(
+            account=testdb.query(Account).get(4),
+            statement=stmt,
+            fitid='CreditTwo-9-1',
+            trans_type='debit',
+            date_posted=stmt.as_of,
+            amount=Decimal('-23.45'),
+            name='Interest Charge'
+        ))
+        testdb.commit()
+
+    def test_1_sweep(self, base_url):
+        r = requests.get(
+            base_url + '/ajax/credit-payoff-sweep?start=100&stop=200&step=50'
+        )
+        assert r.status_code == 200
+        assert len(r.json()['steps']) == 3
+
+    @pytest.mark.parametrize('qs', [
+        'step=NaN',
+        'step=Infinity',
+        'start=NaN',
+        'stop=sNaN',
+        'start=foo',
+        'step=0'
+    ])
+    def test_2_invalid_params(self, base_url, qs):
+        r = requests.get(base_url + '/ajax/credit-payoff-sweep?' + qs)
+        assert r.status_code == 400
+        assert 'error' in r.json()
@@ -0,0 +1,149 @@
+"""
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+
+from biweeklybudget.tests.acceptance_helpers import AcceptanceHelper
+from biweeklybudget.models.account import Account, NoInterestChargedError
+from biweeklybudget.models.ofx_statement import OFXStatement
+from biweeklybudget.models.ofx_transaction import OFXTransaction
+from biweeklybudget.utils import dtnow
+
+
+@pytest.mark.acceptance
+class TestUnreconciledSums(AcceptanceHelper):
+
+    def test_all_accounts(self, testdb):
+        res = Account.unreconciled_sums(testdb)
+        assert res == {
+            1: Decimal('0.0'),
+            2: Decimal('-333.33'),
+            3: Decimal('544.54'),
+            4: Decimal('0.0'),
+            5: Decimal('0.0'),
+            6: Decimal('0.0')
+        }
+        for acct in testdb.query(Account).all():
+            assert acct.unreconciled_sum == res[acct.id]
+            assert acct.unreconciled_sum == sum(
+                (t.actual_amount for t in acct.unreconciled), Decimal('0.0')
+            )
+
+    def test_account_ids(self, testdb):
+        assert Account.unreconciled_sums(testdb, account_ids=[2, 4]) == {
+            2: Decimal('-333.33'),
+            4: Decimal('0.0')
+        }
+        assert Account.unreconciled_sums(testdb, account_ids=[]) == {}
+
+
+@pytest.mark.acceptance
+class TestLastInterestCharges(AcceptanceHelper):
+
+    def test_last_interest_charges(self, testdb):
+        assert Account.last_interest_charges(testdb, [1, 2, 3, 4]) == {
+            3: Decimal('16.25')
+        }
+        assert Account.last_interest_charges(testdb, []) == {}
+
+    def test_last_interest_charge(self, testdb):
+        assert testdb.query(Account).get(3).last_interest_charge == Decimal(
+            '16.25'
+        )
+        with pytest.raises(NoInterestChargedError):
+            testdb.query(Account).get(4).last_interest_charge
+
+
+@pytest.mark.acceptance
+@pytest.mark.usefixtures('class_refresh_db', 'refreshdb')
+@pytest.mark.incremental
+class TestLastInterestChargesNoRegex(AcceptanceHelper):
+
+    def test_0_verify_db(self, testdb):
+        acct = testdb.query(Account).get(4)
+        assert acct.name == 'CreditTwo'
+        assert acct.re_interest_charge is None
+        with pytest.raises(NoInterestChargedError):
+            acct.last_interest_charge
+
+    def test_1_add_interest_charge(self, testdb):
+        stmt = testdb.query(OFXStatement).filter(
+            OFXStatement.filename.__eq__('/stmt/CreditTwo/0')
+        ).one()
+        txn = OFXTransaction(
+            account=testdb.query(Account).get(4),
+            statement=stmt,
+            fitid='CreditTwo-9-1',
+            trans_type='debit',
+            date_posted=dtnow() - timedelta(days=2),
+            amount=Decimal('-23.45'),
+            name='Purchase Interest Charge'
+        )
+        testdb.add(txn)
+        testdb.commit()
+        assert txn.is_interest_charge is False
+
+    def test_2_last_interest_charges(self, testdb):
+        assert Account.last_interest_charges(testdb, [3, 4]) == {
+            3: Decimal('16.25'),
+            4: Decimal('23.45')
+        }
+        assert testdb.query(Account).get(4).last_interest_charge == Decimal(
+            '23.45'
+        )
+
+    def test_3_regex_account_ignores_name(self, testdb):
+        acct = testdb.query(Account).get(3)
+        assert acct.re_interest_charge == '^INTEREST CHARGED TO'
+        stmt = testdb.query(OFXStatement).filter(
+            OFXStatement.filename.__eq__('/stmt/CreditOne/0')
+        ).one()
+        txn = OFXTransaction(
+            account=acct,
+            statement=stmt,
+            fitid='CreditOne-9-1',
+            trans_type='debit',
+            date_posted=dtnow() - timedelta(hours=1),
+            amount=Decimal('-34.56'),
+            name='Cash Advance Interest Charge'
+        )
+        testdb.add(txn)
+        testdb.commit()
+        assert txn.is_interest_charge is False
+        assert Account.last_interest_charges(testdb, [3, 4]) == {
+            3: Decimal('16.25'),
+            4: Decimal('23.45')
+        }
@@ -37,7 +37,8 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 
 import sys
 import pytest
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
+from sqlalchemy import event
 from pytz import UTC
 from decimal import Decimal
 
@@ -937,3 +938,70 @@ class TestSums(AcceptanceHelper):
             'remaining': Decimal('-577.55'),
             'spent': Decimal('200.0')
         }
+
+
+@pytest.mark.acceptance
+@pytest.mark.usefixtures('class_refresh_db', 'refreshdb')
+@pytest.mark.incremental
+class TestQueryBudget(AcceptanceHelper):
+    """
+    Ensure that building the transaction list and sums for a busy pay period
+    takes a fixed number of queries, regardless of the number of Transactions
+    (i.e. no lazy-load per Transaction).
+    """
+
+    #: maximum number of queries allowed to build one period's data
+    QUERY_BUDGET = 10
+
+    def _count_queries(self, testdb, func):
+        stmts = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            stmts.append(statement)
+
+        engine = testdb.get_bind()
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            func()
+        finally:
+            event.remove(
+                engine, 'before_cursor_execute', before_cursor_execute
+            )
+        return stmts
+
+    @patch('%s.settings.PAY_PERIOD_START_DATE' % pbm, date(2017, 4, 7))
+    def test_0_add_data(self, testdb):
+        acct = testdb.query(Account).get(1)
+        budg1 = testdb.query(Budget).get(1)
+        budg2 = testdb.query(Budget).get(2)
+        for i in range(0, 500):
+            t = Transaction(
+                date=date(2017, 4, 7) + timedelta(days=(i % 14)),
+                description='QueryBudget%d' % i,
+                account=acct,
+                budgeted_amount=Decimal('3.00'),
+                planned_budget=budg1,
+                budget_amounts={
+                    budg1: Decimal('1.00'),
+                    budg2: Decimal('2.00')
+                }
+            )
+            testdb.add(t)
+        testdb.flush()
+        testdb.commit()
+
+    @patch('%s.settings.PAY_PERIOD_START_DATE' % pbm, date(2017, 4, 7))
+    def test_1_period_query_budget(self, testdb):
+        testdb.expunge_all()
+        pp = BiweeklyPayPeriod(date(2017, 4, 7), testdb)
+
+        def func():
+            pp.transactions_list
+            pp.budget_sums
+            pp.overall_sums
+
+        stmts = self._count_queries(testdb, func)
+        assert len([
+            t for t in pp.transactions_list if t['type'] == 'Transaction'
+        ]) >= 500
+        assert len(stmts) <= self.QUERY_BUDGET, stmts
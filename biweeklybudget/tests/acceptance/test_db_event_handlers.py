@@ -36,14 +36,32 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 """
 
 import pytest
+import time
+from datetime import timedelta
 from decimal import Decimal
 
 from biweeklybudget.tests.acceptance_helpers import AcceptanceHelper
 from biweeklybudget.models.transaction import Transaction
-from biweeklybudget.models.account import Account
+from biweeklybudget.interest import PAYOFF_CACHE_SETTING
+from biweeklybudget.models.account import Account, AcctType
+from biweeklybudget.models.account_balance import AccountBalance
 from biweeklybudget.models.budget_model import Budget
+from biweeklybudget.models.budget_transaction import BudgetTransaction
+from biweeklybudget.models.dbsetting import DBSetting
 from biweeklybudget.models.ofx_transaction import OFXTransaction
 from biweeklybudget.models.ofx_statement import OFXStatement
+from biweeklybudget.models.period_budget_sum import PeriodBudgetSum
+from biweeklybudget.models.period_budget_sum_period import (
+    PeriodBudgetSumPeriod
+)
+from biweeklybudget.models.scheduled_transaction import ScheduledTransaction
+from biweeklybudget.biweeklypayperiod import (
+    BiweeklyPayPeriod, PayPeriodRange, PERIOD_SUMS_GENERATION_SETTING
+)
+from biweeklybudget.rebuild_period_sums import rebuild_period_sums
+from biweeklybudget.utils import dtnow
+from biweeklybudget.db_event_handlers import DATA_GENERATION_SETTING
+from biweeklybudget.ofx_reclassify import reclassify_progress
 
 
 @pytest.mark.acceptance
@@ -353,3 +371,422 @@ class TestIsFieldsSet(AcceptanceHelper):
         assert txn3.is_interest_charge is False
         assert txn3.is_other_fee is False
         assert txn3.is_interest_payment is False
+
+
+@pytest.mark.acceptance
+@pytest.mark.usefixtures('class_refresh_db', 'refreshdb')
+@pytest.mark.incremental
+class TestPeriodBudgetSums(AcceptanceHelper):
+
+    def _stored_starts(self, testdb):
+        return set(
+            x.period_start for x in testdb.query(PeriodBudgetSumPeriod).all()
+        )
+
+    def _verify_sums(self, testdb):
+        testdb.expire_all()
+        first = testdb.query(PeriodBudgetSum).order_by(
+            PeriodBudgetSum.period_start.asc()
+        ).first()
+        if first is None:
+            first_date = testdb.query(Transaction).order_by(
+                Transaction.date.asc()
+            ).first().date
+        else:
+            first_date = first.period_start
+        periods = list(BiweeklyPayPeriod.periods_between(
+            first_date, dtnow(), testdb
+        ))
+        stored = PayPeriodRange(
+            periods[0], len(periods)
+        ).stored_budget_sums()
+        testdb.commit()
+        for pp in periods:
+            fresh = BiweeklyPayPeriod(pp.start_date, testdb).budget_sums
+            assert stored[pp.start_date] == {
+                k: {
+                    'allocated': v['allocated'],
+                    'spent': v['spent'],
+                    'trans_total': v['trans_total']
+                } for k, v in fresh.items()
+            }
+
+    def test_0_rebuild(self, testdb):
+        num = rebuild_period_sums(testdb)
+        assert num > 0
+        assert len(self._stored_starts(testdb)) == num
+        self._verify_sums(testdb)
+
+    def test_1_edit_transaction(self, testdb):
+        t = testdb.query(Transaction).get(1)
+        pp_start = BiweeklyPayPeriod.period_for_date(t.date, testdb).start_date
+        before = self._stored_starts(testdb)
+        assert pp_start in before
+        t.set_budget_amounts({
+            testdb.query(Budget).get(1): Decimal('1234.56')
+        })
+        testdb.add(t)
+        testdb.commit()
+        # recalculated in the same transaction
+        assert self._stored_starts(testdb) == before
+        assert testdb.query(PeriodBudgetSum).get(
+            (pp_start, 1)
+        ).spent == Decimal('1234.56')
+        self._verify_sums(testdb)
+        assert self._stored_starts(testdb) == before
+
+    def test_2_edit_monthly_scheduled(self, testdb):
+        st = testdb.query(ScheduledTransaction).filter(
+            ScheduledTransaction.day_of_month.isnot(None)
+        ).first()
+        st.amount = st.amount + Decimal('10.00')
+        testdb.add(st)
+        testdb.commit()
+        assert self._stored_starts(testdb) == set()
+        assert testdb.query(DBSetting).get(
+            PERIOD_SUMS_GENERATION_SETTING
+        ) is not None
+        self._verify_sums(testdb)
+
+    def test_3_flushed_changes_not_stored(self, testdb):
+        testdb.query(PeriodBudgetSum).delete(synchronize_session=False)
+        testdb.query(PeriodBudgetSumPeriod).delete(synchronize_session=False)
+        testdb.commit()
+        t = testdb.query(Transaction).get(1)
+        t.description = 'flushed but never committed'
+        testdb.flush()
+        pp = BiweeklyPayPeriod.period_for_date(t.date, testdb)
+        PayPeriodRange(pp, 2).stored_budget_sums()
+        testdb.rollback()
+        assert self._stored_starts(testdb) == set()
+        PayPeriodRange(
+            BiweeklyPayPeriod.period_for_date(t.date, testdb), 2
+        ).stored_budget_sums()
+        testdb.commit()
+        assert len(self._stored_starts(testdb)) == 2
+
+
+@pytest.mark.acceptance
+@pytest.mark.usefixtures('class_refresh_db', 'refreshdb')
+@pytest.mark.incremental
+class TestPayoffCacheInvalidation(AcceptanceHelper):
+
+    def _add_cache(self, testdb):
+        testdb.add(DBSetting(name=PAYOFF_CACHE_SETTING, value='{}'))
+        testdb.commit()
+
+    def _have_cache(self, testdb):
+        testdb.expire_all()
+        return testdb.query(DBSetting).get(PAYOFF_CACHE_SETTING) is not None
+
+    def test_0_bank_balance_keeps_cache(self, testdb):
+        self._add_cache(testdb)
+        acct = testdb.query(Account).get(1)
+        assert acct.acct_type == AcctType.Bank
+        testdb.add(AccountBalance(
+            account=acct, ledger=Decimal('123.45'), ledger_date=dtnow()
+        ))
+        testdb.commit()
+        assert self._have_cache(testdb) is True
+
+    def test_1_credit_balance_removes_cache(self, testdb):
+        acct = testdb.query(Account).get(4)
+        assert acct.acct_type == AcctType.Credit
+        testdb.add(AccountBalance(
+            account_id=acct.id, ledger=Decimal('-123.45'),
+            ledger_date=dtnow()
+        ))
+        testdb.commit()
+        assert self._have_cache(testdb) is False
+
+    def test_2_credit_statement_removes_cache(self, testdb):
+        self._add_cache(testdb)
+        acct = testdb.query(Account).get(4)
+        testdb.add(OFXStatement(
+            account=acct,
+            filename='/stmt/CreditTwo/payoff-cache',
+            file_mtime=dtnow(),
+            as_of=dtnow(),
+            currency='USD',
+            acctid='CreditTwoAcctId',
+            bankid='CreditTwoBankId',
+            acct_type='Credit',
+            ledger_bal=Decimal('-123.45'),
+            ledger_bal_as_of=dtnow()
+        ))
+        testdb.commit()
+        assert self._have_cache(testdb) is False
+
+
+@pytest.mark.acceptance
+@pytest.mark.usefixtures('class_refresh_db', 'refreshdb')
+@pytest.mark.incremental
+class TestLatestBalance(AcceptanceHelper):
+
+    def _newest(self, testdb, acct_id):
+        return testdb.query(AccountBalance).filter(
+            AccountBalance.account_id.__eq__(acct_id)
+        ).order_by(AccountBalance.id.desc()).first()
+
+    def test_0_verify_db(self, testdb):
+        for acct in testdb.query(Account).all():
+            assert acct.latest_balance is self._newest(testdb, acct.id)
+            assert acct.balance is acct.latest_balance
+
+    def test_1_set_balance(self, testdb):
+        acct = testdb.query(Account).get(1)
+        acct.set_balance(ledger=Decimal('123.45'), ledger_date=dtnow())
+        assert acct.balance.ledger == Decimal('123.45')
+        testdb.commit()
+        testdb.expire_all()
+        acct = testdb.query(Account).get(1)
+        assert acct.latest_balance_id == self._newest(testdb, 1).id
+        assert acct.balance.ledger == Decimal('123.45')
+
+    def test_2_add_by_account_id(self, testdb):
+        testdb.add(AccountBalance(
+            account_id=1, ledger=Decimal('678.90'), ledger_date=dtnow()
+        ))
+        testdb.commit()
+        testdb.expire_all()
+        assert testdb.query(Account).get(1).balance.ledger == Decimal(
+            '678.90'
+        )
+
+    def test_3_delete_latest(self, testdb):
+        acct = testdb.query(Account).get(1)
+        testdb.delete(acct.latest_balance)
+        testdb.commit()
+        testdb.expire_all()
+        acct = testdb.query(Account).get(1)
+        assert acct.balance.ledger == Decimal('123.45')
+        assert acct.latest_balance is self._newest(testdb, 1)
+
+
+@pytest.mark.acceptance
+@pytest.mark.usefixtures('class_refresh_db', 'refreshdb')
+@pytest.mark.incremental
+class TestLatestStatement(AcceptanceHelper):
+
+    def _stmt(self, acct_id, fname, as_of):
+        return OFXStatement(
+            account_id=acct_id,
+            filename=fname,
+            file_mtime=dtnow(),
+            as_of=as_of,
+            currency='USD',
+            acctid='BankOneAcctId',
+            bankid='BankOneBankId',
+            acct_type='Checking',
+            ledger_bal=Decimal('1.23'),
+            ledger_bal_as_of=as_of
+        )
+
+    def _check(self, testdb):
+        testdb.expire_all()
+        stale = 0
+        for acct in testdb.query(Account).all():
+            stmts = acct.all_statements
+            if len(stmts) == 0:
+                assert acct.latest_statement is None
+            else:
+                assert acct.latest_statement is stmts[-1]
+            if acct.is_active and acct.is_stale:
+                stale += 1
+        assert testdb.query(Account).filter(
+            Account.is_active.__eq__(True), Account.is_stale.__eq__(True)
+        ).count() == stale
+        return stale
+
+    def test_0_verify_db(self, testdb):
+        assert self._check(testdb) == 2
+
+    def test_1_add_older(self, testdb):
+        testdb.add(self._stmt(
+            1, '/stmt/BankOne/older', dtnow() - timedelta(days=30)
+        ))
+        testdb.commit()
+        self._check(testdb)
+        assert testdb.query(Account).get(1).latest_statement.filename != \
+            '/stmt/BankOne/older'
+
+    def test_2_add_newer(self, testdb):
+        testdb.add(self._stmt(1, '/stmt/BankOne/newer', dtnow()))
+        testdb.commit()
+        self._check(testdb)
+        assert testdb.query(Account).get(1).latest_statement.filename == \
+            '/stmt/BankOne/newer'
+
+    def test_3_move_as_of(self, testdb):
+        stmt = testdb.query(Account).get(1).latest_statement
+        stmt.as_of = dtnow() - timedelta(days=60)
+        testdb.commit()
+        self._check(testdb)
+        assert testdb.query(Account).get(1).latest_statement.filename != \
+            '/stmt/BankOne/newer'
+
+    def test_4_delete_latest(self, testdb):
+        stmt = testdb.query(OFXStatement).filter(
+            OFXStatement.filename.__eq__('/stmt/BankOne/newer')
+        ).one()
+        stmt.as_of = dtnow()
+        testdb.commit()
+        testdb.delete(testdb.query(Account).get(1).latest_statement)
+        testdb.commit()
+        self._check(testdb)
+        assert testdb.query(Account).get(1).latest_statement.filename != \
+            '/stmt/BankOne/newer'
+
+
+@pytest.mark.acceptance
+@pytest.mark.usefixtures('class_refresh_db', 'refreshdb')
+@pytest.mark.incremental
+class TestDataGeneration(AcceptanceHelper):
+
+    def _generation(self, testdb):
+        testdb.expire_all()
+        s = testdb.query(DBSetting).get(DATA_GENERATION_SETTING)
+        testdb.commit()
+        if s is None:
+            return 0
+        return int(s.value)
+
+    def test_0_change_increments(self, testdb):
+        gen = self._generation(testdb)
+        b = testdb.query(Budget).get(4)
+        b.current_balance = Decimal('123.45')
+        testdb.commit()
+        assert self._generation(testdb) == gen + 1
+
+    def test_1_setting_only_does_not_increment(self, testdb):
+        gen = self._generation(testdb)
+        testdb.add(DBSetting(name='foo', value='"bar"'))
+        testdb.commit()
+        assert self._generation(testdb) == gen
+
+    def test_2_rollback_does_not_increment(self, testdb):
+        gen = self._generation(testdb)
+        b = testdb.query(Budget).get(4)
+        b.current_balance = Decimal('678.90')
+        testdb.flush()
+        testdb.rollback()
+        testdb.commit()
+        assert self._generation(testdb) == gen
+
+
+@pytest.mark.acceptance
+@pytest.mark.usefixtures('class_refresh_db', 'refreshdb')
+@pytest.mark.incremental
+class TestBackgroundReclassify(AcceptanceHelper):
+
+    def test_0_background(self, testdb, monkeypatch):
+        monkeypatch.setattr(
+            'biweeklybudget.db_event_handlers.settings.'
+            'OFX_RECLASSIFY_SYNC_LIMIT', 0
+        )
+        acct = testdb.query(Account).get(1)
+        acct.re_payment = '^Late Fee'
+        testdb.commit()
+        for _ in range(20):
+            testdb.expire_all()
+            progress = reclassify_progress(testdb, 1)
+            testdb.commit()
+            if progress is not None and progress['done']:
+                break
+            time.sleep(0.5)
+        assert progress['error'] is None
+        assert progress['processed'] == progress['total']
+        txn = testdb.query(OFXTransaction).get((1, 'BankOne-9-3'))
+        assert txn.name == 'Late Fee BankOne-9-3'
+        assert txn.is_payment is True
+        assert txn.is_late_fee is True
+
+
+@pytest.mark.acceptance
+@pytest.mark.usefixtures('class_refresh_db', 'refreshdb')
+@pytest.mark.incremental
+class TestBatchedStandingBudgetUpdate(AcceptanceHelper):
+
+    def _bals(self, testdb):
+        testdb.expire_all()
+        res = {
+            b.id: b.current_balance for b in testdb.query(Budget).filter(
+                Budget.is_periodic.__eq__(False)
+            )
+        }
+        testdb.commit()
+        return res
+
+    def test_0_verify_db(self, testdb):
+        assert self._bals(testdb) == {
+            4: Decimal('1617.56'),
+            5: Decimal('9482.29'),
+            6: Decimal('-92.29')
+        }
+
+    def test_1_add_many(self, testdb):
+        for i in range(1, 4):
+            t = Transaction(
+                description='Batch%d' % i,
+                account=testdb.query(Account).get(1),
+                date=dtnow().date(),
+                budget_amounts={
+                    testdb.query(Budget).get(4): Decimal('10.01') * i,
+                    testdb.query(Budget).get(5): Decimal('1.00'),
+                    testdb.query(Budget).get(2): Decimal('5.00')
+                }
+            )
+            testdb.add(t)
+        testdb.commit()
+        assert self._bals(testdb) == {
+            4: Decimal('1557.50'),
+            5: Decimal('9479.29'),
+            6: Decimal('-92.29')
+        }
+
+    def test_2_change_and_delete(self, testdb):
+        testdb.expunge_all()
+        bts = testdb.query(BudgetTransaction).join(Transaction).filter(
+            Transaction.description.like('Batch%'),
+            BudgetTransaction.budget_id.__eq__(4)
+        ).all()
+        assert len(bts) == 3
+        for bt in bts:
+            bt.amount = bt.amount + Decimal('1.00')
+        t = testdb.query(Transaction).filter(
+            Transaction.description.__eq__('Batch1')
+        ).one()
+        for bt in t.budget_transactions:
+            testdb.delete(bt)
+        testdb.delete(t)
+        testdb.commit()
+        # -3.00 for the Budget 4 amount changes; 11.01 and 1.00 back for
+        # the deleted Transaction's amounts
+        assert self._bals(testdb) == {
+            4: Decimal('1565.51'),
+            5: Decimal('9480.29'),
+            6: Decimal('-92.29')
+        }
+
+    def test_3_change_before_flush_and_close(self, testdb):
+        testdb.expunge_all()
+        bt = testdb.query(BudgetTransaction).join(Transaction).filter(
+            Transaction.description.__eq__('Batch2'),
+            BudgetTransaction.budget_id.__eq__(4)
+        ).one()
+        with testdb.no_autoflush:
+            bt.amount = bt.amount + Decimal('2.00')
+            assert bt.budget.current_balance == Decimal('1563.51')
+        testdb.close()
+        testdb.add(Transaction(
+            description='Unrelated',
+            account=testdb.query(Account).get(1),
+            date=dtnow().date(),
+            budget_amounts={testdb.query(Budget).get(2): Decimal('5.00')}
+        ))
+        testdb.commit()
+        assert self._bals(testdb) == {
+            4: Decimal('1565.51'),
+            5: Decimal('9480.29'),
+            6: Decimal('-92.29')
+        }
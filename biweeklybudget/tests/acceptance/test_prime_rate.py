@@ -42,7 +42,7 @@ import json
 
 from biweeklybudget.tests.acceptance_helpers import AcceptanceHelper
 from biweeklybudget.prime_rate import PrimeRateCalculator
-from biweeklybudget.models import DBSetting
+from biweeklybudget.models import DBSetting, PrimeRate
 from biweeklybudget.utils import decode_json_datetime, dtnow
 
 
@@ -80,3 +80,12 @@ class TestPrimeRateCalculator(AcceptanceHelper):
         r = cls.prime_rate
         assert r >= Decimal('0.01')
         assert r <= Decimal('0.20')
+
+    def test_05_history(self, testdb):
+        cls = PrimeRateCalculator(testdb)
+        r = cls.prime_rate
+        hist = testdb.query(PrimeRate).get(dtnow().date())
+        assert hist is not None
+        assert hist.rate == r
+        assert cls.rate_for_date(dtnow().date()) == r
+        assert cls.rate_for_date(dtnow().date() - timedelta(days=3650)) is None
@@ -73,6 +73,7 @@ class SampleDataLoader(object):
                 }, cls=MagicJSONEncoder)
             )
         )
+        self.db.add(PrimeRate(date=dtnow().date(), rate=Decimal('0.0050')))
         self.db.flush()
         self.db.commit()
         self._projects()
@@ -67,6 +67,14 @@ else:
 #: :py:class:`datetime.timedelta` beyond which OFX data will be considered old
 STALE_DATA_TIMEDELTA = timedelta(days=2)
 
+#: Don't cache the Prime Rate across tests; the test database is reloaded
+#: between them.
+PRIME_RATE_CACHE_SECONDS = 0
+
+#: Don't cache notifications; acceptance tests reload the database without
+#: going through the ORM.
+NOTIFICATIONS_CACHE_SECONDS = 0
+
 #: int - FOR ACCEPTANCE TESTS ONLY - This is used to "fudge" the current time
 #: to the specified integer timestamp. Used for acceptance tests only. Do NOT
 #: set this outside of acceptance testing.
@@ -35,9 +35,12 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 ################################################################################
 """
 import sys
+import json
 
-from biweeklybudget.models.account import Account
-from biweeklybudget.flaskapp.notifications import NotificationsController
+from biweeklybudget.flaskapp.notifications import (
+    NotificationsController, NOTIFICATIONS_CACHE_SETTING
+)
+from biweeklybudget.db_event_handlers import DATA_GENERATION_SETTING
 
 # https://code.google.com/p/mock/issues/detail?id=249
 # py>=3.4 should use unittest.mock not the mock package on pypi
@@ -45,9 +48,9 @@ if (
         sys.version_info[0] < 3 or
         sys.version_info[0] == 3 and sys.version_info[1] < 4
 ):
-    from mock import Mock, patch, call, DEFAULT  # noqa
+    from mock import Mock, MagicMock, patch, call, DEFAULT  # noqa
 else:
-    from unittest.mock import Mock, patch, call, DEFAULT  # noqa
+    from unittest.mock import Mock, MagicMock, patch, call, DEFAULT  # noqa
 
 pbm = 'biweeklybudget.flaskapp.notifications'
 pb = '%s.NotificationsController' % pbm
@@ -56,17 +59,18 @@ pb = '%s.NotificationsController' % pbm
 class TestNotifications(object):
 
     def test_num_stale_accounts(self):
-        accts = [
-            Mock(is_stale=True, is_active=True),
-            Mock(is_stale=False, is_active=True)
-        ]
         with patch('%s.db_session' % pbm) as mock_db:
             mock_db.query.return_value.filter.return_value\
-                .all.return_value = accts
+                .scalar.return_value = 1
             res = NotificationsController.num_stale_accounts()
         assert res == 1
-        assert mock_db.mock_calls[0] == call.query(Account)
-        assert mock_db.mock_calls[2] == call.query().filter().all()
+        assert len(mock_db.query.mock_calls[0][1]) == 1
+        assert str(mock_db.query.mock_calls[0][1][0]) == 'count(accounts.id)'
+        kall = mock_db.mock_calls[1]
+        assert kall[0] == 'query().filter'
+        assert str(kall[1][0]) == 'accounts.is_active = true'
+        assert 'ofx_statements.as_of' in str(kall[1][1])
+        assert mock_db.mock_calls[2] == call.query().filter().scalar()
 
     def test_get_notifications_no_stale(self):
         with patch.multiple(
@@ -87,6 +91,28 @@ class TestNotifications(object):
             res = NotificationsController.get_notifications()
         assert res == []
 
+    def test_get_notifications_sess(self):
+        mock_sess = Mock()
+        with patch.multiple(
+            pb,
+            num_stale_accounts=DEFAULT,
+            budget_account_sum=DEFAULT,
+            standing_budgets_sum=DEFAULT,
+            num_unreconciled_ofx=DEFAULT,
+            budget_account_unreconciled=DEFAULT,
+            pp_sum=DEFAULT
+        ) as mocks:
+            mocks['num_stale_accounts'].return_value = 0
+            mocks['budget_account_sum'].return_value = 1000
+            mocks['standing_budgets_sum'].return_value = 1000
+            mocks['num_unreconciled_ofx'].return_value = 0
+            mocks['budget_account_unreconciled'].return_value = 0
+            mocks['pp_sum'].return_value = 0
+            res = NotificationsController.get_notifications(mock_sess)
+        assert res == []
+        for m in mocks.values():
+            assert m.mock_calls == [call(mock_sess)]
+
     def test_get_notifications_over_balance(self):
         with patch.multiple(
                 pb,
@@ -212,3 +238,116 @@ class TestNotifications(object):
                            'Unreconciled OFXTransactions</a>.'
             }
         ]
+
+
+class TestCachedNotifications(object):
+
+    def setup(self):
+        self.mock_sess = MagicMock()
+        self.vals = []
+        self.mock_sess.query.return_value.filter.return_value.all\
+            .return_value = self.vals
+        self.mock_conn = self.mock_sess.get_bind.return_value.connect\
+            .return_value.__enter__.return_value
+        self.notifications = [{'classes': 'foo', 'content': 'bar'}]
+
+    def cache(self, generation, t):
+        return json.dumps({
+            'generation': generation,
+            'time': t,
+            'notifications': self.notifications
+        })
+
+    @patch('%s.settings.NOTIFICATIONS_CACHE_SECONDS' % pbm, 300)
+    def test_hit(self):
+        self.vals.extend([
+            (DATA_GENERATION_SETTING, '12'),
+            (NOTIFICATIONS_CACHE_SETTING, self.cache(12, 1000))
+        ])
+        with patch('%s.time.time' % pbm) as m_time:
+            m_time.return_value = 1100
+            with patch('%s.get_notifications' % pb) as m_get:
+                with patch('%s.DBSetting.set_value' % pbm) as m_set:
+                    res = NotificationsController.cached_notifications(
+                        self.mock_sess
+                    )
+        assert res == self.notifications
+        assert m_get.mock_calls == []
+        assert m_set.mock_calls == []
+        assert self.mock_sess.query.call_count == 1
+
+    @patch('%s.settings.NOTIFICATIONS_CACHE_SECONDS' % pbm, 300)
+    def test_generation_changed(self):
+        self.vals.extend([
+            (DATA_GENERATION_SETTING, '13'),
+            (NOTIFICATIONS_CACHE_SETTING, self.cache(12, 1000))
+        ])
+        with patch('%s.time.time' % pbm) as m_time:
+            m_time.return_value = 1100
+            with patch('%s.get_notifications' % pb) as m_get:
+                m_get.return_value = [{'classes': 'a', 'content': 'b'}]
+                with patch('%s.DBSetting.set_value' % pbm) as m_set:
+                    res = NotificationsController.cached_notifications(
+                        self.mock_sess
+                    )
+        assert res == [{'classes': 'a', 'content': 'b'}]
+        assert m_get.mock_calls == [call(self.mock_sess)]
+        assert len(m_set.mock_calls) == 1
+        assert m_set.mock_calls[0][1][0] is self.mock_conn
+        assert m_set.mock_calls[0][1][1] == NOTIFICATIONS_CACHE_SETTING
+        assert json.loads(m_set.mock_calls[0][1][2]) == {
+            'generation': 13,
+            'time': 1100,
+            'notifications': [{'classes': 'a', 'content': 'b'}]
+        }
+        assert self.mock_conn.mock_calls == [
+            call.begin(), call.begin().__enter__(),
+            call.begin().__exit__(None, None, None)
+        ]
+
+    @patch('%s.settings.NOTIFICATIONS_CACHE_SECONDS' % pbm, 300)
+    def test_expired(self):
+        self.vals.extend([
+            (DATA_GENERATION_SETTING, '12'),
+            (NOTIFICATIONS_CACHE_SETTING, self.cache(12, 1000))
+        ])
+        with patch('%s.time.time' % pbm) as m_time:
+            m_time.return_value = 1300
+            with patch('%s.get_notifications' % pb) as m_get:
+                m_get.return_value = self.notifications
+                with patch('%s.DBSetting.set_value' % pbm) as m_set:
+                    NotificationsController.cached_notifications(
+                        self.mock_sess
+                    )
+        assert m_get.mock_calls == [call(self.mock_sess)]
+        assert len(m_set.mock_calls) == 1
+
+    @patch('%s.settings.NOTIFICATIONS_CACHE_SECONDS' % pbm, 300)
+    def test_no_settings(self):
+        with patch('%s.time.time' % pbm) as m_time:
+            m_time.return_value = 1000
+            with patch('%s.get_notifications' % pb) as m_get:
+                m_get.return_value = self.notifications
+                with patch('%s.DBSetting.set_value' % pbm) as m_set:
+                    res = NotificationsController.cached_notifications(
+                        self.mock_sess
+                    )
+        assert res == self.notifications
+        assert json.loads(m_set.mock_calls[0][1][2]) == {
+            'generation': 0,
+            'time': 1000,
+            'notifications': self.notifications
+        }
+
+    @patch('%s.settings.NOTIFICATIONS_CACHE_SECONDS' % pbm, 0)
+    def test_disabled(self):
+        with patch('%s.get_notifications' % pb) as m_get:
+            m_get.return_value = self.notifications
+            with patch('%s.DBSetting.set_value' % pbm) as m_set:
+                res = NotificationsController.cached_notifications(
+                    self.mock_sess
+                )
+        assert res == self.notifications
+        assert m_get.mock_calls == [call(self.mock_sess)]
+        assert self.mock_sess.mock_calls == []
+        assert m_set.mock_calls == []
@@ -179,3 +179,123 @@ class TestParamsFromOfxparserTransaction(object):
         assert str(
             OFXTransaction.is_interest_payment.__ne__(True)
         ) == str(kall[1][7])
+
+
+class TestIsFields(object):
+
+    def setup(self):
+        self.patterns = OFXTransaction.compile_is_patterns({
+            're_interest_charge': '^interest',
+            're_interest_paid': None,
+            're_payment': '^(payment|thank you)',
+            're_late_fee': '^Late Fee',
+            're_other_fee': '('
+        })
+
+    def test_compile_is_patterns(self):
+        assert self.patterns['re_interest_paid'] is None
+        assert self.patterns['re_other_fee'] is None
+        assert self.patterns['re_payment'].match('THANK YOU') is not None
+
+    def test_is_field_values(self):
+        assert OFXTransaction.is_field_values(
+            'Payment - Thank You', self.patterns
+        ) == {
+            'is_interest_charge': False,
+            'is_interest_payment': False,
+            'is_payment': True,
+            'is_late_fee': False,
+            'is_other_fee': False
+        }
+
+    def test_is_field_values_none(self):
+        assert OFXTransaction.is_field_values(None, self.patterns) == {
+            'is_interest_charge': False,
+            'is_interest_payment': False,
+            'is_payment': False,
+            'is_late_fee': False,
+            'is_other_fee': False
+        }
+
+    def test_is_field_values_manual_interest(self):
+        assert OFXTransaction.is_field_values(
+            'Interest Charged - MANUALLY ENTERED', self.patterns
+        ) == {
+            'is_interest_payment': False,
+            'is_payment': False,
+            'is_late_fee': False,
+            'is_other_fee': False
+        }
+
+    def test_update_is_fields(self):
+        acct = Account(
+            re_interest_charge='^interest', re_late_fee='^Late Fee',
+            re_payment=None, re_interest_paid=None, re_other_fee=None
+        )
+        t = OFXTransaction(
+            account=acct, name='Late Fee Charged', is_payment=True
+        )
+        t.update_is_fields()
+        assert t.is_payment is False
+        assert t.is_late_fee is True
+        assert t.is_interest_charge is False
+        assert t.is_other_fee is False
+        assert t.is_interest_payment is False
+
+
+class TestIsPatterns(object):
+
+    def setup(self):
+        OFXTransaction.invalidate_is_patterns()
+        self.regexes = {
+            're_interest_charge': '^interest',
+            're_interest_paid': None,
+            're_payment': '^payment',
+            're_late_fee': None,
+            're_other_fee': None
+        }
+
+    def teardown(self):
+        OFXTransaction.invalidate_is_patterns()
+
+    def test_cached(self):
+        with patch(
+            '%s.OFXTransaction.compile_is_patterns' % pbm,
+            wraps=OFXTransaction.compile_is_patterns
+        ) as m_compile:
+            p1 = OFXTransaction.is_patterns(3, self.regexes)
+            p2 = OFXTransaction.is_patterns(3, dict(self.regexes))
+        assert p1 is p2
+        assert m_compile.call_count == 1
+        assert p1['re_payment'].match('PAYMENT') is not None
+
+    def test_regexes_changed(self):
+        p1 = OFXTransaction.is_patterns(3, self.regexes)
+        self.regexes['re_late_fee'] = '^late'
+        p2 = OFXTransaction.is_patterns(3, self.regexes)
+        assert p1 is not p2
+        assert p2['re_late_fee'].match('Late Fee') is not None
+        assert OFXTransaction.is_patterns(3, self.regexes) is p2
+
+    def test_invalidate(self):
+        p1 = OFXTransaction.is_patterns(3, self.regexes)
+        p2 = OFXTransaction.is_patterns(4, self.regexes)
+        OFXTransaction.invalidate_is_patterns(3)
+        assert OFXTransaction.is_patterns(3, self.regexes) is not p1
+        assert OFXTransaction.is_patterns(4, self.regexes) is p2
+
+    def test_unsaved_account(self):
+        p1 = OFXTransaction.is_patterns(None, self.regexes)
+        assert OFXTransaction.is_patterns(None, self.regexes) is not p1
+
+    def test_account_is_patterns(self):
+        acct = Account(id=5, **self.regexes)
+        assert OFXTransaction.account_is_patterns(
+            acct
+        ) is OFXTransaction.is_patterns(5, self.regexes)
+
+    def test_update_is_fields_patterns(self):
+        t = OFXTransaction(account_id=3, name='Payment')
+        t.update_is_fields(OFXTransaction.is_patterns(3, self.regexes))
+        assert t.is_payment is True
+        assert t.is_interest_charge is False
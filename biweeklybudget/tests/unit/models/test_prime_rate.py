@@ -0,0 +1,92 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+import sys
+from datetime import date
+from decimal import Decimal
+
+from biweeklybudget.models.prime_rate import PrimeRate
+
+# https://code.google.com/p/mock/issues/detail?id=249
+# py>=3.4 should use unittest.mock not the mock package on pypi
+if (
+        sys.version_info[0] < 3 or
+        sys.version_info[0] == 3 and sys.version_info[1] < 4
+):
+    from mock import Mock, patch, call  # noqa
+else:
+    from unittest.mock import Mock, patch, call  # noqa
+
+
+class TestRatesForDates(object):
+
+    def setup(self):
+        self.mock_sess = Mock()
+        self.mock_q = self.mock_sess.query.return_value.filter.return_value
+        self.mock_q.order_by.return_value.all.return_value = [
+            (date(2017, 1, 3), Decimal('0.0375')),
+            (date(2017, 3, 16), Decimal('0.0400')),
+            (date(2017, 6, 15), Decimal('0.0425'))
+        ]
+
+    def test_rates_for_dates(self):
+        res = PrimeRate.rates_for_dates(self.mock_sess, [
+            date(2017, 7, 1),
+            date(2016, 12, 31),
+            date(2017, 3, 16),
+            date(2017, 3, 15)
+        ])
+        assert res == {
+            date(2017, 7, 1): Decimal('0.0425'),
+            date(2016, 12, 31): None,
+            date(2017, 3, 16): Decimal('0.0400'),
+            date(2017, 3, 15): Decimal('0.0375')
+        }
+        assert self.mock_sess.query.mock_calls[0] == call(
+            PrimeRate.date, PrimeRate.rate
+        )
+        assert self.mock_sess.query.call_count == 1
+        filt = self.mock_sess.query.return_value.filter.mock_calls[0][1][0]
+        assert str(filt) == str(PrimeRate.date.__le__(date(2017, 7, 1)))
+
+    def test_rates_for_dates_empty(self):
+        assert PrimeRate.rates_for_dates(self.mock_sess, []) == {}
+        assert self.mock_sess.mock_calls == []
+
+    def test_rate_for_date(self):
+        assert PrimeRate.rate_for_date(
+            self.mock_sess, date(2017, 5, 1)
+        ) == Decimal('0.0400')
@@ -0,0 +1,156 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+import sys
+from decimal import Decimal
+from datetime import date
+
+from biweeklybudget.models.scheduled_transaction import (
+    ScheduledTransaction, ScheduledOccurrence
+)
+from biweeklybudget.models.transaction import Transaction
+
+# https://code.google.com/p/mock/issues/detail?id=249
+# py>=3.4 should use unittest.mock not the mock package on pypi
+if (
+        sys.version_info[0] < 3 or
+        sys.version_info[0] == 3 and sys.version_info[1] < 4
+):
+    from mock import Mock, call  # noqa
+else:
+    from unittest.mock import Mock, call  # noqa
+
+
+def mock_st(id, date=None, day_of_month=None, num_per_period=None,
+            amount=Decimal('1.00')):
+    return Mock(
+        id=id, date=date, day_of_month=day_of_month,
+        num_per_period=num_per_period, amount=amount
+    )
+
+
+class TestExpand(object):
+
+    def setup(self):
+        self.periods = [
+            (date(2017, 3, 17), date(2017, 3, 30)),
+            (date(2017, 3, 31), date(2017, 4, 13))
+        ]
+        self.std = mock_st(1, date=date(2017, 3, 20))
+        self.std_conv = mock_st(2, date=date(2017, 4, 1))
+        self.stm5 = mock_st(3, day_of_month=5)
+        self.stm25 = mock_st(4, day_of_month=25)
+        self.stpp = mock_st(5, num_per_period=2)
+        self.stpp1 = mock_st(6, num_per_period=1, amount=Decimal('9.00'))
+        self.m_db = Mock()
+        self.m_t_q = Mock()
+        self.m_t_q.filter.return_value.all.return_value = [
+            (date(2017, 4, 2), 2),
+            (date(2017, 3, 18), 5),
+            (date(2017, 1, 1), 5)
+        ]
+        self.m_st_q = Mock()
+        self.m_st_q.filter.return_value.all.return_value = [
+            self.std, self.std_conv, self.stm5, self.stm25, self.stpp,
+            self.stpp1
+        ]
+        self.m_st_q.options.return_value = self.m_st_q
+
+        def se_query(*args):
+            if args[0] is ScheduledTransaction:
+                return self.m_st_q
+            return self.m_t_q
+
+        self.m_db.query.side_effect = se_query
+
+    def test_expand(self):
+        res = ScheduledTransaction.expand(self.m_db, self.periods)
+        assert res == [
+            ScheduledOccurrence(None, 0, self.stpp1),
+            ScheduledOccurrence(None, 0, self.stpp),
+            ScheduledOccurrence(date(2017, 3, 20), 0, self.std),
+            ScheduledOccurrence(date(2017, 3, 25), 0, self.stm25),
+            ScheduledOccurrence(None, 1, self.stpp1),
+            ScheduledOccurrence(None, 1, self.stpp),
+            ScheduledOccurrence(None, 1, self.stpp),
+            ScheduledOccurrence(date(2017, 4, 5), 1, self.stm5)
+        ]
+        assert self.m_db.query.mock_calls == [
+            call(Transaction.date, Transaction.scheduled_trans_id),
+            call(ScheduledTransaction)
+        ]
+        assert self.m_st_q.options.mock_calls == []
+
+    def test_expand_include_converted(self):
+        opts = [Mock()]
+        res = ScheduledTransaction.expand(
+            self.m_db, self.periods, exclude_converted=False, options=opts
+        )
+        assert res == [
+            ScheduledOccurrence(None, 0, self.stpp1),
+            ScheduledOccurrence(None, 0, self.stpp),
+            ScheduledOccurrence(None, 0, self.stpp),
+            ScheduledOccurrence(date(2017, 3, 20), 0, self.std),
+            ScheduledOccurrence(date(2017, 3, 25), 0, self.stm25),
+            ScheduledOccurrence(None, 1, self.stpp1),
+            ScheduledOccurrence(None, 1, self.stpp),
+            ScheduledOccurrence(None, 1, self.stpp),
+            ScheduledOccurrence(date(2017, 4, 1), 1, self.std_conv),
+            ScheduledOccurrence(date(2017, 4, 5), 1, self.stm5)
+        ]
+        assert self.m_db.query.mock_calls == [call(ScheduledTransaction)]
+        assert self.m_st_q.options.mock_calls == [call(*opts)]
+
+    def test_expand_monthly_many_months(self):
+        self.m_st_q.filter.return_value.all.return_value = [self.stm5]
+        res = ScheduledTransaction.expand(
+            self.m_db,
+            [
+                (date(2017, 1, 1), date(2017, 2, 28)),
+                (date(2017, 3, 6), date(2017, 4, 4)),
+                (date(2017, 4, 5), date(2017, 4, 5))
+            ],
+            exclude_converted=False
+        )
+        assert res == [
+            ScheduledOccurrence(date(2017, 1, 5), 0, self.stm5),
+            ScheduledOccurrence(date(2017, 2, 5), 0, self.stm5),
+            ScheduledOccurrence(date(2017, 4, 5), 2, self.stm5)
+        ]
+
+    def test_expand_no_periods(self):
+        assert ScheduledTransaction.expand(self.m_db, []) == []
+        assert self.m_db.mock_calls == []
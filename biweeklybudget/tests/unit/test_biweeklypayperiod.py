@@ -40,12 +40,19 @@ import pytest
 from datetime import datetime, date, timedelta
 from sqlalchemy.orm.session import Session
 from sqlalchemy import asc
+from sqlalchemy.exc import IntegrityError
 from decimal import Decimal
 
-from biweeklybudget.biweeklypayperiod import BiweeklyPayPeriod
+from biweeklybudget.biweeklypayperiod import (
+    BiweeklyPayPeriod, PayPeriodRange, PayPeriodRegistry,
+    TRANSACTION_LOAD_OPTIONS, SCHED_TRANS_LOAD_OPTIONS, PeriodTxn,
+    DATA_CHANGED_INFO_KEY
+)
 from biweeklybudget.models.ofx_transaction import OFXTransaction
 from biweeklybudget.models.transaction import Transaction
-from biweeklybudget.models.scheduled_transaction import ScheduledTransaction
+from biweeklybudget.models.scheduled_transaction import (
+    ScheduledTransaction, ScheduledOccurrence
+)
 from biweeklybudget.models.budget_model import Budget
 from biweeklybudget.models.budget_transaction import BudgetTransaction
 from biweeklybudget.tests.unit_helpers import binexp_to_dict
@@ -57,9 +64,9 @@ if (
         sys.version_info[0] < 3 or
         sys.version_info[0] == 3 and sys.version_info[1] < 4
 ):
-    from mock import Mock, patch, call, DEFAULT
+    from mock import Mock, MagicMock, patch, call, DEFAULT
 else:
-    from unittest.mock import Mock, patch, call, DEFAULT
+    from unittest.mock import Mock, MagicMock, patch, call, DEFAULT
 
 pbm = 'biweeklybudget.biweeklypayperiod'
 pb = '%s.BiweeklyPayPeriod' % pbm
@@ -170,6 +177,63 @@ class TestForDate(object):
             date(2017, 5, 2), self.mock_sess) == BiweeklyPayPeriod(
             date(2017, 4, 28), self.mock_sess)
 
+    @patch('%s.settings.PAY_PERIOD_START_DATE' % pbm, date(2017, 3, 17))
+    def test_period_for_date_datetime(self):
+        assert BiweeklyPayPeriod.period_for_date(
+            datetime(2017, 3, 30, 23, 59, 59), self.mock_sess
+        ) == BiweeklyPayPeriod(date(2017, 3, 17), self.mock_sess)
+        assert BiweeklyPayPeriod.period_for_date(
+            datetime(2017, 3, 31, 0, 0, 0), self.mock_sess
+        ) == BiweeklyPayPeriod(date(2017, 3, 31), self.mock_sess)
+
+    @patch('%s.settings.PAY_PERIOD_START_DATE' % pbm, date(2017, 3, 17))
+    def test_period_for_date_distant(self):
+        assert BiweeklyPayPeriod.period_for_date(
+            date(1997, 3, 20), self.mock_sess) == BiweeklyPayPeriod(
+            date(1997, 3, 14), self.mock_sess)
+        assert BiweeklyPayPeriod.period_for_date(
+            date(2047, 3, 15), self.mock_sess) == BiweeklyPayPeriod(
+            date(2047, 3, 8), self.mock_sess)
+
+    @patch('%s.settings.PAY_PERIOD_START_DATE' % pbm, date(2017, 3, 17))
+    def test_period_for_date_matches_next_previous(self):
+        p = BiweeklyPayPeriod(date(2017, 3, 17), self.mock_sess)
+        for _ in range(0, 60):
+            p = p.next
+        assert BiweeklyPayPeriod.period_for_date(
+            p.end_date, self.mock_sess) == p
+        for _ in range(0, 120):
+            p = p.previous
+        assert BiweeklyPayPeriod.period_for_date(
+            p.start_date, self.mock_sess) == p
+
+    @patch('%s.settings.PAY_PERIOD_START_DATE' % pbm, date(2017, 3, 17))
+    def test_periods_between(self):
+        res = list(BiweeklyPayPeriod.periods_between(
+            date(2017, 3, 16), datetime(2017, 4, 14, 12, 0, 0), self.mock_sess
+        ))
+        assert res == [
+            BiweeklyPayPeriod(date(2017, 3, 3), self.mock_sess),
+            BiweeklyPayPeriod(date(2017, 3, 17), self.mock_sess),
+            BiweeklyPayPeriod(date(2017, 3, 31), self.mock_sess),
+            BiweeklyPayPeriod(date(2017, 4, 14), self.mock_sess)
+        ]
+        assert res[0]._db == self.mock_sess
+
+    @patch('%s.settings.PAY_PERIOD_START_DATE' % pbm, date(2017, 3, 17))
+    def test_periods_between_single(self):
+        res = list(BiweeklyPayPeriod.periods_between(
+            date(2017, 3, 18), date(2017, 3, 18), self.mock_sess
+        ))
+        assert res == [BiweeklyPayPeriod(date(2017, 3, 17), self.mock_sess)]
+
+    @patch('%s.settings.PAY_PERIOD_START_DATE' % pbm, date(2017, 3, 17))
+    def test_periods_between_reversed(self):
+        res = list(BiweeklyPayPeriod.periods_between(
+            date(2017, 5, 1), date(2017, 3, 1), self.mock_sess
+        ))
+        assert res == []
+
 
 class TestFilterQuery(object):
 
@@ -203,10 +267,15 @@ class TestTransactions(object):
             res = self.cls._transactions()
         assert res == mock_res
         assert mock_filter.mock_calls == [
-            call(self.cls, self.mock_sess.query.return_value, Transaction.date)
+            call(
+                self.cls,
+                self.mock_sess.query.return_value.options.return_value,
+                Transaction.date
+            )
         ]
         assert self.mock_sess.mock_calls == [
-            call.query(Transaction)
+            call.query(Transaction),
+            call.query().options(*TRANSACTION_LOAD_OPTIONS)
         ]
 
 
@@ -225,16 +294,20 @@ class TestSTDate(object):
         assert mock_filter.mock_calls == [
             call(
                 self.cls,
-                self.mock_sess.query.return_value.filter.return_value,
+                self.mock_sess.query.return_value.options.return_value.filter
+                .return_value,
                 ScheduledTransaction.date
             )
         ]
-        assert len(self.mock_sess.mock_calls) == 2
+        assert len(self.mock_sess.mock_calls) == 3
         assert self.mock_sess.mock_calls[0] == call.query(ScheduledTransaction)
-        assert self.mock_sess.mock_calls[1][0] == 'query().filter'
+        assert self.mock_sess.mock_calls[1] == call.query().options(
+            *SCHED_TRANS_LOAD_OPTIONS
+        )
+        assert self.mock_sess.mock_calls[2][0] == 'query().options().filter'
         expected = ScheduledTransaction.is_active.__eq__(True)
         assert str(expected) == str(
-            self.mock_sess.mock_calls[1][1][0]
+            self.mock_sess.mock_calls[2][1][0]
         )
 
 
@@ -246,16 +319,20 @@ class TestSTPeriod(object):
 
     def test_scheduled_transactions_per_period(self):
         res = self.cls._scheduled_transactions_per_period()
-        frv = self.mock_sess.query.return_value.filter.return_value
+        frv = self.mock_sess.query.return_value.options.return_value\
+            .filter.return_value
         assert res == frv.order_by.return_value
-        assert len(self.mock_sess.mock_calls) == 3
+        assert len(self.mock_sess.mock_calls) == 4
         assert self.mock_sess.mock_calls[0] == call.query(ScheduledTransaction)
-        kall = self.mock_sess.mock_calls[1]
-        assert kall[0] == 'query().filter'
+        assert self.mock_sess.mock_calls[1] == call.query().options(
+            *SCHED_TRANS_LOAD_OPTIONS
+        )
+        kall = self.mock_sess.mock_calls[2]
+        assert kall[0] == 'query().options().filter'
         expected = ScheduledTransaction.schedule_type.__eq__('per period')
         assert binexp_to_dict(expected) == binexp_to_dict(kall[1][0])
-        kall = self.mock_sess.mock_calls[2]
-        assert kall[0] == 'query().filter().order_by'
+        kall = self.mock_sess.mock_calls[3]
+        assert kall[0] == 'query().options().filter().order_by'
         assert str(kall[1][0]) == str(asc(ScheduledTransaction.num_per_period))
         assert str(kall[1][1]) == str(asc(ScheduledTransaction.amount))
 
@@ -268,11 +345,15 @@ class TestSTMonthly(object):
     def test_contiguous(self):
         cls = BiweeklyPayPeriod(date(2017, 3, 2), self.mock_sess)
         res = cls._scheduled_transactions_monthly()
-        assert res == self.mock_sess.query.return_value.filter.return_value
-        assert len(self.mock_sess.mock_calls) == 2
+        orv = self.mock_sess.query.return_value.options.return_value
+        assert res == orv.filter.return_value
+        assert len(self.mock_sess.mock_calls) == 3
         assert self.mock_sess.mock_calls[0] == call.query(ScheduledTransaction)
-        kall = self.mock_sess.mock_calls[1]
-        assert kall[0] == 'query().filter'
+        assert self.mock_sess.mock_calls[1] == call.query().options(
+            *SCHED_TRANS_LOAD_OPTIONS
+        )
+        kall = self.mock_sess.mock_calls[2]
+        assert kall[0] == 'query().options().filter'
         expected = [
             ScheduledTransaction.schedule_type.__eq__('monthly'),
             ScheduledTransaction.is_active.__eq__(True),
@@ -290,11 +371,15 @@ class TestSTMonthly(object):
         with patch('%s.or_' % pbm) as mock_or:
             mock_or.return_value = mock_or_result
             res = cls._scheduled_transactions_monthly()
-        assert res == self.mock_sess.query.return_value.filter.return_value
-        assert len(self.mock_sess.mock_calls) == 2
+        orv = self.mock_sess.query.return_value.options.return_value
+        assert res == orv.filter.return_value
+        assert len(self.mock_sess.mock_calls) == 3
         assert self.mock_sess.mock_calls[0] == call.query(ScheduledTransaction)
-        kall = self.mock_sess.mock_calls[1]
-        assert kall[0] == 'query().filter'
+        assert self.mock_sess.mock_calls[1] == call.query().options(
+            *SCHED_TRANS_LOAD_OPTIONS
+        )
+        kall = self.mock_sess.mock_calls[2]
+        assert kall[0] == 'query().options().filter'
         expected = ScheduledTransaction.schedule_type.__eq__('monthly')
         assert binexp_to_dict(kall[1][0]) == binexp_to_dict(expected)
         assert str(kall[1][1]) == str(
@@ -1350,3 +1435,405 @@ class TestDictForSchedTrans(object):
                 3: {'name': 'bar', 'amount': Decimal('123.45')}
             }
         }
+
+
+class TestPayPeriodRange(object):
+
+    def setup(self):
+        self.mock_sess = Mock(spec_set=Session)
+        self.first = BiweeklyPayPeriod(date(2017, 3, 17), self.mock_sess)
+
+    def test_init(self):
+        cls = PayPeriodRange(self.first, 3)
+        assert len(cls) == 3
+        assert cls.periods == [
+            BiweeklyPayPeriod(date(2017, 3, 17), self.mock_sess),
+            BiweeklyPayPeriod(date(2017, 3, 31), self.mock_sess),
+            BiweeklyPayPeriod(date(2017, 4, 14), self.mock_sess)
+        ]
+        assert cls[0] is self.first
+        assert list(cls) == cls.periods
+        assert cls.start_date == date(2017, 3, 17)
+        assert cls.end_date == date(2017, 4, 27)
+        assert str(cls) == '<PayPeriodRange(2017-03-17, 3)>'
+
+    def test_init_invalid(self):
+        with pytest.raises(ValueError):
+            PayPeriodRange(self.first, 0)
+
+    def test_load(self):
+        t1 = Mock(date=date(2017, 3, 17))
+        t2 = Mock(date=date(2017, 3, 30))
+        t3 = Mock(date=date(2017, 3, 31))
+        t4 = Mock(date=date(2017, 4, 27))
+        std = Mock(id=1, date=date(2017, 4, 1), day_of_month=None)
+        stm1 = Mock(id=2, date=None, day_of_month=20)
+        stm2 = Mock(id=3, date=None, day_of_month=5)
+        stpp = Mock(id=4, date=None, day_of_month=None, num_per_period=2)
+        budgets = [Mock()]
+        self.mock_sess.query.return_value.options.return_value\
+            .filter.return_value.all.return_value = [t1, t3, t4, t2]
+        cls = PayPeriodRange(self.first, 3)
+        with patch.multiple(
+            pb,
+            autospec=True,
+            _build_data_cache=DEFAULT
+        ) as mocks:
+            with patch(
+                '%s.ScheduledTransaction.expand' % pbm
+            ) as mock_expand:
+                mock_expand.return_value = [
+                    ScheduledOccurrence(None, 0, stpp),
+                    ScheduledOccurrence(None, 0, stpp),
+                    ScheduledOccurrence(date(2017, 3, 20), 0, stm1),
+                    ScheduledOccurrence(None, 1, stpp),
+                    ScheduledOccurrence(None, 1, stpp),
+                    ScheduledOccurrence(date(2017, 4, 1), 1, std),
+                    ScheduledOccurrence(date(2017, 4, 5), 1, stm2),
+                    ScheduledOccurrence(None, 2, stpp),
+                    ScheduledOccurrence(None, 2, stpp),
+                    ScheduledOccurrence(date(2017, 4, 20), 2, stm1)
+                ]
+                self.first._periodic_budget_list = budgets
+                res = cls.load()
+        assert res is cls
+        assert mocks['_build_data_cache'].mock_calls == [
+            call(cls[0], [t1, t2], [], [stpp], [stm1]),
+            call(cls[1], [t3], [std], [stpp], [stm2]),
+            call(cls[2], [t4], [], [stpp], [stm1])
+        ]
+        assert mock_expand.mock_calls == [
+            call(
+                self.mock_sess,
+                [
+                    (date(2017, 3, 17), date(2017, 3, 30)),
+                    (date(2017, 3, 31), date(2017, 4, 13)),
+                    (date(2017, 4, 14), date(2017, 4, 27))
+                ],
+                exclude_converted=False,
+                options=SCHED_TRANS_LOAD_OPTIONS
+            )
+        ]
+        assert self.mock_sess.query.call_args_list == [call(Transaction)]
+        for p in cls:
+            assert p._periodic_budget_list is budgets
+
+    def test_load_already_loaded(self):
+        cls = PayPeriodRange(self.first, 2)
+        for p in cls:
+            p._data_cache = {'foo': 'bar'}
+        with patch('%s._build_data_cache' % pb, autospec=True) as mock_bdc:
+            res = cls.load()
+        assert res is cls
+        assert mock_bdc.mock_calls == []
+        assert self.mock_sess.mock_calls == []
+
+
+class TestPayPeriodRegistry(object):
+
+    def setup(self):
+        self.mock_sess = Mock(spec_set=Session)
+        self.mock_sess.info = {}
+
+    def test_for_session(self):
+        res = PayPeriodRegistry.for_session(self.mock_sess)
+        assert isinstance(res, PayPeriodRegistry)
+        assert self.mock_sess.info == {PayPeriodRegistry.INFO_KEY: res}
+        assert PayPeriodRegistry.for_session(self.mock_sess) is res
+
+    def test_for_session_no_info(self):
+        assert PayPeriodRegistry.for_session(Mock(spec_set=Session)) is None
+
+    def test_clear(self):
+        res = PayPeriodRegistry.for_session(self.mock_sess)
+        PayPeriodRegistry.clear(self.mock_sess)
+        assert self.mock_sess.info == {}
+        assert PayPeriodRegistry.for_session(self.mock_sess) is not res
+        # no-op when there is nothing to clear
+        PayPeriodRegistry.clear(self.mock_sess)
+        PayPeriodRegistry.clear(Mock(spec_set=Session))
+
+    def test_get(self):
+        cls = PayPeriodRegistry(self.mock_sess)
+        res = cls.get(date(2017, 3, 17))
+        assert res == BiweeklyPayPeriod(date(2017, 3, 17), self.mock_sess)
+        assert res._db == self.mock_sess
+        assert cls.get(date(2017, 3, 17)) is res
+        assert cls.get(datetime(2017, 3, 17, 12, 34, 56)) is res
+        assert len(cls) == 1
+
+    @patch('%s.settings.PAY_PERIOD_START_DATE' % pbm, date(2017, 3, 17))
+    def test_period_for_date(self):
+        cls = PayPeriodRegistry(self.mock_sess)
+        res = cls.period_for_date(date(2017, 3, 20))
+        assert res.start_date == date(2017, 3, 17)
+        assert cls.period_for_date(datetime(2017, 3, 30, 23, 59)) is res
+        assert cls.get(date(2017, 3, 17)) is res
+        assert cls.period_for_date(date(2017, 3, 31)) is not res
+        assert len(cls) == 2
+
+    @patch('%s.settings.PAY_PERIOD_START_DATE' % pbm, date(2017, 3, 17))
+    def test_canonical_instances(self):
+        pp = BiweeklyPayPeriod.period_for_date(date(2017, 4, 1), self.mock_sess)
+        assert pp.start_date == date(2017, 3, 31)
+        assert BiweeklyPayPeriod.period_for_date(
+            date(2017, 4, 13), self.mock_sess
+        ) is pp
+        assert pp.next.previous is pp
+        assert pp.previous.next is pp
+        assert pp.next.next is pp.next.next
+        assert list(BiweeklyPayPeriod.periods_between(
+            date(2017, 3, 17), date(2017, 4, 14), self.mock_sess
+        )) == [pp.previous, pp, pp.next]
+        assert BiweeklyPayPeriod.for_start_date(
+            date(2017, 3, 31), self.mock_sess
+        ) is pp
+
+    def test_for_start_date_no_registry(self):
+        mock_sess = Mock(spec_set=Session)
+        res = BiweeklyPayPeriod.for_start_date(date(2017, 3, 17), mock_sess)
+        assert res == BiweeklyPayPeriod(date(2017, 3, 17), mock_sess)
+        assert BiweeklyPayPeriod.for_start_date(
+            date(2017, 3, 17), mock_sess
+        ) is not res
+
+
+class TestPayPeriodRangeStoredBudgetSums(object):
+
+    def setup(self):
+        self.mock_sess = Mock(spec_set=Session)
+        self.mock_sess.new = []
+        self.mock_sess.dirty = []
+        self.mock_sess.deleted = []
+        self.mock_sess.info = {}
+        self.mock_sess.query.return_value.filter.return_value\
+            .scalar.return_value = '3'
+        self.mock_conn = MagicMock()
+        self.mock_conn.execute.return_value.scalar.return_value = '3'
+        self.mock_sess.get_bind.return_value = MagicMock()
+        self.mock_sess.get_bind.return_value.connect.return_value\
+            .__enter__.return_value = self.mock_conn
+        self.first = BiweeklyPayPeriod(date(2017, 3, 17), self.mock_sess)
+
+    def _sums(self, amt):
+        return {
+            'allocated': Decimal(amt),
+            'spent': Decimal(amt),
+            'trans_total': Decimal(amt)
+        }
+
+    def test_read_budget_sums(self):
+        mock_conn = Mock()
+        mock_conn.execute.return_value = [
+            Mock(
+                period_start=date(2017, 3, 17), budget_id=1,
+                allocated=Decimal('1.00'), spent=Decimal('1.00'),
+                trans_total=Decimal('1.00')
+            ),
+            Mock(
+                period_start=date(2017, 3, 17), budget_id=2,
+                allocated=Decimal('2.00'), spent=Decimal('2.00'),
+                trans_total=Decimal('2.00')
+            ),
+            Mock(
+                period_start=date(2017, 3, 31), budget_id=None,
+                allocated=None, spent=None, trans_total=None
+            )
+        ]
+        res = PayPeriodRange.read_budget_sums(
+            mock_conn, date(2017, 3, 17), date(2017, 4, 14)
+        )
+        assert res == {
+            date(2017, 3, 17): {
+                1: self._sums('1.00'),
+                2: self._sums('2.00')
+            },
+            date(2017, 3, 31): {}
+        }
+        assert len(mock_conn.execute.mock_calls) == 1
+
+    def test_insert_budget_sums(self):
+        mock_conn = Mock()
+        PayPeriodRange.insert_budget_sums(mock_conn, {
+            date(2017, 3, 31): {},
+            date(2017, 3, 17): {2: self._sums('2.00'), 1: self._sums('1.00')}
+        })
+        assert len(mock_conn.execute.mock_calls) == 2
+        assert mock_conn.execute.mock_calls[0][1][1] == [
+            {'period_start': date(2017, 3, 17)},
+            {'period_start': date(2017, 3, 31)}
+        ]
+        assert mock_conn.execute.mock_calls[1][1][1] == [
+            dict(period_start=date(2017, 3, 17), budget_id=1,
+                 **self._sums('1.00')),
+            dict(period_start=date(2017, 3, 17), budget_id=2,
+                 **self._sums('2.00'))
+        ]
+
+    def test_insert_budget_sums_empty(self):
+        mock_conn = Mock()
+        PayPeriodRange.insert_budget_sums(mock_conn, {})
+        assert mock_conn.execute.mock_calls == []
+
+    def _run(self, num_periods, stored, calculated, side_effect=None):
+        cls = PayPeriodRange(self.first, num_periods)
+        with patch.multiple(
+            '%s.PayPeriodRange' % pbm,
+            read_budget_sums=DEFAULT,
+            insert_budget_sums=DEFAULT,
+            budget_sums_by_period=DEFAULT
+        ) as mocks:
+            mocks['read_budget_sums'].side_effect = stored
+            mocks['insert_budget_sums'].side_effect = side_effect
+            mocks['budget_sums_by_period'].return_value = calculated
+            res = cls.stored_budget_sums()
+        return res, mocks
+
+    def test_all_stored(self):
+        stored = {
+            date(2017, 3, 17): {1: self._sums('1.00')},
+            date(2017, 3, 31): {}
+        }
+        res, mocks = self._run(2, [stored], {})
+        assert res == stored
+        assert mocks['read_budget_sums'].mock_calls == [
+            call(self.mock_sess, date(2017, 3, 17), date(2017, 3, 31))
+        ]
+        assert mocks['budget_sums_by_period'].mock_calls == []
+        assert self.mock_sess.get_bind.mock_calls == []
+
+    def test_missing(self):
+        calculated = {
+            date(2017, 3, 17): {1: self._sums('4.00')},
+            date(2017, 3, 31): {1: self._sums('9.00')},
+            date(2017, 4, 14): {}
+        }
+        res, mocks = self._run(3, [
+            {date(2017, 3, 31): {1: self._sums('3.00')}}
+        ], calculated)
+        assert res == {
+            date(2017, 3, 17): {1: self._sums('4.00')},
+            date(2017, 3, 31): {1: self._sums('3.00')},
+            date(2017, 4, 14): {}
+        }
+        assert len(mocks['budget_sums_by_period'].mock_calls) == 1
+        assert self.mock_conn.begin.call_count == 1
+        assert mocks['insert_budget_sums'].mock_calls == [
+            call(self.mock_conn, {
+                date(2017, 3, 17): {1: self._sums('4.00')},
+                date(2017, 4, 14): {}
+            })
+        ]
+
+    def test_missing_generation_changed(self):
+        self.mock_conn.execute.return_value.scalar.return_value = '4'
+        res, mocks = self._run(1, [{}], {date(2017, 3, 17): {}})
+        assert res == {date(2017, 3, 17): {}}
+        assert mocks['insert_budget_sums'].mock_calls == []
+
+    def test_missing_pending_changes(self):
+        self.mock_sess.dirty = [Mock()]
+        res, mocks = self._run(1, [{}], {date(2017, 3, 17): {}})
+        assert res == {date(2017, 3, 17): {}}
+        assert self.mock_sess.get_bind.mock_calls == []
+        assert mocks['insert_budget_sums'].mock_calls == []
+
+    def test_missing_flushed_changes(self):
+        self.mock_sess.info[DATA_CHANGED_INFO_KEY] = True
+        res, mocks = self._run(1, [{}], {date(2017, 3, 17): {}})
+        assert res == {date(2017, 3, 17): {}}
+        assert self.mock_sess.get_bind.mock_calls == []
+        assert mocks['insert_budget_sums'].mock_calls == []
+
+    def test_missing_stored_concurrently(self):
+        committed = {date(2017, 3, 17): {1: self._sums('5.00')}}
+        res, mocks = self._run(
+            2, [{}, committed], {
+                date(2017, 3, 17): {1: self._sums('4.00')},
+                date(2017, 3, 31): {}
+            }, side_effect=IntegrityError('stmt', {}, None)
+        )
+        assert res == {
+            date(2017, 3, 17): {1: self._sums('5.00')},
+            date(2017, 3, 31): {}
+        }
+        assert mocks['read_budget_sums'].mock_calls[1] == call(
+            self.mock_conn, date(2017, 3, 17), date(2017, 3, 31)
+        )
+
+
+class TestPeriodTxn(object):
+
+    def test_mapping(self):
+        budgets = {1: {'name': 'foo', 'amount': Decimal('1.23')}}
+        cls = PeriodTxn(
+            type='ScheduledTransaction', id=3, date=None,
+            amount=Decimal('1.23'), budgets=budgets
+        )
+        assert not hasattr(cls, '__dict__')
+        assert cls['id'] == 3
+        assert cls['date'] is None
+        assert cls['budgets'] is budgets
+        assert cls.get('planned_budget_id', 'x') == 'x'
+        assert 'planned_budget_id' not in cls
+        assert 'date' in cls
+        assert len(cls) == 5
+        assert list(cls.keys()) == ['type', 'id', 'date', 'amount', 'budgets']
+        assert cls == {
+            'type': 'ScheduledTransaction',
+            'id': 3,
+            'date': None,
+            'amount': Decimal('1.23'),
+            'budgets': budgets
+        }
+        assert cls.as_dict == dict(cls)
+        with pytest.raises(KeyError):
+            cls['planned_budget_id']
+        with pytest.raises(KeyError):
+            cls['foo']
+
+    def test_invalid_field(self):
+        with pytest.raises(AttributeError):
+            PeriodTxn(foo='bar')
+
+
+class TestMakeCombinedTransactionsSingleSort(object):
+
+    def setup(self):
+        self.mock_sess = Mock(spec_set=Session)
+        self.cls = BiweeklyPayPeriod(date(2017, 3, 17), self.mock_sess)
+
+    def test_per_period_references(self):
+        stpp = Mock(
+            id=5, num_per_period=3, date=None, amount=Decimal('10.00')
+        )
+        t1 = Mock(
+            id=1, scheduled_trans_id=5, date=date(2017, 3, 20),
+            amount=Decimal('5.00')
+        )
+        t2 = Mock(
+            id=2, scheduled_trans_id=None, date=date(2017, 3, 18),
+            amount=Decimal('5.00')
+        )
+        t3 = Mock(
+            id=3, scheduled_trans_id=None, date=date(2017, 3, 18),
+            amount=Decimal('1.00')
+        )
+        self.cls._data_cache = {
+            'transactions': [t1, t2, t3],
+            'st_date': [],
+            'st_monthly': [],
+            'st_per_period': [stpp]
+        }
+
+        def se_trans_dict(_, t):
+            return PeriodTxn(id=t.id, date=getattr(t, 'date', None),
+                             amount=t.amount)
+
+        with patch('%s._trans_dict' % pb, autospec=True) as mock_t_dict:
+            mock_t_dict.side_effect = se_trans_dict
+            with patch('%s.sorted' % pbm, create=True) as mock_sorted:
+                res = self.cls._make_combined_transactions()
+        assert mock_sorted.mock_calls == []
+        assert [x['id'] for x in res] == [5, 5, 3, 2, 1]
+        assert res[0] is res[1]
@@ -36,10 +36,13 @@ Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
 """
 
 import sys
+import json
+from concurrent.futures import Future
 from datetime import date, timedelta
 from sqlalchemy.orm.session import Session
 import pytest
 from math import ceil
+from random import Random
 from decimal import Decimal
 from copy import deepcopy
 
@@ -51,14 +54,19 @@ from biweeklybudget.interest import (
     _PayoffMethod, MinPaymentMethod, FixedPaymentMethod,
     LowestBalanceFirstMethod, HighestBalanceFirstMethod,
     LowestInterestRateFirstMethod, HighestInterestRateFirstMethod,
-    calculate_payoffs, CCStatement,
+    calculate_payoffs, CCStatement, PayoffSimulation, _SimulatedStatement,
+    BillingPeriodCalendar, _BillingPeriodChain,
     INTEREST_CALCULATION_NAMES, MIN_PAYMENT_FORMULA_NAMES,
-    PAYOFF_METHOD_NAMES
+    PAYOFF_METHOD_NAMES, PAYOFF_CACHE_SETTING, _encode_payoffs,
+    PAYMENT_SETTINGS_SETTING, payment_settings_json, payment_settings_dict
 )
 from biweeklybudget.utils import dtnow
-from biweeklybudget.models.account import Account, AcctType
+from biweeklybudget.models.account import (
+    Account, AcctType, NoInterestChargedError
+)
 from biweeklybudget.tests.unit_helpers import binexp_to_dict
 from biweeklybudget.models.account_balance import AccountBalance
+from biweeklybudget.models.dbsetting import DBSetting
 
 
 # https://code.google.com/p/mock/issues/detail?id=249
@@ -68,10 +76,10 @@ if (
         sys.version_info[0] == 3 and sys.version_info[1] < 4
 ):
     PY34PLUS = False
-    from mock import Mock, PropertyMock, call, patch
+    from mock import Mock, MagicMock, PropertyMock, call, patch
 else:
     PY34PLUS = True
-    from unittest.mock import Mock, PropertyMock, call, patch
+    from unittest.mock import Mock, MagicMock, PropertyMock, call, patch
 
 
 pbm = 'biweeklybudget.interest'
@@ -122,6 +130,41 @@ class FixedInterest(_InterestCalculation):
         }
 
 
+class TestPaymentSettings(object):
+
+    def test_json(self):
+        mock_sess = Mock(spec_set=Session)
+        mock_sess.query.return_value.get.return_value = DBSetting(
+            name=PAYMENT_SETTINGS_SETTING, value='{"foo": "bar"}'
+        )
+        assert payment_settings_json(mock_sess) == '{"foo": "bar"}'
+        assert mock_sess.query.mock_calls == [
+            call(DBSetting), call().get(PAYMENT_SETTINGS_SETTING)
+        ]
+
+    def test_json_none(self):
+        mock_sess = Mock(spec_set=Session)
+        mock_sess.query.return_value.get.return_value = None
+        assert json.loads(payment_settings_json(mock_sess)) == {
+            'increases': [], 'onetimes': []
+        }
+
+    def test_dict(self):
+        res = payment_settings_dict(json.dumps({
+            'increases': [
+                {'enabled': True, 'date': '2017-05-14', 'amount': '160.23'},
+                {'enabled': False, 'date': '2017-06-14', 'amount': '1.00'}
+            ],
+            'onetimes': [
+                {'enabled': True, 'date': '2017-07-21', 'amount': '98.76'}
+            ]
+        }))
+        assert res == {
+            'increases': {date(2017, 5, 14): Decimal('160.23')},
+            'onetimes': {date(2017, 7, 21): Decimal('98.76')}
+        }
+
+
 class TestInterestHelper(object):
 
     def setup(self):
@@ -150,8 +193,7 @@ class TestInterestHelper(object):
                 interest_class_name='AdbCompoundedDaily',
                 min_payment_class_name='MinPaymentAmEx',
                 balance=bal3,
-                effective_apr=Decimal('0.0100'),
-                last_interest_charge=Decimal('0.8089')
+                effective_apr=Decimal('0.0100')
             ),
             4: Mock(
                 spec_set=Account,
@@ -168,13 +210,17 @@ class TestInterestHelper(object):
                 interest_class_name='AdbCompoundedDaily',
                 min_payment_class_name='MinPaymentDiscover',
                 balance=bal4,
-                effective_apr=Decimal('0.1000'),
-                last_interest_charge=Decimal('46.9061')
+                effective_apr=Decimal('0.1000')
             )
         }
         self.mock_sess = Mock(spec_set=Session)
         self.mock_sess.query.return_value.filter.return_value.all.\
             return_value = self.accts.values()
+        # last interest charges query
+        self.mock_sess.query.return_value.join.return_value.filter.\
+            return_value.order_by.return_value.all.return_value = [
+                (3, Decimal('-0.8089')), (4, Decimal('-46.9061'))
+            ]
         self.cls = InterestHelper(self.mock_sess)
 
     def test_init(self):
@@ -233,6 +279,13 @@ class TestInterestHelper(object):
             4: Decimal('109.9730')
         }
 
+    def test_init_no_interest_charge(self):
+        self.mock_sess.query.return_value.join.return_value.filter.\
+            return_value.order_by.return_value.all.return_value = [(3, Decimal('-0.8089'))]
+        with pytest.raises(NoInterestChargedError) as excinfo:
+            InterestHelper(self.mock_sess)
+        assert excinfo.value.account == self.accts[4]
+
     def test_calculate_payoffs(self):
         pm1 = Mock()
         pm2 = Mock()
@@ -276,6 +329,210 @@ class TestInterestHelper(object):
             call(pm2.return_value)
         ]
 
+    def test_init_workers(self):
+        assert self.cls._workers == 1
+        cls = InterestHelper(self.mock_sess, workers=4)
+        assert cls._workers == 4
+
+    def test_calculate_payoffs_parallel(self):
+        serial = self.cls.calculate_payoffs()
+        cls = InterestHelper(self.mock_sess, workers=2)
+        with patch('%s._calc_payoff_method' % pb) as mock_cpm:
+            res = cls.calculate_payoffs()
+        assert mock_cpm.mock_calls == []
+        assert res == serial
+        assert len(res) > 1
+        for name, val in res.items():
+            assert 'results' in val
+
+    def test_calculate_payoffs_parallel_error(self):
+        def se_submit(func, klass, statements, calendar):
+            f = Future()
+            if isinstance(klass, MinPaymentMethod):
+                f.set_exception(TypeError('foo'))
+            else:
+                f.set_result(func(klass, statements, calendar))
+            return f
+
+        serial = self.cls.calculate_payoffs()
+        cls = InterestHelper(self.mock_sess, workers=2)
+        with patch('%s.ProcessPoolExecutor' % pbm) as mock_ppe:
+            mock_ppe.return_value.__enter__.return_value.submit.side_effect = \
+                se_submit
+            res = cls.calculate_payoffs()
+        assert mock_ppe.mock_calls[0] == call(max_workers=2)
+        assert res['MinPaymentMethod'] == {
+            'description': serial['MinPaymentMethod']['description'],
+            'doc': serial['MinPaymentMethod']['doc'],
+            'error': 'foo'
+        }
+        del res['MinPaymentMethod']
+        del serial['MinPaymentMethod']
+        assert res == serial
+
+    def test_calculate_payoffs_parallel_fallback(self):
+        serial = self.cls.calculate_payoffs()
+        cls = InterestHelper(self.mock_sess, workers=2)
+        with patch('%s.ProcessPoolExecutor' % pbm) as mock_ppe:
+            mock_ppe.side_effect = OSError('no semaphores')
+            with patch('%s.logger' % pbm) as mock_logger:
+                res = cls.calculate_payoffs()
+        assert res == serial
+        assert mock_logger.warning.call_count == 1
+
+    def test_payoff_sweep(self):
+        res = self.cls.payoff_sweep(
+            Decimal('150.00'), Decimal('250.00'), Decimal('50.00')
+        )
+        assert [x['max_total'] for x in res] == [
+            Decimal('150.00'), Decimal('200.00'), Decimal('250.00')
+        ]
+        names = sorted(
+            k for k, v in PAYOFF_METHOD_NAMES.items() if v['cls'].show_in_ui
+        )
+        for step in res:
+            assert sorted(step['methods'].keys()) == names
+            for name in names:
+                expected = self.cls._calc_payoff_method(
+                    PAYOFF_METHOD_NAMES[name]['cls'](step['max_total'])
+                )
+                total = sum(x['total_payments'] for x in expected.values())
+                assert step['methods'][name] == {
+                    'payoff_months': max(
+                        x['payoff_months'] for x in expected.values()
+                    ),
+                    'total_payments': total,
+                    'total_interest': total - Decimal('6450.71')
+                }
+        hbf = 'HighestBalanceFirstMethod'
+        assert res[0]['methods'][hbf]['payoff_months'] > \
+            res[2]['methods'][hbf]['payoff_months']
+
+    def test_payoff_sweep_error(self):
+        res = self.cls.payoff_sweep(
+            Decimal('100.00'), Decimal('100.00'), Decimal('50.00')
+        )
+        assert len(res) == 1
+        assert 'error' in res[0]['methods']['HighestBalanceFirstMethod']
+        assert 'error' not in res[0]['methods']['MinPaymentMethod']
+
+    def test_payoff_sweep_invalid_step(self):
+        with pytest.raises(ValueError):
+            self.cls.payoff_sweep(
+                Decimal('100.00'), Decimal('200.00'), Decimal('0')
+            )
+
+    def test_cache_key(self):
+        key = self.cls.cache_key
+        assert len(key) == 64
+        assert InterestHelper(self.mock_sess).cache_key == key
+        cls = InterestHelper(
+            self.mock_sess, increases={date(2017, 9, 1): Decimal('100.00')}
+        )
+        assert cls.cache_key != key
+        self.accts[4].balance.ledger = Decimal('-5400.00')
+        assert InterestHelper(self.mock_sess).cache_key != key
+
+    def _mock_conn(self):
+        mock_conn = MagicMock()
+        self.mock_sess.get_bind.return_value = MagicMock()
+        self.mock_sess.get_bind.return_value.connect.return_value\
+            .__enter__.return_value = mock_conn
+        return mock_conn
+
+    def test_cached_payoffs_miss(self):
+        self.mock_sess.query.return_value.get.return_value = None
+        mock_conn = self._mock_conn()
+        with patch('%s.calculate_payoffs' % pb, autospec=True) as mock_calc:
+            mock_calc.return_value = {
+                'PM1': {
+                    'description': 'pm1desc',
+                    'doc': 'pm1doc',
+                    'results': {
+                        3: {
+                            'payoff_months': 28,
+                            'total_payments': Decimal('963.21'),
+                            'total_interest': Decimal('11.15'),
+                            'next_payment': Decimal('35')
+                        }
+                    }
+                },
+                'PM2': {
+                    'description': 'pm2desc',
+                    'doc': 'pm2doc',
+                    'error': 'foo'
+                }
+            }
+            with patch('%s.DBSetting.set_value' % pbm) as mock_set:
+                res = self.cls.cached_payoffs()
+        assert res == mock_calc.return_value
+        assert self.mock_sess.query.call_args == call(DBSetting)
+        assert self.mock_sess.query.return_value.get.mock_calls == [
+            call(PAYOFF_CACHE_SETTING)
+        ]
+        assert mock_conn.begin.call_count == 1
+        assert len(mock_set.mock_calls) == 1
+        assert mock_set.mock_calls[0][1][0] is mock_conn
+        assert mock_set.mock_calls[0][1][1] == PAYOFF_CACHE_SETTING
+        assert json.loads(mock_set.mock_calls[0][1][2]) == {
+            'key': self.cls.cache_key,
+            'payoffs': {
+                'PM1': {
+                    'description': 'pm1desc',
+                    'doc': 'pm1doc',
+                    'results': {
+                        '3': {
+                            'payoff_months': 28,
+                            'total_payments': '963.21',
+                            'total_interest': '11.15',
+                            'next_payment': '35'
+                        }
+                    }
+                },
+                'PM2': {
+                    'description': 'pm2desc',
+                    'doc': 'pm2doc',
+                    'error': 'foo'
+                }
+            }
+        }
+        assert self.mock_sess.add.mock_calls == []
+        assert self.mock_sess.commit.mock_calls == []
+
+    def test_cached_payoffs_hit(self):
+        payoffs = self.cls.calculate_payoffs()
+        setting = DBSetting(name=PAYOFF_CACHE_SETTING, value=json.dumps({
+            'key': self.cls.cache_key,
+            'payoffs': _encode_payoffs(payoffs)
+        }))
+        self.mock_sess.query.return_value.get.return_value = setting
+        with patch('%s.calculate_payoffs' % pb, autospec=True) as mock_calc:
+            with patch('%s.DBSetting.set_value' % pbm) as mock_set:
+                res = self.cls.cached_payoffs()
+        assert mock_calc.mock_calls == []
+        assert mock_set.mock_calls == []
+        assert res == payoffs
+        assert self.mock_sess.commit.call_count == 0
+
+    def test_cached_payoffs_stale(self):
+        setting = DBSetting(name=PAYOFF_CACHE_SETTING, value=json.dumps({
+            'key': 'foo', 'payoffs': {}
+        }))
+        self.mock_sess.query.return_value.get.return_value = setting
+        mock_conn = self._mock_conn()
+        with patch('%s.calculate_payoffs' % pb, autospec=True) as mock_calc:
+            mock_calc.return_value = {}
+            with patch('%s.DBSetting.set_value' % pbm) as mock_set:
+                res = self.cls.cached_payoffs()
+        assert res == {}
+        assert mock_calc.call_count == 1
+        assert len(mock_set.mock_calls) == 1
+        assert mock_set.mock_calls[0][1][0] is mock_conn
+        assert json.loads(
+            mock_set.mock_calls[0][1][2]
+        )['key'] == self.cls.cache_key
+        assert self.mock_sess.commit.call_count == 0
+
     def test_calculate_payoff_method(self):
         mock_m = Mock()
         with patch('%s.calculate_payoffs' % pbm) as mock_calc:
@@ -333,8 +590,8 @@ class TestAdbCompoundedDaily(object):
             (date(2017, 1, 1) + timedelta(days=365))
         )
         assert res == {
-            'end_balance': Decimal('110.5487464695276899243379188'),
-            'interest_paid': Decimal('10.54874567794529906536521621')
+            'end_balance': Decimal('110.5487464695276899243379176'),
+            'interest_paid': Decimal('10.54874567794529906536521613')
         }
 
     def test_calculate_transactions(self):
@@ -350,8 +607,8 @@ class TestAdbCompoundedDaily(object):
             }
         )
         assert res == {
-            'end_balance': Decimal('107.5420752170470026908058809'),
-            'interest_paid': Decimal('7.542074651086492634526111808')
+            'end_balance': Decimal('107.5420752170470026908058800'),
+            'interest_paid': Decimal('7.542074651086492634526111762')
         }
 
 
@@ -394,6 +651,140 @@ class TestSimpleInterest(object):
         }
 
 
+class ReferenceAdbCompoundedDaily(AdbCompoundedDaily):
+    """
+    Original day-by-day implementation of AdbCompoundedDaily.calculate, used
+    to validate the closed-form kernel.
+    """
+
+    def calculate(self, principal, first_d, last_d, transactions={}):
+        dpr = self._apr / Decimal(365.0)
+        num_days = 0
+        bal_total = Decimal(0.0)
+        bal = principal
+        d = first_d
+        while d <= last_d:
+            num_days += 1
+            if d in transactions:
+                bal += transactions[d]
+            bal += bal * dpr
+            bal_total += bal
+            d += timedelta(days=1)
+        adb = bal_total / Decimal(num_days)
+        final = adb * self._apr * num_days / Decimal(365.0)
+        bal += final * dpr
+        return {
+            'interest_paid': final,
+            'end_balance': bal
+        }
+
+
+class ReferenceSimpleInterest(SimpleInterest):
+    """
+    Original day-by-day implementation of SimpleInterest.calculate, used to
+    validate the closed-form kernel.
+    """
+
+    def calculate(self, principal, first_d, last_d, transactions={}):
+        num_days = 0
+        bal = principal
+        d = first_d
+        while d <= last_d:
+            num_days += 1
+            if d in transactions:
+                bal += transactions[d]
+            d += timedelta(days=1)
+        final = bal * self._apr * num_days / Decimal(365.0)
+        return {
+            'interest_paid': final,
+            'end_balance': bal + final
+        }
+
+
+def cents(d):
+    return {k: v.quantize(Decimal('0.01')) for k, v in d.items()}
+
+
+class TestInterestKernelValidation(object):
+    """
+    Validate that the closed-form interest kernels agree to the cent with the
+    original day-by-day implementations.
+    """
+
+    def _cases(self):
+        rand = Random(8675309)
+        cases = []
+        for apr in ['0.0000', '0.0100', '0.1499', '0.2499', '0.2999']:
+            for principal in ['0.00', '0.01', '952.06', '5498.65',
+                              '-120.00', '23456.78']:
+                for num_days in [1, 2, 28, 31]:
+                    first_d = date(2017, 1, 1) + timedelta(
+                        days=rand.randint(0, 3000)
+                    )
+                    last_d = first_d + timedelta(days=num_days - 1)
+                    trans = {}
+                    for _ in range(rand.randint(0, 4)):
+                        d = first_d + timedelta(
+                            days=rand.randint(-3, num_days + 2)
+                        )
+                        trans[d] = Decimal(
+                            rand.randint(-300000, 300000)
+                        ) / Decimal('100')
+                    cases.append((
+                        Decimal(apr), Decimal(principal), first_d, last_d,
+                        trans
+                    ))
+        return cases
+
+    def test_adb_compounded_daily(self):
+        for apr, principal, first_d, last_d, trans in self._cases():
+            expected = ReferenceAdbCompoundedDaily(apr).calculate(
+                principal, first_d, last_d, transactions=trans
+            )
+            res = AdbCompoundedDaily(apr).calculate(
+                principal, first_d, last_d, transactions=trans
+            )
+            assert cents(res) == cents(expected)
+
+    def test_simple_interest(self):
+        for apr, principal, first_d, last_d, trans in self._cases():
+            expected = ReferenceSimpleInterest(apr).calculate(
+                principal, first_d, last_d, transactions=trans
+            )
+            res = SimpleInterest(apr).calculate(
+                principal, first_d, last_d, transactions=trans
+            )
+            assert res == expected
+
+    def test_payoffs(self):
+        for cls, ref_cls, mpc in [
+            (AdbCompoundedDaily, ReferenceAdbCompoundedDaily, MinPaymentAmEx),
+            (SimpleInterest, ReferenceSimpleInterest, MinPaymentCiti)
+        ]:
+            for apr, principal in [
+                ('0.0100', '952.06'), ('0.1000', '5498.65'),
+                ('0.2499', '12345.67')
+            ]:
+                res = []
+                for icls in [cls, ref_cls]:
+                    stmt = CCStatement(
+                        icls(Decimal(apr)),
+                        Decimal(principal),
+                        mpc(),
+                        _BillingPeriod(date(2017, 7, 31)),
+                        transactions={},
+                        end_balance=Decimal(principal),
+                        interest_amt=Decimal('0.00')
+                    )
+                    res.append([
+                        (months, amt.quantize(Decimal('0.01')), first)
+                        for months, amt, first in calculate_payoffs(
+                            FixedPaymentMethod(Decimal('500.00')), [stmt]
+                        )
+                    ])
+                assert res[0] == res[1]
+
+
 class TestBillingPeriod(object):
 
     def test_init(self):
@@ -1071,6 +1462,136 @@ class TestCalculatePayoffs(object):
         ]
 
 
+class TestPayoffSimulation(object):
+
+    def setup(self):
+        self.stmts = [
+            CCStatement(
+                AdbCompoundedDaily(Decimal('0.1999')),
+                Decimal('952.06'),
+                MinPaymentAmEx(),
+                _BillingPeriod(date(2017, 7, 31)),
+                end_balance=Decimal('952.06'),
+                interest_amt=Decimal('16.25')
+            ),
+            CCStatement(
+                SimpleInterest(Decimal('0.0999')),
+                Decimal('5498.65'),
+                MinPaymentDiscover(),
+                _BillingPeriod(date(2017, 7, 31)),
+                end_balance=Decimal('5498.65'),
+                interest_amt=Decimal('28.53')
+            )
+        ]
+
+    def test_simulated_statement(self):
+        sim = PayoffSimulation(self.stmts)
+        view = sim._views[1]
+        assert isinstance(view, _SimulatedStatement)
+        assert view.principal == Decimal('5498.65')
+        assert view.interest == Decimal('28.53')
+        assert view.apr == Decimal('0.0999')
+        # both statements have the same billing cycle, so share a chain
+        assert view.billing_period is self.stmts[0].billing_period
+        assert sim._chains[0] is sim._chains[1]
+        assert view.start_date == date(2017, 7, 1)
+        assert view.end_date == date(2017, 7, 31)
+        assert view.minimum_payment == self.stmts[1].minimum_payment
+        sim._advance(1, Decimal('-200.00'))
+        expected = self.stmts[1].pay(Decimal('-200.00'))
+        assert view.principal == expected.principal
+        assert view.interest == expected.interest
+        assert view.start_date == date(2017, 8, 1)
+        assert view.end_date == date(2017, 8, 31)
+        assert view.minimum_payment == expected.minimum_payment
+        assert sim._views[0].start_date == date(2017, 7, 1)
+
+    def test_run(self):
+        sim = PayoffSimulation(self.stmts)
+        meth = HighestInterestRateFirstMethod(Decimal('300.00'))
+        res = sim.run(meth)
+        assert res == [
+            (6, Decimal('993.6416959843668472254435797'), Decimal('190.0270')),
+            (
+                25, Decimal('6136.074061973042682155596063'),
+                Decimal('109.9730')
+            )
+        ]
+        # runs start over from the initial statements
+        assert sim.run(meth) == res
+        assert sim._views[0].principal != Decimal('952.06')
+        sim._reset()
+        assert sim._views[0].principal == Decimal('952.06')
+        assert sim._views[0].start_date == date(2017, 7, 1)
+
+    def test_run_negative_principal(self):
+        self.stmts[0]._principal = Decimal('-10.00')
+        res = PayoffSimulation(self.stmts).run(
+            MinPaymentMethod()
+        )
+        assert res[0] == (0, Decimal('0.0'), Decimal('0.0'))
+        assert res[1][0] > 0
+
+
+class TestBillingPeriodCalendar(object):
+
+    def test_chain_for(self):
+        cal = BillingPeriodCalendar()
+        bp1 = _BillingPeriod(date(2017, 7, 31))
+        bp2 = _BillingPeriod(date(2017, 7, 20))
+        bp3 = _BillingPeriod(date(2017, 7, 10))
+        chain = cal.chain_for(bp1)
+        assert isinstance(chain, _BillingPeriodChain)
+        assert cal.chain_for(bp2) is chain
+        assert cal.chain_for(bp3) is not chain
+        assert chain.periods == [bp1]
+        assert len(chain) == 1
+
+    def test_extend_to(self):
+        bp = _BillingPeriod(date(2017, 12, 20))
+        chain = _BillingPeriodChain(bp)
+        chain.extend_to(3)
+        assert len(chain) == 4
+        assert chain.periods[0] is bp
+        expected = bp
+        for idx in range(0, 4):
+            assert chain.start_dates[idx] == expected.start_date
+            assert chain.end_dates[idx] == expected.end_date
+            assert chain.payment_dates[idx] == expected.payment_date
+            assert chain.periods[idx].start_date == expected.start_date
+            expected = expected.next_period
+        assert chain.start_dates[2] == date(2018, 2, 1)
+        assert chain.end_dates[2] == date(2018, 2, 28)
+        last = chain.periods[3]
+        chain.extend_to(2)
+        assert len(chain) == 4
+        assert chain.periods[3] is last
+
+    def test_shared_across_simulations(self):
+        cal = BillingPeriodCalendar()
+        stmt = CCStatement(
+            AdbCompoundedDaily(Decimal('0.1999')),
+            Decimal('952.06'),
+            MinPaymentAmEx(),
+            _BillingPeriod(date(2017, 7, 31)),
+            end_balance=Decimal('952.06'),
+            interest_amt=Decimal('16.25')
+        )
+        res = calculate_payoffs(MinPaymentMethod(), [stmt], calendar=cal)
+        assert res == calculate_payoffs(MinPaymentMethod(), [stmt])
+        chain = cal.chain_for(stmt.billing_period)
+        assert len(chain) == res[0][0]
+        periods = list(chain.periods)
+        with patch.object(
+            _BillingPeriod, 'next_period', new_callable=PropertyMock
+        ) as mock_next:
+            assert calculate_payoffs(
+                MinPaymentMethod(), [stmt], calendar=cal
+            ) == res
+        assert mock_next.call_count == 0
+        assert chain.periods == periods
+
+
 class TestModuleConstants(object):
 
     def test_interest(self):
@@ -1175,7 +1696,7 @@ class TestAcceptanceData(object):
             [self.stmt_cc_one]
         )
         assert res == [
-            (28, Decimal('962.9988625702411101133192793'), Decimal('35'))
+            (28, Decimal('962.9988625702411101133192805'), Decimal('35'))
         ]
 
     def test_cc_two_pay_min(self):
@@ -1186,7 +1707,7 @@ class TestAcceptanceData(object):
         assert res == [
             (
                 162,
-                Decimal('8664.861877369277471400473622'),
+                Decimal('8664.861877369277471400473648'),
                 Decimal('109.9730')
             )
         ]
@@ -1202,8 +1723,8 @@ class TestAcceptanceData(object):
             [self.stmt_cc_one, self.stmt_cc_two]
         )
         assert res == [
-            (28, Decimal('962.9988625702411101133192793'), Decimal('35')),
-            (162, Decimal('8664.861877369277471400473622'), Decimal('109.9730'))
+            (28, Decimal('962.9988625702411101133192805'), Decimal('35')),
+            (162, Decimal('8664.861877369277471400473648'), Decimal('109.9730'))
         ]
 
     def test_combined_pay_lowest_ir(self):
@@ -1212,8 +1733,8 @@ class TestAcceptanceData(object):
             [self.stmt_cc_one, self.stmt_cc_two]
         )
         assert res == [
-            (21, Decimal('960.9178327498502165965138131'), Decimal('35')),
-            (56, Decimal('6988.237124948955044765363412'), Decimal('109.9730'))
+            (21, Decimal('960.9178327498502165965138139'), Decimal('35')),
+            (56, Decimal('6988.237124948955044765363427'), Decimal('109.9730'))
         ]
 
     def test_combined_pay_lowest_bal(self):
@@ -1222,8 +1743,8 @@ class TestAcceptanceData(object):
             [self.stmt_cc_one, self.stmt_cc_two]
         )
         assert res == [
-            (21, Decimal('960.9178327498502165965138131'), Decimal('35')),
-            (56, Decimal('6988.237124948955044765363412'), Decimal('109.9730'))
+            (21, Decimal('960.9178327498502165965138139'), Decimal('35')),
+            (56, Decimal('6988.237124948955044765363427'), Decimal('109.9730'))
         ]
 
     def test_combined_pay_highest_ir(self):
@@ -1232,8 +1753,8 @@ class TestAcceptanceData(object):
             [self.stmt_cc_one, self.stmt_cc_two]
         )
         assert res == [
-            (28, Decimal('962.9988625702411101133192793'), Decimal('35')),
-            (55, Decimal('6956.345228060182432444990377'), Decimal('109.9730'))
+            (28, Decimal('962.9988625702411101133192805'), Decimal('35')),
+            (55, Decimal('6956.345228060182432444990378'), Decimal('109.9730'))
         ]
 
     def test_combined_pay_highest_bal(self):
@@ -1242,8 +1763,8 @@ class TestAcceptanceData(object):
             [self.stmt_cc_one, self.stmt_cc_two]
         )
         assert res == [
-            (28, Decimal('962.9988625702411101133192793'), Decimal('35')),
-            (55, Decimal('6956.345228060182432444990377'), Decimal('109.9730'))
+            (28, Decimal('962.9988625702411101133192805'), Decimal('35')),
+            (55, Decimal('6956.345228060182432444990378'), Decimal('109.9730'))
         ]
 
 
@@ -0,0 +1,236 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+import sys
+import json
+
+from biweeklybudget.ofx_reclassify import (
+    OFXReclassifier, reclassify_progress, start_background_reclassify,
+    _run_background_reclassify
+)
+from biweeklybudget.models.dbsetting import DBSetting
+
+# https://code.google.com/p/mock/issues/detail?id=249
+# py>=3.4 should use unittest.mock not the mock package on pypi
+if (
+        sys.version_info[0] < 3 or
+        sys.version_info[0] == 3 and sys.version_info[1] < 4
+):
+    from mock import Mock, MagicMock, patch, call  # noqa
+else:
+    from unittest.mock import Mock, MagicMock, patch, call  # noqa
+
+pbm = 'biweeklybudget.ofx_reclassify'
+pb = '%s.OFXReclassifier' % pbm
+
+FIELDS = [
+    'is_interest_charge', 'is_interest_payment', 'is_late_fee',
+    'is_other_fee', 'is_payment'
+]
+
+
+def row(fitid, name, *flags):
+    d = {'fitid': fitid, 'name': name}
+    d.update(dict(zip(FIELDS, flags)))
+    return d
+
+
+class TestOFXReclassifier(object):
+
+    def setup(self):
+        self.cls = OFXReclassifier(3, {
+            're_interest_charge': '^interest',
+            're_interest_paid': None,
+            're_payment': '^payment',
+            're_late_fee': '^late fee',
+            're_other_fee': None
+        }, chunk_size=3)
+        self.conn = Mock()
+
+    def test_process_chunk(self):
+        self.conn.execute.return_value.fetchall.return_value = [
+            row('a', 'Payment', False, False, False, False, True),
+            row('b', 'Payment 2', False, False, False, False, None),
+            row('c', 'Interest', False, False, False, False, True),
+            row('d', 'Late Fee', False, False, False, False, False),
+            row('e', 'Late fee 2', False, False, False, False, False)
+        ]
+        res = self.cls._process_chunk(self.conn, 'x')
+        assert res == ('e', 5, 4)
+        # 1 select plus one update each for payment, interest and late fee
+        assert self.conn.execute.call_count == 4
+        sel = self.conn.execute.mock_calls[0][1][0]
+        assert 'ofx_trans.fitid > :fitid_1' in str(sel)
+        assert 'LIMIT :param_1' in str(sel)
+        updates = {}
+        for kall in self.conn.execute.mock_calls[2:]:
+            stmt = kall[1][0]
+            params = stmt.compile().params
+            fitids = tuple(sorted(
+                v for k, v in params.items() if k.startswith('fitid')
+            ))
+            updates[fitids] = {k: params[k] for k in FIELDS}
+        assert updates == {
+            ('b',): {
+                'is_interest_charge': False, 'is_interest_payment': False,
+                'is_late_fee': False, 'is_other_fee': False,
+                'is_payment': True
+            },
+            ('c',): {
+                'is_interest_charge': True, 'is_interest_payment': False,
+                'is_late_fee': False, 'is_other_fee': False,
+                'is_payment': False
+            },
+            ('d', 'e'): {
+                'is_interest_charge': False, 'is_interest_payment': False,
+                'is_late_fee': True, 'is_other_fee': False,
+                'is_payment': False
+            }
+        }
+
+    def test_process_chunk_empty(self):
+        self.conn.execute.return_value.fetchall.return_value = []
+        assert self.cls._process_chunk(self.conn, None) == (None, 0, 0)
+        assert 'fitid >' not in str(self.conn.execute.mock_calls[0][1][0])
+
+    def test_run(self):
+        progress = Mock()
+        with patch('%s.count' % pb) as m_count:
+            m_count.return_value = 5
+            with patch('%s._process_chunk' % pb) as m_chunk:
+                m_chunk.side_effect = [('c', 3, 1), ('e', 2, 2), (None, 0, 0)]
+                res = self.cls.run(self.conn, progress_callback=progress)
+        assert res == (5, 3)
+        assert m_chunk.mock_calls == [
+            call(self.conn, None), call(self.conn, 'c'), call(self.conn, 'e')
+        ]
+        assert progress.mock_calls == [call(3, 5, 1), call(5, 5, 3)]
+        assert self.conn.mock_calls == []
+
+    def test_run_transaction_per_chunk(self):
+        conn = MagicMock()
+        with patch('%s.count' % pb) as m_count:
+            m_count.return_value = 3
+            with patch('%s._process_chunk' % pb) as m_chunk:
+                m_chunk.side_effect = [('c', 3, 1), (None, 0, 0)]
+                res = self.cls.run(conn, transaction_per_chunk=True)
+        assert res == (3, 1)
+        assert conn.begin.call_count == 2
+
+
+class TestBackground(object):
+
+    def test_reclassify_progress(self):
+        m_sess = Mock()
+        m_sess.query.return_value.get.return_value = DBSetting(
+            name='ofx-reclassify-3', value='{"done": true}'
+        )
+        assert reclassify_progress(m_sess, 3) == {'done': True}
+        assert m_sess.mock_calls == [
+            call.query(DBSetting), call.query().get('ofx-reclassify-3')
+        ]
+
+    def test_reclassify_progress_none(self):
+        m_sess = Mock()
+        m_sess.query.return_value.get.return_value = None
+        assert reclassify_progress(m_sess, 3) is None
+
+    def test_start(self):
+        m_bind = Mock()
+        with patch('%s.threading.Thread' % pbm) as m_thread:
+            res = start_background_reclassify(m_bind, 3)
+        assert m_thread.mock_calls == [
+            call(
+                target=_run_background_reclassify, args=(m_bind, 3, 1000),
+                name='ofx-reclassify-3'
+            ),
+            call().start()
+        ]
+        assert m_thread.return_value.daemon is True
+        assert res is m_thread.return_value
+
+    def run_background(self, run_effect=None):
+        m_bind = MagicMock()
+        conn = m_bind.connect.return_value.__enter__.return_value
+        progress = []
+
+        def se_set(c, name, value):
+            progress.append((name, json.loads(value)))
+
+        def se_run(self, conn, progress_callback=None, **kwargs):
+            if run_effect is not None:
+                raise run_effect
+            progress_callback(2, 4, 1)
+            progress_callback(4, 4, 2)
+
+        with patch('%s.DBSetting' % pbm) as m_setting:
+            m_setting.set_value.side_effect = se_set
+            with patch('%s.regexes_for_account' % pb) as m_re:
+                m_re.return_value = {}
+                with patch('%s.run' % pb, autospec=True) as m_run:
+                    m_run.side_effect = se_run
+                    _run_background_reclassify(m_bind, 3, 2)
+        assert m_setting.increment_counter.mock_calls == [
+            call(conn, 'data-generation')
+        ]
+        return progress
+
+    def test_run_background(self):
+        assert self.run_background() == [
+            ('ofx-reclassify-3', {
+                'total': None, 'processed': 0, 'changed': 0, 'done': False,
+                'error': None
+            }),
+            ('ofx-reclassify-3', {
+                'total': 4, 'processed': 2, 'changed': 1, 'done': False,
+                'error': None
+            }),
+            ('ofx-reclassify-3', {
+                'total': 4, 'processed': 4, 'changed': 2, 'done': False,
+                'error': None
+            }),
+            ('ofx-reclassify-3', {
+                'total': 4, 'processed': 4, 'changed': 2, 'done': True,
+                'error': None
+            })
+        ]
+
+    def test_run_background_error(self):
+        res = self.run_background(run_effect=RuntimeError('foo'))
+        assert res[-1] == ('ofx-reclassify-3', {
+            'total': None, 'processed': 0, 'changed': 0, 'done': True,
+            'error': 'foo'
+        })
@@ -0,0 +1,298 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import sys
+from datetime import date, timedelta
+from decimal import Decimal
+from concurrent.futures import Future
+from sqlalchemy.orm.session import Session
+import pytest
+
+from biweeklybudget.interest import (
+    InterestHelper, PayoffSimulation, LowestBalanceFirstMethod
+)
+from biweeklybudget.models.account import Account, AcctType
+from biweeklybudget.models.account_balance import AccountBalance
+from biweeklybudget.utils import dtnow
+
+# https://code.google.com/p/mock/issues/detail?id=249
+# py>=3.4 should use unittest.mock not the mock package on pypi
+if (
+        sys.version_info[0] < 3 or
+        sys.version_info[0] == 3 and sys.version_info[1] < 4
+):
+    from mock import Mock, patch, call
+else:
+    from unittest.mock import Mock, patch, call
+
+np = pytest.importorskip('numpy')
+
+from biweeklybudget.payoff_risk import (  # noqa
+    PayoffRiskSimulation, _min_payments, PERCENTILES, main
+)
+
+pbm = 'biweeklybudget.payoff_risk'
+
+
+def mock_account(acct_id, apr, interest_cls, min_cls, ledger,
+                 prime_rate_margin=None):
+    return Mock(
+        spec_set=Account,
+        id=acct_id,
+        acct_type=AcctType.Credit,
+        is_active=True,
+        apr=Decimal(apr),
+        effective_apr=Decimal(apr),
+        interest_class_name=interest_cls,
+        min_payment_class_name=min_cls,
+        balance=Mock(
+            spec_set=AccountBalance,
+            ledger=Decimal(ledger),
+            ledger_date=(dtnow() - timedelta(hours=13))
+        ),
+        prime_rate_margin=prime_rate_margin
+    )
+
+
+class TestPayoffRiskSimulation(object):
+
+    def setup(self):
+        accts = [
+            mock_account(
+                3, '0.0100', 'AdbCompoundedDaily', 'MinPaymentAmEx',
+                '-952.06'
+            ),
+            mock_account(
+                4, '0.1000', 'AdbCompoundedDaily', 'MinPaymentDiscover',
+                '-5498.65', prime_rate_margin=Decimal('0.05')
+            ),
+            mock_account(
+                5, '0.2000', 'SimpleInterest', 'MinPaymentCiti', '-1200.00'
+            )
+        ]
+        self.mock_sess = Mock(spec_set=Session)
+        self.mock_sess.query.return_value.filter.return_value.all.\
+            return_value = accts
+        # last interest charges query
+        self.mock_sess.query.return_value.join.return_value.filter.\
+            return_value.order_by.return_value.all.return_value = [
+                (3, Decimal('-0.8089')), (4, Decimal('-46.9061')),
+                (5, Decimal('-20.00'))
+            ]
+        self.ih = InterestHelper(
+            self.mock_sess,
+            increases={date(2017, 9, 1): Decimal('400.00')},
+            onetimes={date(2017, 11, 20): Decimal('1000.00')}
+        )
+
+    def fixed_sim(self):
+        return PayoffRiskSimulation(
+            self.ih, spending_mean=Decimal('0'),
+            prime_change_prob=Decimal('0'), skip_increase_prob=Decimal('0')
+        )
+
+    def test_inputs(self):
+        inputs = self.fixed_sim().inputs
+        assert inputs['account_ids'] == [3, 4, 5]
+        assert inputs['principal'].tolist() == [952.06, 5498.65, 1200.0]
+        assert inputs['variable_apr'].tolist() == [False, True, False]
+        assert inputs['interest_kind'].tolist() == [0, 0, 1]
+        assert inputs['min_kind'].tolist() == [0, 1, 2]
+        assert inputs['n_days'].shape == (3, 600)
+        assert inputs['n_days'][0, :3].tolist() == [31, 30, 31]
+        assert inputs['pay_day'][0, :3].tolist() == [15, 14, 15]
+        assert inputs['inc_eligible'].shape == (3, 1, 600)
+        assert inputs['inc_eligible'][0, 0, :3].tolist() == [
+            False, False, True
+        ]
+        assert inputs['onetimes'].shape == (3, 600)
+        assert inputs['onetimes'][0, 5] == 1000.0
+        assert inputs['onetimes'][0].sum() == 1000.0
+        assert inputs['payment_dates'][0] == date(2017, 7, 16)
+
+    def test_unsupported_class(self):
+        self.ih._statements[4]._min_pay_cls = Mock()
+        with pytest.raises(TypeError):
+            self.fixed_sim().inputs
+
+    def test_min_payments(self):
+        bal = np.array([[100.0, 5000.0, 2000.0], [3000.0, 10.0, 10.0]])
+        intr = np.array([[1.0, 50.0, 20.0], [40.0, 0.0, 0.0]])
+        res = _min_payments(bal, intr, np.array([0, 1, 2]))
+        assert res.tolist() == [[35.0, 100.0, 40.0], [70.0, 35.0, 25.0]]
+
+    def test_no_randomness_matches_exact(self):
+        """
+        With all randomization disabled, every scenario should match the
+        exact Decimal payoff calculations to within a cent or so of interest.
+        """
+        exact = self.ih.calculate_payoffs()
+        res = self.fixed_sim().run(
+            num_scenarios=10, batch_size=4, seed=1, workers=1
+        )
+        assert sorted(res.keys()) == sorted(exact.keys())
+        for name, val in exact.items():
+            months = max(
+                r['payoff_months'] for r in val['results'].values()
+            )
+            interest = sum(
+                r['total_interest'] for r in val['results'].values()
+            )
+            assert res[name]['num_scenarios'] == 10
+            assert res[name]['num_failed'] == 0
+            assert sorted(res[name]['percentiles'].keys()) == PERCENTILES
+            for pct in res[name]['percentiles'].values():
+                assert pct['payoff_months'] == months
+                assert abs(pct['total_interest'] - interest) <= Decimal(
+                    '0.02'
+                )
+        assert res['MinPaymentMethod']['percentiles'][50][
+            'payoff_months'] == 162
+        assert res['HighestBalanceFirstMethod']['percentiles'][50][
+            'payoff_date'] == date(2019, 3, 16)
+
+    def test_first_card_paid_off_matches_exact(self):
+        """
+        Once the first card is paid off, the increase must be applied by the
+        period of the first unpaid card, as in the exact calculation.
+        """
+        acct3 = mock_account(
+            3, '0.1000', 'AdbCompoundedDaily', 'MinPaymentAmEx', '-300.00'
+        )
+        acct4 = mock_account(
+            4, '0.1000', 'AdbCompoundedDaily', 'MinPaymentDiscover',
+            '-3000.00'
+        )
+        # a billing period one month before acct3's
+        acct4.balance.ledger_date = dtnow() - timedelta(days=16)
+        self.mock_sess.query.return_value.filter.return_value.all.\
+            return_value = [acct3, acct4]
+        self.mock_sess.query.return_value.join.return_value.filter.\
+            return_value.order_by.return_value.all.return_value = [
+                (3, Decimal('-2.00')), (4, Decimal('-25.00'))
+            ]
+        # after acct3 is paid off; between the two cards' payment dates
+        ih = InterestHelper(
+            self.mock_sess, increases={date(2018, 5, 1): Decimal('300.00')}
+        )
+        exact = PayoffSimulation(
+            list(ih.statements.values()), calendar=ih.calendar
+        ).run(LowestBalanceFirstMethod(
+            sum(ih.min_payments.values()), increases=ih.increases
+        ))
+        assert [x[0] for x in exact] == [9, 20]
+        res = PayoffRiskSimulation(
+            ih, spending_mean=Decimal('0'), prime_change_prob=Decimal('0'),
+            skip_increase_prob=Decimal('0')
+        ).run(
+            method_names=['LowestBalanceFirstMethod'], num_scenarios=1,
+            seed=1, workers=1
+        )['LowestBalanceFirstMethod']
+        assert res['num_failed'] == 0
+        assert res['percentiles'][50]['payoff_months'] == 20
+        interest = sum(x[1] for x in exact) - Decimal('3300.00')
+        assert abs(
+            res['percentiles'][50]['total_interest'] - interest
+        ) <= Decimal('0.02')
+
+    def test_randomized(self):
+        sim = PayoffRiskSimulation(self.ih, spending_mean=Decimal('10.00'))
+        res = sim.run(
+            method_names=['HighestBalanceFirstMethod'], num_scenarios=200,
+            batch_size=64, seed=42, workers=1
+        )
+        r = res['HighestBalanceFirstMethod']
+        assert r['num_scenarios'] == 200
+        assert r['num_failed'] < 200
+        pcts = [r['percentiles'][p] for p in PERCENTILES]
+        assert pcts[0]['payoff_months'] >= 20
+        for a, b in zip(pcts, pcts[1:]):
+            assert a['payoff_months'] <= b['payoff_months']
+            assert a['total_interest'] <= b['total_interest']
+        # same seed, same results
+        assert sim.run(
+            method_names=['HighestBalanceFirstMethod'], num_scenarios=200,
+            batch_size=64, seed=42, workers=1
+        ) == res
+
+    def test_all_failed(self):
+        self.ih._increases = {}
+        sim = PayoffRiskSimulation(self.ih, spending_mean=Decimal('0'))
+        sim._max_periods = 5
+        res = sim.run(
+            method_names=['MinPaymentMethod'], num_scenarios=3, workers=1
+        )
+        assert res == {
+            'MinPaymentMethod': {
+                'num_scenarios': 3,
+                'num_failed': 3,
+                'percentiles': {}
+            }
+        }
+
+    def test_run_parallel_error(self):
+        def se_submit(func, *args):
+            f = Future()
+            f.set_exception(OSError('foo'))
+            return f
+
+        sim = self.fixed_sim()
+        serial = sim.run(num_scenarios=4, batch_size=2, seed=3, workers=1)
+        with patch('%s.ProcessPoolExecutor' % pbm) as mock_ppe:
+            mock_ppe.return_value.__enter__.return_value.submit.side_effect = \
+                se_submit
+            res = sim.run(num_scenarios=4, batch_size=2, seed=3, workers=3)
+        assert mock_ppe.mock_calls[0] == call(max_workers=3)
+        assert res == serial
+
+    def test_no_numpy(self):
+        with patch('%s.HAVE_NUMPY' % pbm, False):
+            with pytest.raises(RuntimeError):
+                PayoffRiskSimulation(self.ih)
+
+
+class TestMain(object):
+
+    def test_no_numpy(self, capsys):
+        with patch('%s.HAVE_NUMPY' % pbm, False):
+            with patch('%s.parse_args' % pbm) as mock_args:
+                with patch('%s.logging' % pbm):
+                    with pytest.raises(SystemExit) as excinfo:
+                        main()
+        assert excinfo.value.code == 1
+        assert mock_args.call_count == 1
+        assert 'pip install biweeklybudget[risk]' in capsys.readouterr().err
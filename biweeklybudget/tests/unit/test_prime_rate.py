@@ -0,0 +1,245 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+import sys
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from biweeklybudget.prime_rate import PrimeRateCalculator
+import biweeklybudget.prime_rate as prime_rate
+from biweeklybudget.models.dbsetting import DBSetting
+from biweeklybudget.models.prime_rate import PrimeRate
+from biweeklybudget.flaskapp.jsonencoder import MagicJSONEncoder
+from biweeklybudget.utils import dtnow
+from biweeklybudget.db_event_handlers import DATA_GENERATION_SETTING
+
+# https://code.google.com/p/mock/issues/detail?id=249
+# py>=3.4 should use unittest.mock not the mock package on pypi
+if (
+        sys.version_info[0] < 3 or
+        sys.version_info[0] == 3 and sys.version_info[1] < 4
+):
+    from mock import Mock, MagicMock, patch, call  # noqa
+else:
+    from unittest.mock import Mock, MagicMock, patch, call  # noqa
+
+pbm = 'biweeklybudget.prime_rate'
+pb = '%s.PrimeRateCalculator' % pbm
+
+
+def setting(value, age):
+    return DBSetting(
+        name='prime_rate',
+        value=json.dumps({
+            'value': value,
+            'date': dtnow() - age
+        }, cls=MagicJSONEncoder)
+    )
+
+
+class PrimeRateTester(object):
+
+    def setup(self):
+        PrimeRateCalculator.clear_cache()
+        self.mock_sess = Mock()
+        self.mock_sess.get_bind.return_value.url = 'mysql://db/budget'
+
+    def teardown(self):
+        PrimeRateCalculator.clear_cache()
+
+
+class TestPrimeRate(PrimeRateTester):
+
+    @patch('%s.settings.PRIME_RATE_CACHE_SECONDS' % pbm, 300)
+    def test_cached(self):
+        self.mock_sess.query.return_value.get.return_value = setting(
+            '0.0325', timedelta(hours=1)
+        )
+        with patch('%s._start_refresh' % pb, autospec=True) as m_refresh:
+            assert PrimeRateCalculator(
+                self.mock_sess
+            ).prime_rate == Decimal('0.0325')
+            assert PrimeRateCalculator(
+                self.mock_sess
+            ).prime_rate == Decimal('0.0325')
+        assert self.mock_sess.query.mock_calls == [
+            call(DBSetting), call().get('prime_rate')
+        ]
+        assert m_refresh.mock_calls == []
+
+    @patch('%s.settings.PRIME_RATE_CACHE_SECONDS' % pbm, 0)
+    def test_cache_expired(self):
+        self.mock_sess.query.return_value.get.return_value = setting(
+            '0.0325', timedelta(hours=1)
+        )
+        for _ in range(2):
+            assert PrimeRateCalculator(
+                self.mock_sess
+            ).prime_rate == Decimal('0.0325')
+        assert self.mock_sess.query.call_count == 2
+
+    @patch('%s.settings.PRIME_RATE_CACHE_SECONDS' % pbm, 300)
+    def test_cache_per_database(self):
+        self.mock_sess.query.return_value.get.return_value = setting(
+            '0.0325', timedelta(hours=1)
+        )
+        other_sess = Mock()
+        other_sess.get_bind.return_value.url = 'mysql://db/other'
+        other_sess.query.return_value.get.return_value = setting(
+            '0.0400', timedelta(hours=1)
+        )
+        assert PrimeRateCalculator(
+            self.mock_sess
+        ).prime_rate == Decimal('0.0325')
+        assert PrimeRateCalculator(
+            other_sess
+        ).prime_rate == Decimal('0.0400')
+
+    def test_no_stored_rate(self):
+        self.mock_sess.query.return_value.get.return_value = None
+        with patch(
+            '%s._rate_from_marketwatch' % pb, autospec=True
+        ) as m_rate:
+            m_rate.return_value = '3.25'
+            res = PrimeRateCalculator(self.mock_sess).prime_rate
+        assert res == Decimal('0.0325')
+        added = self.mock_sess.add.mock_calls[0][1][0]
+        assert added.name == 'prime_rate'
+        assert json.loads(added.value)['value'] == '0.0325'
+        hist = self.mock_sess.merge.mock_calls[0][1][0]
+        assert isinstance(hist, PrimeRate)
+        assert hist.date == dtnow().date()
+        assert hist.rate == Decimal('0.0325')
+        assert self.mock_sess.commit.call_count == 1
+        assert prime_rate._cache['mysql://db/budget']['rate'] == Decimal(
+            '0.0325'
+        )
+
+    @patch('%s.settings.PRIME_RATE_CACHE_SECONDS' % pbm, 300)
+    def test_stale_refreshes_in_background(self):
+        self.mock_sess.query.return_value.get.return_value = setting(
+            '0.0325', timedelta(hours=49)
+        )
+        with patch('%s.threading.Thread' % pbm) as m_thread:
+            with patch(
+                '%s._rate_from_marketwatch' % pb, autospec=True
+            ) as m_rate:
+                for _ in range(3):
+                    assert PrimeRateCalculator(
+                        self.mock_sess
+                    ).prime_rate == Decimal('0.0325')
+        assert m_rate.mock_calls == []
+        assert m_thread.mock_calls == [
+            call(
+                target=PrimeRateCalculator._refresh,
+                args=(
+                    self.mock_sess.get_bind.return_value,
+                    'mysql://db/budget'
+                ),
+                name='prime-rate-refresh'
+            ),
+            call().start()
+        ]
+        assert m_thread.return_value.daemon is True
+        assert prime_rate._refreshing == {'mysql://db/budget'}
+        prime_rate._refreshing.clear()
+
+
+class TestRefresh(PrimeRateTester):
+
+    def test_refresh(self):
+        prime_rate._refreshing.add('mysql://db/budget')
+        bind = MagicMock()
+        mock_conn = bind.connect.return_value.__enter__.return_value
+        with patch('%s.Session' % pbm) as m_session:
+            with patch('%s._get_prime_rate' % pb, autospec=True) as m_get:
+                with patch('%s.DBSetting.increment_counter' % pbm) as m_inc:
+                    PrimeRateCalculator._refresh(bind, 'mysql://db/budget')
+        assert m_session.mock_calls == [
+            call(bind=bind),
+            call().close()
+        ]
+        assert m_get.call_count == 1
+        assert m_get.mock_calls[0][1][0]._db_sess == m_session.return_value
+        assert m_inc.mock_calls == [
+            call(mock_conn, DATA_GENERATION_SETTING)
+        ]
+        assert mock_conn.mock_calls == [
+            call.begin(), call.begin().__enter__(),
+            call.begin().__exit__(None, None, None)
+        ]
+        assert prime_rate._refreshing == set()
+
+    def test_refresh_exception(self):
+        prime_rate._refreshing.add('mysql://db/budget')
+        with patch('%s.Session' % pbm) as m_session:
+            with patch('%s._get_prime_rate' % pb, autospec=True) as m_get:
+                m_get.side_effect = RuntimeError('foo')
+                with patch('%s.DBSetting.increment_counter' % pbm) as m_inc:
+                    PrimeRateCalculator._refresh(
+                        self.mock_sess.get_bind.return_value,
+                        'mysql://db/budget'
+                    )
+        assert m_session.mock_calls == [
+            call(bind=self.mock_sess.get_bind.return_value),
+            call().rollback(),
+            call().close()
+        ]
+        assert m_inc.mock_calls == []
+        assert prime_rate._refreshing == set()
+
+
+class TestCalculateApr(PrimeRateTester):
+
+    def test_calculate_apr(self):
+        self.mock_sess.query.return_value.get.return_value = setting(
+            '0.0325', timedelta(hours=1)
+        )
+        assert PrimeRateCalculator(self.mock_sess).calculate_apr(
+            Decimal('0.0150')
+        ) == Decimal('0.0475')
+
+    def test_rate_for_date(self):
+        with patch('%s.PrimeRate.rate_for_date' % pbm) as m_for_date:
+            m_for_date.return_value = Decimal('0.0350')
+            res = PrimeRateCalculator(self.mock_sess).rate_for_date(
+                dtnow().date()
+            )
+        assert res == Decimal('0.0350')
+        assert m_for_date.mock_calls == [
+            call(self.mock_sess, dtnow().date())
+        ]
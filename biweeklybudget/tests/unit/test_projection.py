@@ -0,0 +1,181 @@
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import sys
+from datetime import date
+from decimal import Decimal
+import pytest
+
+from biweeklybudget.projection import CashFlowProjection
+from biweeklybudget.models.scheduled_transaction import (
+    ScheduledTransaction, ScheduledOccurrence
+)
+
+# https://code.google.com/p/mock/issues/detail?id=249
+# py>=3.4 should use unittest.mock not the mock package on pypi
+if (
+        sys.version_info[0] < 3 or
+        sys.version_info[0] == 3 and sys.version_info[1] < 4
+):
+    from mock import Mock, patch
+else:
+    from unittest.mock import Mock, patch
+
+pbm = 'biweeklybudget.projection'
+pb = '%s.CashFlowProjection' % pbm
+
+
+class TestCashFlowProjection(object):
+
+    def setup(self):
+        self.mock_sess = Mock()
+        self.cls = CashFlowProjection(
+            self.mock_sess, num_periods=3, start_date=date(2017, 1, 5)
+        )
+        self.periods = [
+            (date(2017, 1, 1), date(2017, 1, 14)),
+            (date(2017, 1, 15), date(2017, 1, 28)),
+            (date(2017, 1, 29), date(2017, 2, 11))
+        ]
+
+    def test_init_invalid(self):
+        with pytest.raises(ValueError):
+            CashFlowProjection(self.mock_sess, num_periods=0)
+
+    def test_result_cached(self):
+        with patch('%s._calculate' % pb, autospec=True) as m_calc:
+            m_calc.return_value = {'foo': 'bar'}
+            assert self.cls.result == {'foo': 'bar'}
+            assert self.cls.result == {'foo': 'bar'}
+        assert m_calc.call_count == 1
+
+    def test_periods(self):
+        pp = Mock(start_date=date(2017, 1, 1), end_date=date(2017, 1, 14))
+        pp.next = Mock(
+            start_date=date(2017, 1, 15), end_date=date(2017, 1, 28)
+        )
+        pp.next.next = Mock(
+            start_date=date(2017, 1, 29), end_date=date(2017, 2, 11)
+        )
+        with patch('%s.BiweeklyPayPeriod' % pbm, autospec=True) as m_bpp:
+            m_bpp.period_for_date.return_value = pp
+            res = self.cls._periods()
+        assert res == self.periods
+        assert m_bpp.period_for_date.call_args[0] == (
+            date(2017, 1, 5), self.mock_sess
+        )
+
+    def test_calculate(self):
+        st_acct = Mock(
+            spec_set=ScheduledTransaction, account_id=1, budget_id=3,
+            amount=Decimal('10.00')
+        )
+        st_income = Mock(
+            spec_set=ScheduledTransaction, account_id=1, budget_id=2,
+            amount=Decimal('-100.00')
+        )
+        st_other = Mock(
+            spec_set=ScheduledTransaction, account_id=9, budget_id=4,
+            amount=Decimal('25.00')
+        )
+        occurrences = [
+            ScheduledOccurrence(date(2017, 1, 1), 0, st_acct),
+            ScheduledOccurrence(date(2017, 1, 16), 1, st_income),
+            ScheduledOccurrence(date(2017, 1, 20), 1, st_other),
+            ScheduledOccurrence(date(2017, 2, 1), 2, st_acct)
+        ]
+        future = [
+            (date(2017, 1, 10), 1, Decimal('5.00')),
+            (date(2017, 1, 30), 1, Decimal('1.00')),
+            (date(2017, 2, 11), 9, Decimal('7.00'))
+        ]
+        with patch('%s._periods' % pb, autospec=True) as m_periods:
+            with patch('%s._starting_balances' % pb, autospec=True) as m_sb:
+                with patch(
+                    '%s._future_transactions' % pb, autospec=True
+                ) as m_ft:
+                    with patch(
+                        '%s.ScheduledTransaction.expand' % pbm
+                    ) as m_expand:
+                        m_periods.return_value = self.periods
+                        m_sb.return_value = (
+                            {1: 'A1'},
+                            {1: Decimal('100.00')},
+                            {3: 'B3'},
+                            {3: Decimal('50.00')}
+                        )
+                        m_ft.return_value = future
+                        m_expand.return_value = occurrences
+                        res = self.cls._calculate()
+        assert m_ft.call_args[0][1:] == (
+            date(2017, 1, 5), date(2017, 2, 11)
+        )
+        assert m_expand.call_args[0] == (self.mock_sess, self.periods)
+        assert res == {
+            'accounts': {1: 'A1'},
+            'budgets': {3: 'B3'},
+            'starting_balances': {
+                'accounts': {1: Decimal('100.00')},
+                'budgets': {3: Decimal('50.00')}
+            },
+            'periods': [
+                {
+                    'start_date': date(2017, 1, 1),
+                    'end_date': date(2017, 1, 14),
+                    'accounts': {1: Decimal('85.00')},
+                    'budgets': {3: Decimal('40.00')},
+                    'accounts_total': Decimal('85.00'),
+                    'budgets_total': Decimal('40.00')
+                },
+                {
+                    'start_date': date(2017, 1, 15),
+                    'end_date': date(2017, 1, 28),
+                    'accounts': {1: Decimal('185.00')},
+                    'budgets': {3: Decimal('40.00')},
+                    'accounts_total': Decimal('185.00'),
+                    'budgets_total': Decimal('40.00')
+                },
+                {
+                    'start_date': date(2017, 1, 29),
+                    'end_date': date(2017, 2, 11),
+                    'accounts': {1: Decimal('174.00')},
+                    'budgets': {3: Decimal('30.00')},
+                    'accounts_total': Decimal('174.00'),
+                    'budgets_total': Decimal('30.00')
+                }
+            ]
+        }
@@ -0,0 +1,337 @@
+#!/usr/bin/env python
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+
+import os
+import sys
+import json
+import logging
+import argparse
+import platform
+import timeit
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from random import Random
+from unittest.mock import Mock, patch
+
+from sqlalchemy.orm.session import Session
+
+# settings are required for import, but this never connects to a database
+os.environ.setdefault(
+    'SETTINGS_MODULE', 'biweeklybudget.tests.fixtures.test_settings'
+)
+
+from biweeklybudget.version import VERSION  # noqa
+from biweeklybudget.interest import (  # noqa
+    InterestHelper, AdbCompoundedDaily, BillingPeriodCalendar,
+    PAYOFF_METHOD_NAMES, calculate_payoffs
+)
+from biweeklybudget.models.account import Account, AcctType  # noqa
+from biweeklybudget.models.account_balance import AccountBalance  # noqa
+from biweeklybudget.utils import dtnow  # noqa
+
+#: Default numbers of cards in the synthetic portfolios.
+DEFAULT_SIZES = [1, 5, 10, 25, 50]
+
+#: Minimum payment formulas assigned to the synthetic cards.
+MIN_PAYMENT_CLASSES = ['MinPaymentAmEx', 'MinPaymentDiscover', 'MinPaymentCiti']
+
+
+def synthetic_accounts(num_cards, rng):
+    """
+    Return a list of ``num_cards`` mock credit :py:class:`~.Account` objects,
+    with random balances, APRs and minimum payment formulas.
+
+    :param num_cards: number of cards
+    :type num_cards: int
+    :param rng: random number generator
+    :type rng: random.Random
+    :rtype: list
+    """
+    res = []
+    for idx in range(num_cards):
+        bal = Decimal(rng.randint(50000, 1500000)) / Decimal('100')
+        apr = Decimal(rng.randint(500, 2999)) / Decimal('10000')
+        res.append(Mock(
+            spec_set=Account,
+            id=idx + 1,
+            name='Card%d' % (idx + 1),
+            acct_type=AcctType.Credit,
+            is_active=True,
+            apr=apr,
+            effective_apr=apr,
+            prime_rate_margin=None,
+            interest_class_name='AdbCompoundedDaily',
+            min_payment_class_name=rng.choice(MIN_PAYMENT_CLASSES),
+            balance=Mock(
+                spec_set=AccountBalance,
+                ledger=(bal * Decimal('-1')),
+                ledger_date=(dtnow() - timedelta(hours=13))
+            ),
+            last_interest_charge=(
+                bal * apr * Decimal('31') / Decimal('365')
+            ).quantize(Decimal('.01'))
+        ))
+    return res
+
+
+def mock_session(accounts):
+    """
+    Return a mock database session that returns ``accounts`` for the
+    :py:class:`~.InterestHelper` credit account query (and their
+    ``last_interest_charge`` for the interest charge query), and ``None`` for
+    every :py:class:`~.DBSetting` lookup (so payoff results are never
+    cached).
+
+    :param accounts: list of mock accounts
+    :type accounts: list
+    :rtype: Mock
+    """
+    sess = Mock(spec_set=Session)
+    sess.query.return_value.filter.return_value.all.return_value = accounts
+    # Account.last_interest_charges() query
+    sess.query.return_value.filter.return_value.order_by.return_value.all.\
+        return_value = [
+            (a.id, a.last_interest_charge * -1) for a in accounts
+        ]
+    sess.query.return_value.get.return_value = None
+    return sess
+
+
+def time_call(func, number, repeat):
+    """
+    Return the best of ``repeat`` timings of ``number`` calls to ``func``, in
+    seconds per call.
+
+    :rtype: float
+    """
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def bench_adb(number, repeat):
+    """
+    Time one :py:meth:`~.AdbCompoundedDaily.calculate` call for a 31-day
+    billing period with two transactions.
+
+    :rtype: float
+    """
+    cls = AdbCompoundedDaily(Decimal('0.2399'))
+    start = date(2017, 7, 1)
+    end = date(2017, 7, 31)
+    trans = {
+        date(2017, 7, 10): Decimal('150.00'),
+        date(2017, 7, 16): Decimal('-500.00')
+    }
+    return time_call(
+        lambda: cls.calculate(Decimal('5432.10'), start, end, trans),
+        number * 100, repeat
+    )
+
+
+def bench_payoffs(sess, number, repeat):
+    """
+    Time :py:func:`~.calculate_payoffs` for every payoff method shown in the
+    UI, with a new billing period calendar for each call (as for each
+    :py:class:`~.InterestHelper`). Payoff methods other than
+    :py:class:`~.MinPaymentMethod` pay 125% of the sum of minimum payments.
+
+    :return: dict of payoff method name to seconds per call
+    :rtype: dict
+    """
+    ih = InterestHelper(sess, workers=1)
+    statements = [ih._statements[k] for k in sorted(ih._statements.keys())]
+    max_total = sum(ih.min_payments.values()) * Decimal('1.25')
+    res = {}
+    for name in sorted(PAYOFF_METHOD_NAMES.keys()):
+        klass = PAYOFF_METHOD_NAMES[name]['cls']
+        if not klass.show_in_ui:
+            continue
+        meth = klass(max_total)
+        res[name] = time_call(
+            lambda: calculate_payoffs(
+                meth, statements, BillingPeriodCalendar()
+            ),
+            number, repeat
+        )
+    return res
+
+
+def bench_view(sess, number, repeat):
+    """
+    Time a full GET of the credit payoffs view (:py:class:`~.CreditPayoffsView`
+    including template rendering), with notifications disabled and the
+    payoff results cache always missing.
+
+    :rtype: float
+    """
+    # importing the Flask app initializes the database, which we don't have
+    with patch('biweeklybudget.db.init_db'):
+        from biweeklybudget.flaskapp.app import app
+        from biweeklybudget.flaskapp.views.credit_payoffs import (
+            CreditPayoffsView
+        )
+    view = CreditPayoffsView()
+    pb = 'biweeklybudget.flaskapp'
+    with app.test_request_context('/accounts/credit-payoff'):
+        with patch('%s.views.credit_payoffs.db_session' % pb, sess):
+            with patch('%s.context_processors.NotificationsController' % pb):
+                with patch('biweeklybudget.interest.settings.PAYOFF_WORKERS',
+                           1):
+                    return time_call(view.get, number, repeat)
+
+
+def run_benchmarks(sizes, number, repeat, seed):
+    """
+    Run all benchmarks and return a result dict suitable for serializing to
+    JSON. Results are in seconds per call, keyed by benchmark name.
+
+    :rtype: dict
+    """
+    rng = Random(seed)
+    results = {'AdbCompoundedDaily.calculate': bench_adb(number, repeat)}
+    for size in sizes:
+        sess = mock_session(synthetic_accounts(size, rng))
+        for name, t in bench_payoffs(sess, number, repeat).items():
+            results['calculate_payoffs[%s, %02d cards]' % (name, size)] = t
+        results['CreditPayoffsView.get[%02d cards]' % size] = bench_view(
+            sess, number, repeat
+        )
+    return {
+        'meta': {
+            'biweeklybudget_version': VERSION,
+            'python_version': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': datetime.now().isoformat(),
+            'seed': seed,
+            'number': number,
+            'repeat': repeat,
+            'sizes': sizes
+        },
+        'results': results
+    }
+
+
+def compare(baseline, current, threshold):
+    """
+    Compare two benchmark result dicts. Return a list of (benchmark name,
+    baseline seconds, current seconds, ratio) tuples for every benchmark in
+    both, and a list of the names of benchmarks whose ratio is greater than
+    ``1 + threshold``.
+
+    :rtype: tuple
+    """
+    rows = []
+    regressions = []
+    for name in sorted(current['results'].keys()):
+        if name not in baseline['results']:
+            continue
+        old = baseline['results'][name]
+        new = current['results'][name]
+        ratio = new / old if old > 0 else float('inf')
+        rows.append((name, old, new, ratio))
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def parse_args(argv):
+    p = argparse.ArgumentParser(
+        description='Benchmark interest calculations, credit card payoff '
+                    'calculations and the credit payoffs view for synthetic '
+                    'portfolios of credit cards. Optionally write results to '
+                    'a JSON file and compare them to a previous run.'
+    )
+    p.add_argument('-s', '--sizes', dest='sizes', action='store', type=str,
+                   default=','.join(str(x) for x in DEFAULT_SIZES),
+                   help='comma-separated numbers of cards in the synthetic '
+                        'portfolios (default: %(default)s)')
+    p.add_argument('-n', '--number', dest='number', action='store', type=int,
+                   default=3, help='calls per timing (default: 3)')
+    p.add_argument('-r', '--repeat', dest='repeat', action='store', type=int,
+                   default=3, help='timings per benchmark; the best is '
+                                   'reported (default: 3)')
+    p.add_argument('--seed', dest='seed', action='store', type=int,
+                   default=1, help='random seed for the synthetic portfolios '
+                                   '(default: 1)')
+    p.add_argument('-o', '--output', dest='output', action='store',
+                   type=str, default=None,
+                   help='write JSON results to this file')
+    p.add_argument('-c', '--compare', dest='compare', action='store',
+                   type=str, default=None,
+                   help='compare results to this previous JSON results file, '
+                        'and exit 1 if any benchmark regressed')
+    p.add_argument('-t', '--threshold', dest='threshold', action='store',
+                   type=float, default=0.25,
+                   help='with --compare, fraction slower than the baseline '
+                        'that counts as a regression (default: 0.25)')
+    return p.parse_args(argv)
+
+
+def main(argv):
+    args = parse_args(argv)
+    # the Flask app configures debug logging, which would skew the timings
+    logging.disable(logging.INFO)
+    sizes = [int(x) for x in args.sizes.split(',')]
+    res = run_benchmarks(sizes, args.number, args.repeat, args.seed)
+    if args.output is not None:
+        with open(args.output, 'w') as fh:
+            json.dump(res, fh, indent=4, sort_keys=True)
+    if args.compare is None:
+        for name in sorted(res['results'].keys()):
+            print('%-60s %12.2f msec/call' % (
+                name, res['results'][name] * 1000
+            ))
+        return
+    with open(args.compare, 'r') as fh:
+        baseline = json.load(fh)
+    rows, regressions = compare(baseline, res, args.threshold)
+    print('%-60s %12s %12s %8s' % ('benchmark', 'base msec', 'msec', 'ratio'))
+    for name, old, new, ratio in rows:
+        print('%-60s %12.2f %12.2f %8.2f%s' % (
+            name, old * 1000, new * 1000, ratio,
+            ' REGRESSION' if name in regressions else ''
+        ))
+    if len(regressions) > 0:
+        print('%d benchmark(s) regressed by more than %d%%' % (
+            len(regressions), args.threshold * 100
+        ))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""
+The latest version of this package is available at:
+<http://github.com/jantman/biweeklybudget>
+
+################################################################################
+Copyright 2016 Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+
+    This file is part of biweeklybudget, also known as biweeklybudget.
+
+    biweeklybudget is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Affero General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    biweeklybudget is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU Affero General Public License for more details.
+
+    You should have received a copy of the GNU Affero General Public License
+    along with biweeklybudget.  If not, see <http://www.gnu.org/licenses/>.
+
+The Copyright and Authors attributions contained herein may not be removed or
+otherwise altered, except to add the Author attribution of a contributor to
+this work. (Additional Terms pursuant to Section 7b of the AGPL v3)
+################################################################################
+While not legally required, I sincerely request that anyone who finds
+bugs please submit them at <https://github.com/jantman/biweeklybudget> or
+to me via email, and that you send any contributions or improvements
+either as a pull request on GitHub, or to me via email.
+################################################################################
+
+AUTHORS:
+Jason Antman <jason@jasonantman.com> <http://www.jasonantman.com>
+################################################################################
+"""
+
+import os
+import sys
+import argparse
+import timeit
+from datetime import date, timedelta
+from unittest.mock import Mock, patch
+
+from sqlalchemy.orm.session import Session
+
+# settings are required for import, but this never connects to a database
+os.environ.setdefault(
+    'SETTINGS_MODULE', 'biweeklybudget.tests.fixtures.test_settings'
+)
+
+from biweeklybudget.biweeklypayperiod import BiweeklyPayPeriod  # noqa
+
+
+def naive_period_for_date(dt, db_session, start_date):
+    """
+    The previous implementation of
+    :py:meth:`~.BiweeklyPayPeriod.period_for_date`, which walks one period at a
+    time from the start date. Used only as a baseline for comparison.
+    """
+    p = BiweeklyPayPeriod(start_date, db_session)
+    if dt < p.start_date:
+        while True:
+            if p.end_date >= dt >= p.start_date:
+                return p
+            p = p.previous
+    if dt > p.end_date:
+        while True:
+            if p.end_date >= dt >= p.start_date:
+                return p
+            p = p.next
+    return p
+
+
+def parse_args(argv):
+    p = argparse.ArgumentParser(
+        description='Benchmark BiweeklyPayPeriod.period_for_date() latency as '
+                    'the gap between PAY_PERIOD_START_DATE and the requested '
+                    'date grows.'
+    )
+    p.add_argument('-n', '--number', dest='number', action='store', type=int,
+                   default=2000, help='calls per timing (default: 2000)')
+    p.add_argument('--no-naive', dest='naive', action='store_false',
+                   default=True,
+                   help='do not time the previous (walking) implementation')
+    return p.parse_args(argv)
+
+
+def main(argv):
+    args = parse_args(argv)
+    sess = Mock(spec_set=Session)
+    target = date(2017, 7, 28)
+    print('%10s %16s %16s' % ('gap_years', 'usec/call', 'naive usec/call'))
+    for years in [0, 1, 5, 10, 25, 50]:
+        start = target - timedelta(days=(365 * years) + 3)
+        with patch(
+            'biweeklybudget.biweeklypayperiod.settings.PAY_PERIOD_START_DATE',
+            start
+        ):
+            t = timeit.timeit(
+                lambda: BiweeklyPayPeriod.period_for_date(target, sess),
+                number=args.number
+            )
+            naive = ''
+            if args.naive:
+                naive = '%.2f' % (timeit.timeit(
+                    lambda: naive_period_for_date(target, sess, start),
+                    number=args.number
+                ) * 1000000 / args.number)
+        print('%10d %16.2f %16s' % (years, t * 1000000 / args.number, naive))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
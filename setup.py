@@ -91,6 +91,10 @@ setup(
                 'specifically for biweekly budgeting.',
     long_description=long_description,
     install_requires=pyver_requires,
+    extras_require={
+        # used by the payoffrisk console script / PayoffRiskSimulation
+        'risk': ['numpy']
+    },
     dependency_links=dep_links,
     include_package_data=True,
     entry_points="""
@@ -98,7 +102,12 @@ setup(
     loaddata = biweeklybudget.load_data:main
     ofxgetter = biweeklybudget.ofxgetter:main
     ofxbackfiller = biweeklybudget.backfill_ofx:main
+    payoffsweep = biweeklybudget.payoff_sweep:main
+    payoffrisk = biweeklybudget.payoff_risk:main
     initdb = biweeklybudget.initdb:main
+    cashflowprojection = biweeklybudget.projection:main
+    rebuildperiodsums = biweeklybudget.rebuild_period_sums:main
+    reclassifyofx = biweeklybudget.ofx_reclassify:main
     wishlist2project = biweeklybudget.wishlist2project:main
     ofxclient = biweeklybudget.vendored.ofxclient.cli:run
     [flask.commands]